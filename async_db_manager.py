@@ -0,0 +1,252 @@
+# async_db_manager.py
+# Native asyncio counterpart of DatabaseManager (psycopg 3 async + psycopg_pool).
+# Uses the same %s placeholder style as psycopg2, so SQL text is shared with the sync code paths.
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg.types.json import Json
+from psycopg_pool import AsyncConnectionPool
+
+from config import (DB_CONFIG, DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+                    VECTOR_INDEX_MODE, VECTOR_HNSW_EF_SEARCH, VECTOR_HNSW_ITERATIVE_SCAN)
+from embeddings import get_embedding_service
+from db_manager import (build_semantic_chunk_query, build_chunk_search_query, build_policy_search_query, build_batch_policy_search_query,
+                        build_section_chunks_query, build_neighbour_chunks_query, build_batch_chunk_search_query, build_evidence_chunks_query, split_batch_rows,
+                        build_hierarchical_chunk_query, NEXT_CHUNK_ORDINAL_QUERY, SUMMARY_EMBEDDINGS_REFRESH_QUERY, SUMMARY_EMBEDDINGS_BACKFILL_QUERY, CHUNK_TEXTS_QUERY, CHUNK_EMBEDDINGS_QUERY, VECTOR_INDEX_MODES)
+
+
+async def _configure_connection(conn: psycopg.AsyncConnection):
+    """Runs once per physical connection opened by the pool."""
+    await conn.set_autocommit(True)
+    try:
+        from pgvector.psycopg import register_vector_async
+        await register_vector_async(conn)
+    except ImportError:
+        print("WARNING: pgvector.psycopg not available. Async vector operations may fail.")
+    except Exception as e:
+        print(f"WARNING: pgvector registration failed on async connection: {e}")
+    try:
+        await conn.execute("SELECT set_config('hnsw.ef_search', %s, false);", (str(VECTOR_HNSW_EF_SEARCH),))
+    except psycopg.Error as e:
+        print(f"WARNING: Could not set hnsw.ef_search on async connection: {e}")
+    if VECTOR_HNSW_ITERATIVE_SCAN != "off":
+        try:
+            await conn.execute("SELECT set_config('hnsw.iterative_scan', %s, false);", (VECTOR_HNSW_ITERATIVE_SCAN,))
+        except psycopg.Error as e: # pgvector < 0.8
+            print(f"WARNING: hnsw.iterative_scan not supported on async connection ({e}). Filtered semantic searches may return fewer rows than requested.")
+
+
+class AsyncDatabaseManager:
+    """
+    Async database manager exposing the same surface as DatabaseManager
+    (execute_query, add_document, add_document_chunk, the search_* methods, document text loaders, log_retrieval).
+
+    Queries run on an AsyncConnectionPool, so many concurrent retrievals share a handful of
+    connections on the event loop instead of one blocking thread per query.
+    Call `await open()` before use (or use `async with AsyncDatabaseManager() as db:`).
+    """
+    def __init__(self, db_config=DB_CONFIG, min_size: int = DB_POOL_MIN_CONNECTIONS, max_size: int = DB_POOL_MAX_CONNECTIONS,
+                 vector_index_mode: str = VECTOR_INDEX_MODE):
+        if vector_index_mode not in VECTOR_INDEX_MODES:
+            raise ValueError(f"Unknown VECTOR_INDEX_MODE '{vector_index_mode}'. Expected one of {VECTOR_INDEX_MODES}.")
+        self.db_config = db_config
+        self.vector_index_mode = vector_index_mode
+        self.pool = AsyncConnectionPool(
+            make_conninfo(**{k: str(v) for k, v in db_config.items() if v is not None}),
+            min_size=max(0, min(min_size, max_size)),
+            max_size=max_size,
+            timeout=DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+            kwargs={"row_factory": dict_row},
+            configure=_configure_connection,
+            open=False,
+        )
+        self._pending_summary_docs: set = set() # add_document_chunk writes; summarised before the next hierarchical search
+        self._summaries_backfilled = False
+        self._ingest_hooks: List[Callable[[uuid.UUID, Optional[str]], None]] = []
+
+    async def open(self):
+        await self.pool.open()
+        print(f"INFO: AsyncDatabaseManager pool opened (max={self.pool.max_size}).")
+
+    async def close(self):
+        await self.pool.close()
+
+    async def __aenter__(self) -> "AsyncDatabaseManager":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        stats = self.pool.get_stats()
+        stats["mode"] = "async_pooled"
+        return stats
+
+    async def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False, fetch_all: bool = False) -> Any:
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(query, params)
+                    if fetch_one:
+                        return await cur.fetchone()
+                    if fetch_all:
+                        return await cur.fetchall()
+                    return None
+        except psycopg.Error as e:
+            print(f"ERROR: Async DB Query failed: {type(e).__name__} - {e}")
+            print(f"Query: {query[:500]}...")
+            print(f"Params: {params}")
+            raise
+
+    async def add_document(self, filename: str, title: Optional[str], document_type: Optional[str], source: Optional[str], page_count: Optional[int], tags: Optional[List[str]] = None) -> uuid.UUID:
+        doc_id_val = uuid.uuid4()
+        query = """
+        INSERT INTO documents (doc_id, filename, title, document_type, source, page_count, upload_date, tags)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW(), %s) RETURNING doc_id;
+        """
+        result = await self.execute_query(query, (doc_id_val, filename, title, document_type, source, page_count, tags or []), fetch_one=True)
+        doc_id_val = result['doc_id'] if result else doc_id_val
+        await self._notify_ingest(doc_id_val, document_type)
+        return doc_id_val
+
+    async def add_document_chunk(self, doc_id: uuid.UUID, page_number: Optional[int], chunk_text: str, section: Optional[str] = None, tags: Optional[List[str]] = None) -> uuid.UUID:
+        chunk_id_val = uuid.uuid4()
+        # Embedding is CPU-bound; keep it off the event loop.
+        embedding_val = await asyncio.to_thread(get_embedding_service().embed_query, chunk_text)
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text, tags, chunk_ordinal) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s, ({NEXT_CHUNK_ORDINAL_QUERY}));",
+                    (chunk_id_val, doc_id, page_number, section, chunk_text, tags or [], doc_id))
+                await conn.execute("INSERT INTO chunk_embeddings (chunk_id, embedding) VALUES (%s, %s::vector);",
+                                   (chunk_id_val, embedding_val))
+        self._pending_summary_docs.add(str(doc_id)) # One refresh per document, not per chunk
+        await self._notify_ingest(doc_id, None) # After the chunk's transaction has committed
+        return chunk_id_val
+
+    async def get_full_document_text_by_id(self, doc_id: uuid.UUID) -> Optional[str]:
+        query = "SELECT chunk_text FROM document_chunks WHERE doc_id = %s ORDER BY page_number, created_at, chunk_ordinal;"
+        results = await self.execute_query(query, (doc_id,), fetch_all=True)
+        return "\n\n".join([row['chunk_text'] for row in results]) if results else None
+
+    async def get_chunk_texts(self, chunk_ids: List[uuid.UUID]) -> Dict[uuid.UUID, str]:
+        if not chunk_ids:
+            return {}
+        results = await self.execute_query(CHUNK_TEXTS_QUERY, (list(chunk_ids),), fetch_all=True) or []
+        return {row['chunk_id']: row['chunk_text'] for row in results}
+
+    async def get_chunk_embeddings(self, chunk_ids: List[uuid.UUID]) -> List[Dict[str, Any]]:
+        if not chunk_ids:
+            return []
+        return await self.execute_query(CHUNK_EMBEDDINGS_QUERY, (list(chunk_ids),), fetch_all=True) or []
+
+    async def get_section_chunks(self, doc_sections: List[Tuple[uuid.UUID, str]], max_chunks_per_section: Optional[int] = None,
+                                 include_text: bool = True) -> List[Dict[str, Any]]:
+        if not doc_sections:
+            return []
+        query, params = build_section_chunks_query(doc_sections, max_chunks_per_section, include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def semantic_search_chunks(self, query_embedding: List[float], limit: int = 10, document_types: Optional[List[str]] = None,
+                                     sources: Optional[List[str]] = None, include_text: bool = True) -> List[Dict[str, Any]]:
+        query, params = build_semantic_chunk_query(query_embedding, limit, self.vector_index_mode,
+                                                   document_types=document_types, sources=sources, include_text=include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def refresh_pending_summary_embeddings(self) -> int:
+        """Same as DatabaseManager.refresh_pending_summary_embeddings, for chunks written through this manager."""
+        if not self._summaries_backfilled:
+            await self.execute_query(SUMMARY_EMBEDDINGS_BACKFILL_QUERY)
+            self._summaries_backfilled = True
+        pending = list(self._pending_summary_docs)
+        self._pending_summary_docs.clear()
+        if pending:
+            try:
+                await self.execute_query(SUMMARY_EMBEDDINGS_REFRESH_QUERY, (pending,))
+            except Exception:
+                self._pending_summary_docs.update(pending) # Retried by the next search
+                raise
+        return len(pending)
+
+    async def hierarchical_search_chunks(self, query_embedding: List[float], limit: int, doc_limit: int, section_limit: int,
+                                         document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                                         include_text: bool = True) -> List[Dict[str, Any]]:
+        await self.refresh_pending_summary_embeddings()
+        query, params = build_hierarchical_chunk_query(query_embedding, limit, doc_limit, section_limit,
+                                                       document_types=document_types, sources=sources, include_text=include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def get_neighbour_chunks(self, chunk_ids: List[uuid.UUID], window: int, include_text: bool = True) -> List[Dict[str, Any]]:
+        if not chunk_ids or window <= 0:
+            return []
+        query, params = build_neighbour_chunks_query(chunk_ids, window, include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def get_evidence_chunks(self, sources: List[str], categories: List[str], include_text: bool = True) -> List[Dict[str, Any]]:
+        if not sources or not categories:
+            return []
+        query, params = build_evidence_chunks_query(sources, categories, include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def batch_search_chunks(self, requests: List[Dict[str, Any]], include_text: bool = True) -> List[List[Dict[str, Any]]]:
+        if not requests:
+            return []
+        if any(request.get("doc_limit") for request in requests):
+            await self.refresh_pending_summary_embeddings()
+        query, params = build_batch_chunk_search_query(requests, self.vector_index_mode, include_text=include_text)
+        return split_batch_rows(await self.execute_query(query, params, fetch_all=True) or [], len(requests))
+
+    async def search_chunks(self, document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                            keywords: Optional[List[str]] = None, limit: int = 75, include_text: bool = True) -> List[Dict[str, Any]]:
+        query, params = build_chunk_search_query(document_types, sources, keywords, limit, include_text)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def search_policy_chunks(self, text_terms: Optional[List[str]] = None, query_embedding: Optional[List[float]] = None,
+                                   policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                                   limit: int = 5) -> List[Dict[str, Any]]:
+        query, params = build_policy_search_query(text_terms, query_embedding, policy_ids, document_sources, limit)
+        return await self.execute_query(query, params, fetch_all=True) or []
+
+    async def batch_search_policy_chunks(self, query_embeddings: List[List[float]], text_terms: Optional[List[str]] = None,
+                                         policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                                         limit: int = 5) -> List[List[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+        query, params = build_batch_policy_search_query(query_embeddings, text_terms, policy_ids, document_sources, limit)
+        return split_batch_rows(await self.execute_query(query, params, fetch_all=True) or [], len(query_embeddings))
+
+    def add_ingest_hook(self, hook: Callable[[uuid.UUID, Optional[str]], None]):
+        """Same contract as DatabaseManager.add_ingest_hook: (doc_id, document_type) after committed writes through this manager."""
+        self._ingest_hooks.append(hook)
+
+    async def _notify_ingest(self, doc_id: uuid.UUID, document_type: Optional[str]):
+        for hook in list(self._ingest_hooks):
+            try:
+                await asyncio.to_thread(hook, doc_id, document_type) # Hooks are sync and may reload indexes; keep them off the event loop
+            except Exception as e:
+                print(f"WARN: AsyncDatabaseManager ingest hook failed: {type(e).__name__} - {e}")
+
+    async def log_retrieval(self, query_text: str, filters: Optional[Dict], matched_chunk_ids: List[uuid.UUID], agent_context: str):
+        db_query = """
+        INSERT INTO retrieval_logs (log_id, query, filters, matched_chunk_ids, agent_context)
+        VALUES (%s, %s, %s, %s, %s);
+        """
+        await self.execute_query(db_query, (uuid.uuid4(), query_text, Json(filters or {}), matched_chunk_ids, agent_context))
+
+    async def log_retrievals_bulk(self, records: List[Tuple[uuid.UUID, str, Optional[Dict], List[uuid.UUID], str, datetime]]):
+        """Same records as DatabaseManager.log_retrievals_bulk; executemany pipelines the inserts in one round-trip."""
+        if not records:
+            return
+        rows = [(log_id, query_text, Json(filters or {}), matched_ids, agent_context, ts)
+                for log_id, query_text, filters, matched_ids, agent_context, ts in records]
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany("INSERT INTO retrieval_logs (log_id, query, filters, matched_chunk_ids, agent_context, timestamp) "
+                                      "VALUES (%s, %s, %s, %s::uuid[], %s, %s)", rows)
@@ -23,16 +23,94 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432")
 }
 
+# Storage backend: "postgres" (DatabaseManager) or "local" (LocalDatabaseManager: embedded SQLite + memory-mapped NumPy embeddings, no server)
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+LOCAL_DB_DIR = os.getenv("LOCAL_DB_DIR", "./local_db/")
+
+# Database Connection Pool Configuration
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "false").lower() == "true"
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "1"))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "12"))  # Matches the default MAX_PARALLEL_NODES
+DB_POOL_CHECKOUT_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT_SECONDS", "30"))
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "true").lower() == "true" # Async report runs (postgres) retrieve on an AsyncDatabaseManager pool (psycopg 3)
+
 MRM_MODEL_NAME = "gemini-2.5-flash-preview-05-20"
 SUBSIDIARY_AGENT_MODEL_NAME = "gemini-2.5-flash-preview-05-20"
 GEMINI_PRO_VISION_MODEL_NAME = "gemini-2.5-flash-preview-05-20" # ADDED
 
-MAX_CONTEXT_DOCUMENTS_FOR_FULL_INJECTION = 2
 MAX_CHUNKS_FOR_CONTEXT = 25
+# Hybrid retrieval: keyword, evidence, filter and vector sub-queries run concurrently and are fused with reciprocal rank fusion
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60")) # RRF damping constant: score += weight / (k + rank)
+HYBRID_RRF_WEIGHTS = os.getenv("HYBRID_RRF_WEIGHTS", "vector=1.0,keyword=1.0,evidence=0.8,filter=0.3") # 0 disables a sub-query
+HYBRID_SUBQUERY_THREADS = int(os.getenv("HYBRID_SUBQUERY_THREADS", "8")) # Worker threads for the sync path's concurrent sub-queries
+# Maximal marginal relevance: fused candidates are re-ordered to trade relevance against similarity to chunks already
+# chosen, and near-duplicates (repeated boilerplate) are dropped (retrieval/diversity.py)
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7")) # 1.0 = relevance only; lower values favour diversity
+MMR_LAMBDAS = os.getenv("MMR_LAMBDAS", "RETRIEVE=0.8,ASSESS=0.65,SYNTHESIZE=0.5,BALANCE=0.5") # Task type substring -> lambda
+MMR_DUPLICATE_SIMILARITY = float(os.getenv("MMR_DUPLICATE_SIMILARITY", "0.97")) # Cosine similarity at which a candidate counts as a copy of a chosen chunk
+# Evidence index: chunks are tagged at ingest with the key evidence categories of the report templates and ontology
+# (e.g. "HousingStatement", "DAS_ResidentialChapter"); intents look their categories up per application (retrieval/evidence_index.py)
+EVIDENCE_INDEX_ENABLED = os.getenv("EVIDENCE_INDEX_ENABLED", "true").lower() == "true"
+EVIDENCE_TAG_LEAD_CHARS = int(os.getenv("EVIDENCE_TAG_LEAD_CHARS", "400")) # Leading chunk text searched for a category's qualifier words (e.g. "Residential")
+# Hierarchical (coarse-to-fine) semantic search: the nearest documents, then the nearest sections inside them, are picked
+# by summary embeddings maintained at ingest, and chunks are ranked inside those sections only (retrieval/hierarchy.py)
+HIERARCHICAL_RETRIEVAL_TASKS = os.getenv("HIERARCHICAL_RETRIEVAL_TASKS", "") # Task type substrings that search hierarchically (e.g. "RETRIEVE"); empty = flat everywhere
+# Summary embeddings are refreshed at ingest only when hierarchical tasks are configured; otherwise each manager builds them
+# before its first hierarchical search (an intent can still opt in through retrieval_config['hierarchical_search'])
+SUMMARY_EMBEDDINGS_AT_INGEST = any(part.strip() for part in HIERARCHICAL_RETRIEVAL_TASKS.split(","))
+HIERARCHICAL_DOC_CANDIDATES = int(os.getenv("HIERARCHICAL_DOC_CANDIDATES", "8")) # Documents kept by the coarse stage
+HIERARCHICAL_SECTION_CANDIDATES = int(os.getenv("HIERARCHICAL_SECTION_CANDIDATES", "40")) # Sections (within those documents) whose chunks are ranked
+# Cross-encoder re-ranking: the fused candidates are scored against the intent's query by a small CPU cross-encoder
+# (optional sentence-transformers dependency) and only the best RERANK_KEEP go on to MMR and packing (retrieval/reranker.py)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true" # retrieval_config 'rerank' (true / false) overrides per intent
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_DEVICE = os.getenv("RERANK_DEVICE", "cpu")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32")) # (query, chunk) pairs per forward pass
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512")) # Model tokens per pair; longer chunks are truncated
+RERANK_KEEP = int(os.getenv("RERANK_KEEP", "15")) # Candidates kept after re-ranking (intent.result and the packer's candidates)
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "100000")) # LRU of scores keyed by (query hash, chunk text hash)
 MAX_TOKENS_PER_GEMINI_CALL_APPROX = 1000000 # For Gemini 1.5 Pro. Adjust if using 1.0 Pro (30k)
+APPROX_CHARS_PER_TOKEN = 4 # Rough chars-per-token ratio used by the context packer to size candidate units
+# Context packing: each intent's LLM context is filled up to a per-task token budget, greedily by relevance per token,
+# with whole sections, runs of neighbouring chunks and single chunks (retrieval/context_packer.py)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000")) # Default budget when no per-task entry matches
+CONTEXT_TOKEN_BUDGETS = os.getenv("CONTEXT_TOKEN_BUDGETS", "RETRIEVE=6000,ASSESS=16000,SYNTHESIZE=16000,BALANCE=24000") # Task type substring -> tokens
+CONTEXT_PACK_CANDIDATES = int(os.getenv("CONTEXT_PACK_CANDIDATES", "50")) # Top fused chunks the packer may choose from
+CONTEXT_PACK_CONTEXT_WEIGHT = float(os.getenv("CONTEXT_PACK_CONTEXT_WEIGHT", "0.35")) # Value of an unretrieved section chunk relative to the section's mean retrieved score
+CONTEXT_PACK_MAX_SECTION_CHUNKS = int(os.getenv("CONTEXT_PACK_MAX_SECTION_CHUNKS", "40")) # Larger sections are not fetched as whole-section units
+CONTEXT_PACK_MAX_SECTION_SHARE = float(os.getenv("CONTEXT_PACK_MAX_SECTION_SHARE", "0.5")) # A section or neighbour run may take at most this share of the budget
+CONTEXT_NEIGHBOUR_WINDOW = int(os.getenv("CONTEXT_NEIGHBOUR_WINDOW", "0")) # Chunks before/after each hit offered as a window unit; 0 (default) disables (retrieval_config 'neighbour_window' overrides)
+CONTEXT_PACK_UNIT_OVERHEAD_TOKENS = int(os.getenv("CONTEXT_PACK_UNIT_OVERHEAD_TOKENS", "20")) # Header tokens per packed unit in the prompt
 
 EMBEDDING_DIMENSION = 768
 
+# Vector index storage mode for chunk_embeddings (per deployment):
+#   "full"    - HNSW over the float32 vector column (baseline)
+#   "halfvec" - HNSW over embedding::halfvec (half the index memory), candidates re-ranked with full-precision vectors
+#   "binary"  - HNSW over binary_quantize(embedding) (~1/32 of the index memory), candidates re-ranked with full-precision vectors
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "full").lower()
+VECTOR_RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))  # Quantized modes fetch limit * factor ANN candidates for exact re-ranking
+VECTOR_HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "200"))  # hnsw.ef_search per connection; caps how many ANN candidates come back
+# pgvector 0.8+: keep scanning the HNSW graph until filtered semantic searches (source / document type) fill their LIMIT.
+# "relaxed_order" | "strict_order" | "off" (off on older pgvector; filtered searches may then return fewer rows)
+VECTOR_HNSW_ITERATIVE_SCAN = os.getenv("VECTOR_HNSW_ITERATIVE_SCAN", "relaxed_order").lower()
+
+# Embedding Service Configuration
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "placeholder").lower() # "placeholder" or "sentence-transformers"
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-mpnet-base-v2") # 768-dim, matches EMBEDDING_DIMENSION
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true" # Unit-length vectors, so L2 ranking matches cosine ranking
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # Texts per model forward pass
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "1"))  # Batches encoded concurrently
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true" # Persistent (model, text) -> vector cache; not used for the placeholder backend
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./cache/embeddings")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32") # "float32" or "float16" (half the disk, ~3 significant digits)
+
+# Keyword (full-text) search configuration
+FTS_LANGUAGE = "english" # Must match the text search config of document_chunks.chunk_tsv (migrations/003)
+KEYWORD_SEARCH_FUZZY_FALLBACK = os.getenv("KEYWORD_SEARCH_FUZZY_FALLBACK", "false").lower() == "true" # Also match terms via pg_trgm word similarity
+
 # Cache Configuration
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
 CACHE_MAX_AGE_HOURS = int(os.getenv("CACHE_MAX_AGE_HOURS", "24"))
@@ -40,7 +118,23 @@ CACHE_DIR = os.getenv("CACHE_DIR", "./cache/gemini_responses")
 
 REPORT_TEMPLATE_DIR = "./report_templates/"
 POLICY_KB_DIR = "./policy_kb/" # Source for initial policy ingestion
+RUN_VECTOR_CACHE_ENABLED = os.getenv("RUN_VECTOR_CACHE_ENABLED", "true").lower() == "true" # Serve a report run's semantic retrieval from its applications' chunks in memory
+RUN_VECTOR_CACHE_MAX_CHUNKS = int(os.getenv("RUN_VECTOR_CACHE_MAX_CHUNKS", "200000")) # Above this, keep using the database ANN index
+RUN_CHUNK_STORE_ENABLED = os.getenv("RUN_CHUNK_STORE_ENABLED", "true").lower() == "true" # One shared copy of each chunk text per report run; searches skip text the run already holds
+RETRIEVAL_BATCH_ENABLED = os.getenv("RETRIEVAL_BATCH_ENABLED", "true").lower() == "true" # Async runs: intents retrieving at the same time share one batched round-trip
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "25")) # How long the first intent waits for others to join its batch
+RETRIEVAL_MEMO_ENABLED = os.getenv("RETRIEVAL_MEMO_ENABLED", "true").lower() == "true" # Intents of a report run that repeat a retrieval request reuse its ranked chunks (retrieval/memo.py)
+RETRIEVAL_MEMO_MAX_ENTRIES = int(os.getenv("RETRIEVAL_MEMO_MAX_ENTRIES", "512")) # LRU bound on memoized requests
+RETRIEVAL_MEMO_ACROSS_RUNS = os.getenv("RETRIEVAL_MEMO_ACROSS_RUNS", "false").lower() == "true" # Keep the memo for later runs in this process (in-memory only, never written to disk); ingest still invalidates it
+POLICY_VECTOR_INDEX_ENABLED = os.getenv("POLICY_VECTOR_INDEX_ENABLED", "true").lower() == "true" # Answer policy searches from an in-process NumPy index
 MC_ONTOLOGY_DIR = "./mc_ontology_data/"
+MIGRATIONS_DIR = "./migrations/" # Numbered NNN_description.sql files applied by MigrationRunner
+
+# Retrieval Log Write-Behind Buffer Configuration
+RETRIEVAL_LOG_BUFFER_ENABLED = os.getenv("RETRIEVAL_LOG_BUFFER_ENABLED", "true").lower() == "true"
+RETRIEVAL_LOG_BATCH_SIZE = int(os.getenv("RETRIEVAL_LOG_BATCH_SIZE", "50"))  # Flush as soon as this many records are queued
+RETRIEVAL_LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("RETRIEVAL_LOG_FLUSH_INTERVAL_SECONDS", "2.0"))  # ...or after this long
+RETRIEVAL_LOG_MAX_QUEUE = int(os.getenv("RETRIEVAL_LOG_MAX_QUEUE", "10000"))  # Records beyond this are dropped (back-pressure)
 
 # LLM Generation Configuration
 DEFAULT_LLM_TEMPERATURE_DETERMINISTIC = 0.05
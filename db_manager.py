@@ -1,67 +1,686 @@
 # db_manager.py
 import psycopg2
-from psycopg2.extras import Json, RealDictCursor
-from typing import List, Dict, Any, Optional
+from psycopg2.extras import Json, RealDictCursor, execute_values, register_uuid
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
+import json
+import threading
+import time
 import uuid
-from config import DB_CONFIG, EMBEDDING_DIMENSION
+from embeddings import get_embedding_service
+from config import (DB_CONFIG, DB_POOL_ENABLED, DB_POOL_MIN_CONNECTIONS,
+                    DB_POOL_MAX_CONNECTIONS, DB_POOL_CHECKOUT_TIMEOUT_SECONDS, EMBEDDING_DIMENSION,
+                    VECTOR_INDEX_MODE, VECTOR_RERANK_FACTOR, VECTOR_HNSW_EF_SEARCH, VECTOR_HNSW_ITERATIVE_SCAN,
+                    FTS_LANGUAGE, KEYWORD_SEARCH_FUZZY_FALLBACK, EVIDENCE_INDEX_ENABLED, EVIDENCE_TAG_LEAD_CHARS,
+                    SUMMARY_EMBEDDINGS_AT_INGEST)
+
+register_uuid() # Adapt uuid.UUID (and lists of them, e.g. matched_chunk_ids) to Postgres uuid / uuid[]
+
+def _prepare_connection(conn):
+    """Per-physical-connection setup: autocommit and pgvector type registration."""
+    conn.autocommit = True # Simplifies, otherwise manage transactions explicitly
+    try:
+        from pgvector.psycopg2 import register_vector
+        register_vector(conn)
+    except ImportError:
+        print("WARNING: pgvector.psycopg2 not available. Vector operations may fail.")
+    except Exception as e:
+        print(f"WARNING: pgvector registration failed on connection: {e}")
+    try:
+        with conn.cursor() as cur:
+            # Default ef_search (40) caps HNSW results below MAX_CHUNKS_FOR_CONTEXT*2 and the re-rank candidate counts
+            cur.execute("SELECT set_config('hnsw.ef_search', %s, false);", (str(VECTOR_HNSW_EF_SEARCH),))
+    except psycopg2.Error as e:
+        print(f"WARNING: Could not set hnsw.ef_search on connection: {e}")
+    if VECTOR_HNSW_ITERATIVE_SCAN != "off":
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('hnsw.iterative_scan', %s, false);", (VECTOR_HNSW_ITERATIVE_SCAN,))
+        except psycopg2.Error as e: # pgvector < 0.8
+            print(f"WARNING: hnsw.iterative_scan not supported ({e.pgerror or e}). Filtered semantic searches may return fewer rows than requested.")
+
+
+class _PreparedConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that runs _prepare_connection exactly once when a physical connection is opened."""
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        _prepare_connection(conn)
+        return conn
+
+
+# --- Search SQL shared by DatabaseManager and AsyncDatabaseManager ---
+# Callers (AgenticRetriever, PolicyManager, ApplicationContextManager) use the search methods below rather than
+# building Postgres SQL themselves, so the same callers also run on LocalDatabaseManager (local_db_manager.py).
+
+def chunk_result_columns(include_text: bool = True) -> str:
+    """
+    Columns of every chunk search result. Without text, rows carry chunk_chars (the text length) instead, so a caller
+    holding a RunChunkStore can size and choose chunks first and fetch only texts it does not hold (get_chunk_texts).
+    """
+    text_col = "dc.chunk_text" if include_text else "length(dc.chunk_text) AS chunk_chars"
+    return f"dc.chunk_id, {text_col}, dc.page_number, dc.section, d.doc_id, d.title as doc_title, d.document_type"
+
+
+# Note: Ensure your embeddings are normalized if using vector_cosine_ops for true cosine similarity.
+# For L2 distance (often used), vector_l2_ops is correct.
+SEMANTIC_CHUNK_QUERY = """
+SELECT {columns},
+       ce.embedding <-> %s::vector AS distance
+FROM document_chunks dc
+JOIN documents d ON dc.doc_id = d.doc_id
+JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id
+ORDER BY distance ASC
+LIMIT %s;
+"""
+
+# ANN index per VECTOR_INDEX_MODE: (index name, indexed expression + operator class, candidate ORDER BY expression).
+# The ORDER BY expression must match the indexed expression exactly for the planner to use the index.
+VECTOR_INDEX_MODES = ("full", "halfvec", "binary")
+
+
+def vector_index_definition(mode: str, column: str = "embedding", dim: int = EMBEDDING_DIMENSION) -> str:
+    if mode == "full":
+        return f"USING hnsw ({column} vector_l2_ops)"
+    if mode == "halfvec":
+        return f"USING hnsw (({column}::halfvec({dim})) halfvec_l2_ops)"
+    if mode == "binary":
+        return f"USING hnsw ((binary_quantize({column})::bit({dim})) bit_hamming_ops)"
+    raise ValueError(f"Unknown vector index mode '{mode}'. Expected one of {VECTOR_INDEX_MODES}.")
+
+
+def vector_candidate_order(mode: str, column: str = "ce.embedding", dim: int = EMBEDDING_DIMENSION, query_sql: str = "%s::vector") -> str:
+    """ORDER BY expression served by the mode's index; by default takes the query vector as its one %s parameter."""
+    if mode == "full":
+        return f"{column} <-> {query_sql}"
+    if mode == "halfvec":
+        return f"{column}::halfvec({dim}) <-> {query_sql}::halfvec({dim})"
+    if mode == "binary":
+        return f"binary_quantize({column})::bit({dim}) <~> binary_quantize({query_sql})"
+    raise ValueError(f"Unknown vector index mode '{mode}'. Expected one of {VECTOR_INDEX_MODES}.")
+
+
+VECTOR_INDEX_NAMES = {
+    "full": "idx_chunk_embeddings_embedding", # Created by migrations/001
+    "halfvec": "idx_chunk_embeddings_embedding_halfvec",
+    "binary": "idx_chunk_embeddings_embedding_binary",
+}
+
+
+def chunk_filter_clauses(document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None) -> Tuple[List[str], List[Any]]:
+    """Document type / source conditions shared by the structured and semantic chunk searches."""
+    clauses: List[str] = []; params: List[Any] = []
+    if document_types:
+        clauses.append("d.document_type = ANY(%s)")
+        params.append(list(document_types))
+    if sources:
+        clauses.append("d.source = ANY(%s)")
+        params.append(list(sources))
+    return clauses, params
+
+
+def build_semantic_chunk_query(query_embedding: List[float], limit: int, index_mode: str = VECTOR_INDEX_MODE,
+                               rerank_factor: int = VECTOR_RERANK_FACTOR, document_types: Optional[List[str]] = None,
+                               sources: Optional[List[str]] = None, include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Unfiltered "full" mode is a plain exact-distance ORDER BY served by the vector HNSW index.
+    Source / document type filters are applied inside the index scan (hnsw.iterative_scan keeps the scan going
+    until LIMIT rows pass the filter; with a selective filter the planner may instead use the documents indexes
+    and sort exactly). Quantized modes take limit * rerank_factor candidates from the quantized index.
+    The outer ORDER BY re-ranks candidates by full-precision distance (also restoring order after relaxed_order scans).
+    """
+    filter_clauses, filter_params = chunk_filter_clauses(document_types, sources)
+    if index_mode == "full" and not filter_clauses:
+        return SEMANTIC_CHUNK_QUERY.format(columns=chunk_result_columns(include_text)), (query_embedding, limit)
+    candidate_limit = limit if index_mode == "full" else min(max(limit, limit * rerank_factor), max(limit, VECTOR_HNSW_EF_SEARCH))
+    where_clause = f"WHERE {' AND '.join(filter_clauses)}" if filter_clauses else ""
+    query = f"""
+    WITH candidates AS MATERIALIZED (
+      SELECT {chunk_result_columns(include_text)}, ce.embedding <-> %s::vector AS distance
+      FROM chunk_embeddings ce
+      JOIN document_chunks dc ON dc.chunk_id = ce.chunk_id
+      JOIN documents d ON dc.doc_id = d.doc_id
+      {where_clause}
+      ORDER BY {vector_candidate_order(index_mode)}
+      LIMIT %s
+    )
+    SELECT * FROM candidates
+    ORDER BY distance ASC
+    LIMIT %s;
+    """
+    return query, (query_embedding, *filter_params, query_embedding, candidate_limit, limit)
+
+
+def build_section_chunks_query(doc_sections: List[Tuple[uuid.UUID, str]], max_chunks_per_section: Optional[int] = None,
+                               include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Every chunk of the given (doc_id, section) pairs in document order, with the chunk search columns.
+    Sections with more than max_chunks_per_section chunks are left out entirely (never returned truncated).
+    """
+    query = f"""
+    SELECT chunk_id, {"chunk_text" if include_text else "chunk_chars"}, page_number, section, doc_id, doc_title, document_type FROM (
+      SELECT {chunk_result_columns(include_text)}, dc.created_at, dc.chunk_ordinal,
+             COUNT(*) OVER (PARTITION BY dc.doc_id, dc.section) AS section_chunk_count
+      FROM unnest(%s::uuid[], %s::text[]) AS s(doc_id, section)
+      JOIN document_chunks dc ON dc.doc_id = s.doc_id AND dc.section = s.section
+      JOIN documents d ON dc.doc_id = d.doc_id
+    ) section_chunks
+    WHERE %s::int IS NULL OR section_chunk_count <= %s::int
+    ORDER BY doc_id, page_number, created_at, chunk_ordinal;
+    """
+    return query, ([d for d, _ in doc_sections], [s for _, s in doc_sections], max_chunks_per_section, max_chunks_per_section)
+
+
+def build_neighbour_chunks_query(chunk_ids: List[uuid.UUID], window: int, include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    The `window` chunks before and after each hit, in reading order (page_number, created_at, chunk_ordinal) within its document, in one
+    query: row_number() numbers the chunks of the hits' documents (doc_position) and every chunk within `window`
+    positions of a hit is returned once, however many windows overlap it. Rows come in document order and include the hits.
+    """
+    query = f"""
+    WITH ordered AS MATERIALIZED (
+      SELECT {chunk_result_columns(include_text)},
+             row_number() OVER (PARTITION BY dc.doc_id ORDER BY dc.page_number, dc.created_at, dc.chunk_ordinal) AS doc_position
+      FROM document_chunks dc
+      JOIN documents d ON dc.doc_id = d.doc_id
+      WHERE dc.doc_id IN (SELECT doc_id FROM document_chunks WHERE chunk_id = ANY(%s::uuid[]))
+    )
+    SELECT o.* FROM ordered o
+    WHERE EXISTS (SELECT 1 FROM ordered h
+                  WHERE h.chunk_id = ANY(%s::uuid[]) AND h.doc_id = o.doc_id
+                    AND o.doc_position BETWEEN h.doc_position - %s AND h.doc_position + %s)
+    ORDER BY o.doc_id, o.doc_position;
+    """
+    ids = list(chunk_ids)
+    return query, (ids, ids, window, window)
+
+
+def build_evidence_chunks_query(sources: List[str], categories: List[str], include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Chunks the application_evidence_index (migrations/004) lists under any of `categories` for any of `sources`, each
+    once, with the matched categories as evidence_categories. The primary key serves the lookup; no chunk text is scanned.
+    """
+    query = f"""
+    WITH hits AS (
+      SELECT e.chunk_id, array_agg(DISTINCT ei.category) AS evidence_categories
+      FROM application_evidence_index ei
+      CROSS JOIN LATERAL unnest(ei.chunk_ids) AS e(chunk_id)
+      WHERE ei.source = ANY(%s) AND ei.category = ANY(%s)
+      GROUP BY e.chunk_id
+    )
+    SELECT {chunk_result_columns(include_text)}, d.source, hits.evidence_categories
+    FROM hits
+    JOIN document_chunks dc ON dc.chunk_id = hits.chunk_id
+    JOIN documents d ON dc.doc_id = d.doc_id
+    ORDER BY d.doc_id, dc.page_number, dc.created_at, dc.chunk_ordinal;
+    """
+    return query, (list(sources), list(categories))
+
+
+def hierarchical_chunks_sql(query_sql: str, filter_sql: str, doc_limit_sql: str, section_limit_sql: str, include_text: bool = True) -> str:
+    """
+    Coarse-to-fine candidate chunks (migrations/005): the doc_limit documents passing `filter_sql` whose summary embedding
+    is nearest the query, then the section_limit nearest sections within them, then every chunk of those sections with its
+    exact distance. The two summary stages scan the application's few summary rows, not its chunks. Placeholders, in
+    text order: query (distance), filter, query, doc limit, query, section limit. Callers add ORDER BY distance / LIMIT.
+    """
+    return f"""
+      SELECT {chunk_result_columns(include_text)}, ce.embedding <-> {query_sql} AS distance
+      FROM (
+        SELECT ss.doc_id, ss.section
+        FROM document_summary_embeddings ss
+        WHERE ss.level = 'section' AND ss.doc_id IN (
+          SELECT sd.doc_id
+          FROM document_summary_embeddings sd
+          JOIN documents d ON d.doc_id = sd.doc_id
+          WHERE sd.level = 'document' AND {filter_sql}
+          ORDER BY sd.embedding <-> {query_sql}
+          LIMIT {doc_limit_sql}
+        )
+        ORDER BY ss.embedding <-> {query_sql}
+        LIMIT {section_limit_sql}
+      ) s
+      JOIN document_chunks dc ON dc.doc_id = s.doc_id AND coalesce(dc.section, '') = s.section
+      JOIN documents d ON dc.doc_id = d.doc_id
+      JOIN chunk_embeddings ce ON ce.chunk_id = dc.chunk_id
+    """
+
+
+def build_hierarchical_chunk_query(query_embedding: List[float], limit: int, doc_limit: int, section_limit: int,
+                                   document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                                   include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """semantic_search_chunks restricted to the chunks of the nearest sections of the nearest documents (hierarchical_chunks_sql)."""
+    filter_clauses, filter_params = chunk_filter_clauses(document_types, sources)
+    filter_sql = " AND ".join(filter_clauses) if filter_clauses else "TRUE"
+    query = f"""
+    {hierarchical_chunks_sql("%s::vector", filter_sql, "%s", "%s", include_text)}
+    ORDER BY distance ASC
+    LIMIT %s;
+    """
+    return query, (query_embedding, *filter_params, query_embedding, doc_limit, query_embedding, section_limit, limit)
+
+
+def vector_literal(embedding: Optional[List[float]]) -> Optional[str]:
+    """pgvector text form ('[0.1,0.2,...]'), so many query vectors can be bound as one `%s::vector[]` array."""
+    return None if embedding is None else "[" + ",".join(repr(float(v)) for v in embedding) + "]"
+
+
+def build_batch_chunk_search_query(requests: List[Dict[str, Any]], index_mode: str = VECTOR_INDEX_MODE,
+                                   rerank_factor: int = VECTOR_RERANK_FACTOR, include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Many chunk searches in one statement. Each request is a dict with `limit`, optional `document_types` / `sources`
+    and either `query_embedding` (a semantic_search_chunks request; with `doc_limit` and `section_limit`, a
+    hierarchical_search_chunks request) or optional `keywords` (a search_chunks request).
+    The requests are unnested into one row each (query vector, per-row filters and keywords as jsonb, limits); vector
+    rows join a LATERAL top-k index scan (hierarchical rows the coarse-to-fine search) and the others a LATERAL filtered
+    keyword search, so every request keeps its own filters and limit. Result rows carry query_idx (the request's position), distance and keyword_rank;
+    split_batch_rows() groups them back per request.
+    """
+    from retrieval.text_search import clean_terms # Local import: the retrieval package imports db_manager
+    embeddings, specs, limits, candidate_limits, doc_limits, section_limits = [], [], [], [], [], []
+    for request in requests:
+        limit = int(request.get("limit", 10))
+        embedding = request.get("query_embedding")
+        embeddings.append(vector_literal(embedding))
+        specs.append(json.dumps({"document_types": list(request.get("document_types") or []), "sources": list(request.get("sources") or []),
+                           "keywords": [] if embedding is not None else clean_terms(request.get("keywords"))})) # Bound as text[], cast to jsonb[] (both drivers)
+        limits.append(limit)
+        candidate_limits.append(limit if index_mode == "full" else min(max(limit, limit * rerank_factor), max(limit, VECTOR_HNSW_EF_SEARCH)))
+        hierarchical = embedding is not None and request.get("doc_limit") and request.get("section_limit")
+        doc_limits.append(int(request["doc_limit"]) if hierarchical else None)
+        section_limits.append(int(request["section_limit"]) if hierarchical else None)
+    filter_sql = ("(cardinality(q.document_types) = 0 OR d.document_type = ANY(q.document_types)) "
+                  "AND (cardinality(q.sources) = 0 OR d.source = ANY(q.sources))")
+    match_sql = "dc.chunk_tsv @@ q.tsq"
+    rank_sql = "ts_rank_cd(dc.chunk_tsv, q.tsq)"
+    if KEYWORD_SEARCH_FUZZY_FALLBACK:
+        match_sql = f"({match_sql} OR EXISTS (SELECT 1 FROM unnest(q.keywords) term WHERE term <%% dc.chunk_text))"
+        rank_sql = f"GREATEST({rank_sql}, 0.1 * (SELECT max(word_similarity(term, dc.chunk_text)) FROM unnest(q.keywords) term))"
+    query = f"""
+    WITH q AS MATERIALIZED (
+      SELECT (r.ord - 1)::int AS query_idx, r.embedding, r.k, r.candidate_k, r.doc_k, r.section_k,
+             ARRAY(SELECT jsonb_array_elements_text(r.spec->'document_types')) AS document_types,
+             ARRAY(SELECT jsonb_array_elements_text(r.spec->'sources')) AS sources,
+             ARRAY(SELECT jsonb_array_elements_text(r.spec->'keywords')) AS keywords,
+             (SELECT string_agg('(' || t.tsq::text || ')', ' | ')::tsquery -- Terms ORed, words within a term ANDed
+              FROM (SELECT plainto_tsquery('{FTS_LANGUAGE}', term) AS tsq FROM jsonb_array_elements_text(r.spec->'keywords') term) t
+              WHERE numnode(t.tsq) > 0) AS tsq
+      FROM unnest(%s::vector[], %s::jsonb[], %s::int[], %s::int[], %s::int[], %s::int[])
+           WITH ORDINALITY AS r(embedding, spec, k, candidate_k, doc_k, section_k, ord)
+    )
+    SELECT q.query_idx, hit.* FROM (SELECT * FROM q WHERE embedding IS NOT NULL AND doc_k IS NULL) q
+    CROSS JOIN LATERAL (
+      SELECT * FROM (
+        SELECT {chunk_result_columns(include_text)}, ce.embedding <-> q.embedding AS distance, NULL::real AS keyword_rank
+        FROM chunk_embeddings ce
+        JOIN document_chunks dc ON dc.chunk_id = ce.chunk_id
+        JOIN documents d ON dc.doc_id = d.doc_id
+        WHERE {filter_sql}
+        ORDER BY {vector_candidate_order(index_mode, query_sql="q.embedding")}
+        LIMIT q.candidate_k
+      ) candidates
+      ORDER BY distance ASC
+      LIMIT q.k
+    ) hit
+    UNION ALL
+    SELECT q.query_idx, hit.*, NULL::real AS keyword_rank FROM (SELECT * FROM q WHERE embedding IS NOT NULL AND doc_k IS NOT NULL) q
+    CROSS JOIN LATERAL (
+      {hierarchical_chunks_sql("q.embedding", filter_sql, "q.doc_k", "q.section_k", include_text)}
+      ORDER BY distance ASC
+      LIMIT q.k
+    ) hit
+    UNION ALL
+    SELECT q.query_idx, hit.* FROM (SELECT * FROM q WHERE embedding IS NULL) q
+    CROSS JOIN LATERAL (
+      SELECT {chunk_result_columns(include_text)}, NULL::float8 AS distance,
+             CASE WHEN cardinality(q.keywords) > 0 THEN {rank_sql} END AS keyword_rank
+      FROM document_chunks dc
+      JOIN documents d ON dc.doc_id = d.doc_id
+      WHERE {filter_sql} AND (cardinality(q.keywords) = 0 OR {match_sql})
+      ORDER BY keyword_rank DESC NULLS LAST
+      LIMIT q.k
+    ) hit
+    ORDER BY query_idx, distance ASC NULLS LAST, keyword_rank DESC NULLS LAST;
+    """
+    return query, (embeddings, specs, limits, candidate_limits, doc_limits, section_limits)
+
+
+def split_batch_rows(rows: List[Dict[str, Any]], request_count: int) -> List[List[Dict[str, Any]]]:
+    """Groups batch_search_chunks rows back per request, dropping the columns the single-request searches do not return."""
+    results: List[List[Dict[str, Any]]] = [[] for _ in range(request_count)]
+    for row in rows:
+        row = dict(row)
+        query_idx = row.pop('query_idx')
+        for key in ('distance', 'keyword_rank'):
+            if row.get(key) is None:
+                row.pop(key, None)
+        results[query_idx].append(row)
+    return results
+
+
+# Reading order within a page is (created_at, chunk_ordinal): chunks added one at a time take the next position
+NEXT_CHUNK_ORDINAL_QUERY = "SELECT coalesce(max(chunk_ordinal) + 1, 0) FROM document_chunks WHERE doc_id = %s"
+
+CHUNK_TEXTS_QUERY = "SELECT chunk_id, chunk_text FROM document_chunks WHERE chunk_id = ANY(%s::uuid[]);"
+CHUNK_EMBEDDINGS_QUERY = "SELECT chunk_id, embedding FROM chunk_embeddings WHERE chunk_id = ANY(%s::uuid[]);"
+
+# Evidence index writes: (category, chunk_id) pairs arrive as two parallel arrays and are grouped per category
+EVIDENCE_INDEX_APPEND_QUERY = """
+INSERT INTO application_evidence_index (source, category, chunk_ids, updated_at)
+SELECT %s, t.category, array_agg(t.chunk_id), NOW()
+FROM unnest(%s::text[], %s::uuid[]) AS t(category, chunk_id)
+GROUP BY t.category
+ON CONFLICT (source, category) DO UPDATE
+SET chunk_ids = application_evidence_index.chunk_ids || EXCLUDED.chunk_ids, updated_at = EXCLUDED.updated_at;
+"""
+
+# Summary embeddings (migrations/005): recomputed for whole documents, so chunks appended later are included
+SUMMARY_EMBEDDINGS_REFRESH_QUERY = """
+INSERT INTO document_summary_embeddings (doc_id, level, section, chunk_count, embedding)
+SELECT dc.doc_id, g.level, g.section, COUNT(*), l2_normalize(avg(ce.embedding))
+FROM document_chunks dc
+JOIN chunk_embeddings ce ON ce.chunk_id = dc.chunk_id
+CROSS JOIN LATERAL (VALUES ('document', ''), ('section', coalesce(dc.section, ''))) AS g(level, section)
+WHERE dc.doc_id = ANY(%s::uuid[])
+GROUP BY dc.doc_id, g.level, g.section
+ON CONFLICT (doc_id, level, section) DO UPDATE
+SET chunk_count = EXCLUDED.chunk_count, embedding = EXCLUDED.embedding;
+"""
+
+# Documents without summary rows (ingested before hierarchical retrieval was used); run once per manager
+SUMMARY_EMBEDDINGS_BACKFILL_QUERY = """
+INSERT INTO document_summary_embeddings (doc_id, level, section, chunk_count, embedding)
+SELECT dc.doc_id, g.level, g.section, COUNT(*), l2_normalize(avg(ce.embedding))
+FROM document_chunks dc
+JOIN chunk_embeddings ce ON ce.chunk_id = dc.chunk_id
+CROSS JOIN LATERAL (VALUES ('document', ''), ('section', coalesce(dc.section, ''))) AS g(level, section)
+WHERE NOT EXISTS (SELECT 1 FROM document_summary_embeddings s WHERE s.doc_id = dc.doc_id)
+GROUP BY dc.doc_id, g.level, g.section
+ON CONFLICT (doc_id, level, section) DO NOTHING;
+"""
+
+EVIDENCE_TAGGING_ROWS_QUERY = f"""
+SELECT dc.chunk_id, dc.section, left(dc.chunk_text, {EVIDENCE_TAG_LEAD_CHARS}) AS chunk_text,
+       d.doc_id, d.filename, d.title, d.document_type
+FROM document_chunks dc
+JOIN documents d ON dc.doc_id = d.doc_id
+WHERE d.source = ANY(%s)
+ORDER BY d.doc_id, dc.page_number, dc.created_at, dc.chunk_ordinal;
+"""
+
+POLICY_CHUNK_COLUMNS = ("dc.chunk_id, dc.chunk_text, dc.page_number, dc.section as policy_id_tag, dc.tags as chunk_tags, d.doc_id, "
+                        "d.title as policy_document_title, d.document_type as policy_document_type, d.source as policy_document_source")
+
+POLICY_CHUNK_BY_ID_TAG_QUERY = """
+SELECT dc.chunk_id, dc.chunk_text, dc.section as policy_id_tag, d.title as doc_title, d.source as doc_source
+FROM document_chunks dc
+JOIN documents d ON dc.doc_id = d.doc_id
+WHERE dc.section = %s AND d.document_type LIKE %s
+LIMIT 1;
+"""
+
+APPLICATION_CHUNK_QUERY = """
+SELECT dc.chunk_id, dc.chunk_text, dc.page_number, dc.section, d.doc_id, d.title as doc_title, d.document_type
+FROM document_chunks dc
+JOIN documents d ON dc.doc_id = d.doc_id
+WHERE d.source = ANY(%s)
+AND (d.document_type ILIKE %s OR dc.tags @> ARRAY[%s])
+ORDER BY d.upload_date DESC, dc.page_number ASC
+LIMIT 1;
+"""
+
+POLICY_DOCUMENT_TYPE_PATTERN = "PolicyDocument_%" # Policy documents are typed "PolicyDocument_<prefix>"
+
+
+def build_chunk_search_query(document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                             keywords: Optional[List[str]] = None, limit: int = 75, include_text: bool = True) -> Tuple[str, Tuple[Any, ...]]:
+    """Filtered chunk search (document type / source) with an optional full-text keyword match ranked by keyword_rank."""
+    from retrieval.text_search import build_keyword_clause # Local import: the retrieval package imports db_manager
+    sql_clauses, sql_params = chunk_filter_clauses(document_types, sources)
+    select_cols = chunk_result_columns(include_text)
+    select_params: List[Any] = []
+    order_by = ""
+
+    # Full-text match on the GIN-indexed chunk_tsv column, ranked by ts_rank_cd
+    if keyword_clause := build_keyword_clause(keywords):
+        sql_clauses.append(keyword_clause.match_sql)
+        sql_params.extend(keyword_clause.match_params)
+        select_cols += f", {keyword_clause.rank_sql} AS keyword_rank"
+        select_params.extend(keyword_clause.rank_params)
+        order_by = " ORDER BY keyword_rank DESC"
+
+    base_q = f"SELECT {select_cols} FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
+    query = base_q + (f" WHERE {' AND '.join(sql_clauses)}" if sql_clauses else "") + order_by + " LIMIT %s;"
+    return query, tuple(select_params + sql_params + [limit])
+
+
+def build_policy_search_query(text_terms: Optional[List[str]] = None, query_embedding: Optional[List[float]] = None,
+                              policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                              limit: int = 5) -> Tuple[str, Tuple[Any, ...]]:
+    """Policy chunk search: ordered by vector distance with an embedding, else by keyword_rank, else by source/page."""
+    from retrieval.text_search import build_keyword_clause, clean_terms # Local import: the retrieval package imports db_manager
+    sql_clauses: List[str] = []
+    sql_params: List[Any] = []
+
+    # Filter by document_type (must be a policy document)
+    # Case-sensitive prefix LIKE can use idx_documents_document_type
+    sql_clauses.append("d.document_type LIKE %s")
+    sql_params.append(POLICY_DOCUMENT_TYPE_PATTERN)
+
+    if document_sources:
+        # document_sources might be like "NPPF", "LocalPlan", etc.
+        # These correspond to d.source like "NPPF_SAMPLE", "LOCAL_PLAN_CORE_STRATEGY"
+        source_conditions = []
+        for src_keyword in document_sources:
+            source_conditions.append("d.source ILIKE %s")
+            sql_params.append(f"%{src_keyword}%")
+        sql_clauses.append(f"({' OR '.join(source_conditions)})")
+
+    if policy_ids:
+        # policy_ids are stored in dc.section or as a tag
+        id_conditions = []
+        for pid in policy_ids:
+            id_conditions.append("(dc.section = %s OR dc.tags @> ARRAY[%s]::text[])") # @> can use the GIN tags index; = ANY() cannot
+            sql_params.extend([pid, pid])
+        sql_clauses.append(f"({' OR '.join(id_conditions)})")
+
+    all_text_terms = clean_terms(text_terms)
+    keyword_clause = build_keyword_clause(all_text_terms)
+    if keyword_clause:
+        # Full-text match on chunk_tsv, or an exact tag overlap (&& can use the GIN tags index)
+        sql_clauses.append(f"({keyword_clause.match_sql} OR dc.tags && %s::text[])")
+        sql_params.extend(keyword_clause.match_params + [all_text_terms])
+
+    select_cols = POLICY_CHUNK_COLUMNS
+    from_join_clause = "FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
+    select_params: List[Any] = []
+
+    if query_embedding is not None:
+        select_cols += ", ce.embedding <-> %s::vector AS distance"
+        from_join_clause += " JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id"
+        select_params.append(query_embedding) # SELECT params precede WHERE params
+        order_by_clause = "ORDER BY distance ASC"
+    elif keyword_clause:
+        select_cols += f", {keyword_clause.rank_sql} AS keyword_rank"
+        select_params.extend(keyword_clause.rank_params)
+        order_by_clause = "ORDER BY keyword_rank DESC, d.source, dc.page_number"
+    else:
+        order_by_clause = "ORDER BY d.source, dc.page_number" # Default order if no semantic query or keywords
+
+    query = f"SELECT {select_cols} {from_join_clause} WHERE {' AND '.join(sql_clauses)} {order_by_clause} LIMIT %s"
+    return query, tuple(select_params + sql_params + [limit])
+
+
+
+def build_batch_policy_search_query(query_embeddings: List[List[float]], text_terms: Optional[List[str]] = None,
+                                    policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                                    limit: int = 5) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    One build_policy_search_query per query embedding (same filters), tagged with query_idx and combined with
+    UNION ALL, so several semantic policy searches share one round-trip. Rows are grouped back by split_batch_rows.
+    """
+    parts: List[str] = []
+    params: List[Any] = []
+    for query_idx, query_embedding in enumerate(query_embeddings):
+        query, query_params = build_policy_search_query(text_terms, query_embedding, policy_ids, document_sources, limit)
+        parts.append(f"SELECT {query_idx} AS query_idx, hit.* FROM ({query}) hit")
+        params.extend(query_params)
+    return " UNION ALL ".join(parts) + " ORDER BY query_idx, distance ASC;", tuple(params)
 
-def get_embedding(text: str) -> List[float]:
-    # In a real system, this would call an actual embedding model
-    # For now, using a placeholder that returns a fixed-size vector.
-    # print(f"INFO: (DB_Manager) Generating dummy embedding for: '{text[:30]}...'") # Can be verbose
-    return [0.1] * EMBEDDING_DIMENSION
 
 class DatabaseManager:
-    def __init__(self, db_config=DB_CONFIG):
+    """
+    Postgres/pgvector access layer.
+
+    Runs in one of two modes:
+      - single: one shared connection (`self.conn`), the original behaviour.
+      - pooled: a ThreadedConnectionPool of up to `pool_size` connections. Each calling thread checks out
+        its own connection for the duration of a query (nested use within the same thread reuses it), so
+        ParallelProcessor workers no longer serialise on one socket. `execute_query` is identical in both modes.
+    """
+    def __init__(self, db_config=DB_CONFIG, pool_size: Optional[int] = None, vector_index_mode: str = VECTOR_INDEX_MODE):
+        if vector_index_mode not in VECTOR_INDEX_MODES:
+            raise ValueError(f"Unknown VECTOR_INDEX_MODE '{vector_index_mode}'. Expected one of {VECTOR_INDEX_MODES}.")
         self.db_config = db_config
+        self.vector_index_mode = vector_index_mode
         self.conn = None
-        self._connect()
-        # Register pgvector extension for proper vector type support
-        try:
-            from pgvector.psycopg2 import register_vector
-            register_vector(self.conn)
-        except ImportError:
-            print("WARNING: pgvector.psycopg2 not available. Vector operations may fail.")
-        except Exception as e:
-            print(f"WARNING: Failed to register pgvector: {e}")
-    
+        self._pool: Optional[_PreparedConnectionPool] = None
+        self._pool_slots: Optional[threading.BoundedSemaphore] = None
+        self._thread_local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._close_hooks: List[Callable[[], None]] = []
+        self._ingest_hooks: List[Callable[[uuid.UUID, Optional[str]], None]] = []
+        self._pending_summary_docs: set = set() # add_document_chunk writes; summarised before the next hierarchical search
+        self._pending_summary_lock = threading.Lock()
+        self._summaries_backfilled = False
+        self._pool_stats = {"checkouts": 0, "in_use": 0, "peak_in_use": 0,
+                            "total_wait_seconds": 0.0, "max_wait_seconds": 0.0, "discarded_connections": 0}
+
+        if pool_size is None and DB_POOL_ENABLED:
+            pool_size = DB_POOL_MAX_CONNECTIONS
+        self.pool_size = pool_size or 0
+
+        if self.pool_size > 0:
+            self._init_pool()
+        else:
+            self._connect()
 
     def _connect(self):
         try:
             self.conn = psycopg2.connect(**self.db_config)
-            self.conn.autocommit = True # Simplifies, otherwise manage transactions explicitly
-            # Register pgvector for new connections
-            try:
-                from pgvector.psycopg2 import register_vector
-                register_vector(self.conn)
-            except (ImportError, Exception) as e:
-                print(f"WARNING: pgvector registration failed on connection: {e}")
+            _prepare_connection(self.conn)
             # print("INFO: Database connection established.") # Can be verbose
         except psycopg2.Error as e:
             print(f"ERROR: Database connection failed: {e}")
             raise
 
-    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False, fetch_all: bool = False) -> Any:
-        if not self.conn or self.conn.closed:
-            # print("WARN: DB connection was closed. Reconnecting.") # For debugging
-            self._connect()
-        # Ensure connection is now established before proceeding
-        if not self.conn:
-             raise RuntimeError("Database connection could not be re-established.")
+    def _init_pool(self):
+        min_conn = max(0, min(DB_POOL_MIN_CONNECTIONS, self.pool_size))
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, params)
-                if fetch_one:
-                    return cur.fetchone()
-                if fetch_all:
-                    return cur.fetchall()
-                return None # For INSERT/UPDATE without RETURNING, or if no fetch type specified
+            self._pool = _PreparedConnectionPool(min_conn, self.pool_size, **self.db_config)
         except psycopg2.Error as e:
-            print(f"ERROR: DB Query failed: {type(e).__name__} - {e}")
-            print(f"Query: {query[:500]}...")
-            print(f"Params: {params}")
-            # Depending on the error, you might want to raise it, or return a specific error indicator
-            raise # Re-raise for now to make issues visible
+            print(f"ERROR: Database connection pool creation failed: {e}")
+            raise
+        # psycopg2 pools raise PoolError when exhausted; the semaphore makes callers wait for a free slot instead.
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+        print(f"INFO: DatabaseManager using connection pool (min={min_conn}, max={self.pool_size}).")
+
+    @property
+    def is_pooled(self) -> bool:
+        return self._pool is not None
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Yield a usable connection: the shared one in single mode, or the calling thread's pooled one."""
+        if self._pool is None:
+            if not self.conn or self.conn.closed:
+                # print("WARN: DB connection was closed. Reconnecting.") # For debugging
+                self._connect()
+            # Ensure connection is now established before proceeding
+            if not self.conn:
+                raise RuntimeError("Database connection could not be re-established.")
+            yield self.conn
+            return
+
+        held_conn = getattr(self._thread_local, "conn", None)
+        if held_conn is not None: # Re-entrant use within the same thread (e.g. a query inside a transaction)
+            yield held_conn
+            return
+
+        wait_start = time.perf_counter()
+        assert self._pool_slots is not None
+        if not self._pool_slots.acquire(timeout=DB_POOL_CHECKOUT_TIMEOUT_SECONDS):
+            raise RuntimeError(f"Timed out after {DB_POOL_CHECKOUT_TIMEOUT_SECONDS}s waiting for a pooled database connection.")
+        try:
+            conn = self._pool.getconn()
+            if conn.closed: # Server-side disconnect since last use; replace it
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._pool_slots.release()
+            raise
+        waited = time.perf_counter() - wait_start
+
+        with self._stats_lock:
+            self._pool_stats["checkouts"] += 1
+            self._pool_stats["in_use"] += 1
+            self._pool_stats["peak_in_use"] = max(self._pool_stats["peak_in_use"], self._pool_stats["in_use"])
+            self._pool_stats["total_wait_seconds"] += waited
+            self._pool_stats["max_wait_seconds"] = max(self._pool_stats["max_wait_seconds"], waited)
+
+        self._thread_local.conn = conn
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True # Connection-level failure: do not hand this socket to another thread
+            raise
+        finally:
+            self._thread_local.conn = None
+            discard = discard or bool(conn.closed)
+            try:
+                self._pool.putconn(conn, close=discard)
+            finally:
+                self._pool_slots.release()
+                with self._stats_lock:
+                    self._pool_stats["in_use"] -= 1
+                    if discard:
+                        self._pool_stats["discarded_connections"] += 1
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool size, checkout counts and wait times (single mode reports a pool of one)."""
+        if self._pool is None:
+            return {"mode": "single", "pool_size": 1, "connected": bool(self.conn and not self.conn.closed)}
+        with self._stats_lock:
+            stats = dict(self._pool_stats)
+        stats.update({
+            "mode": "pooled",
+            "pool_size": self.pool_size,
+            "pool_min": self._pool.minconn,
+            "connections_open": len(self._pool._pool) + len(self._pool._used),
+            "avg_wait_ms": round(1000 * stats["total_wait_seconds"] / stats["checkouts"], 3) if stats["checkouts"] else 0.0,
+        })
+        stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 4)
+        stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 4)
+        return stats
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False, fetch_all: bool = False) -> Any:
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(query, params)
+                    if fetch_one:
+                        return cur.fetchone()
+                    if fetch_all:
+                        return cur.fetchall()
+                    return None # For INSERT/UPDATE without RETURNING, or if no fetch type specified
+            except psycopg2.Error as e:
+                print(f"ERROR: DB Query failed: {type(e).__name__} - {e}")
+                print(f"Query: {query[:500]}...")
+                print(f"Params: {params}")
+                # Depending on the error, you might want to raise it, or return a specific error indicator
+                raise # Re-raise for now to make issues visible
 
     def add_document(self, filename: str, title: Optional[str], document_type: Optional[str], source: Optional[str], page_count: Optional[int], tags: Optional[List[str]] = None) -> uuid.UUID:
         doc_id_val = uuid.uuid4()
@@ -71,27 +690,342 @@ class DatabaseManager:
         """
         # FIX: Cast doc_id_val to str for psycopg2 compatibility
         result = self.execute_query(query, (str(doc_id_val), filename, title, document_type, source, page_count, tags or []), fetch_one=True)
-        return result['doc_id'] if result else doc_id_val # Fallback if RETURNING not supported/fails
+        doc_id_val = result['doc_id'] if result else doc_id_val # Fallback if RETURNING not supported/fails
+        self._notify_ingest(doc_id_val, document_type)
+        return doc_id_val
 
     def add_document_chunk(self, doc_id: uuid.UUID, page_number: Optional[int], chunk_text: str, section: Optional[str] = None, tags: Optional[List[str]] = None) -> uuid.UUID:
         chunk_id_val = uuid.uuid4()
-        query = """
-        INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text, tags)
-        VALUES (%s, %s, %s, %s, %s, %s) RETURNING chunk_id;
+        query = f"""
+        INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text, tags, chunk_ordinal)
+        VALUES (%s, %s, %s, %s, %s, %s, ({NEXT_CHUNK_ORDINAL_QUERY})) RETURNING chunk_id;
         """
-        result = self.execute_query(query, (str(chunk_id_val), str(doc_id), page_number, section, chunk_text, tags or []), fetch_one=True)
+        result = self.execute_query(query, (str(chunk_id_val), str(doc_id), page_number, section, chunk_text, tags or [], str(doc_id)), fetch_one=True)
         chunk_id_to_return = result['chunk_id'] if result else chunk_id_val
-        
-        embedding_val = get_embedding(chunk_text) # Uses EMBEDDING_DIMENSION from config
+
+        embedding_val = get_embedding_service().embed_query(chunk_text)
         emb_query = "INSERT INTO chunk_embeddings (chunk_id, embedding) VALUES (%s, %s::vector);"
         self.execute_query(emb_query, (str(chunk_id_to_return), embedding_val)) # Ensure embedding_val is a list
+        with self._pending_summary_lock: # One refresh per document, not per chunk (see refresh_pending_summary_embeddings)
+            self._pending_summary_docs.add(str(doc_id))
+        self._notify_ingest(doc_id, None)
         return chunk_id_to_return
 
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """
+        Run a block on one connection inside a single transaction (commit on success, rollback on error).
+        execute_query calls made by the same thread inside the block join the transaction, and so do nested
+        transaction() blocks: only the outermost one commits. Ingest hooks raised inside the block run once per
+        document after the commit (none after a rollback), so listeners never see uncommitted rows.
+        Note: in single mode the shared connection is used, so keep transactions short.
+        """
+        if getattr(self._thread_local, "pending_ingest", None) is not None: # Nested: join the outer transaction
+            with self.connection() as conn:
+                yield conn
+            return
+        committed = False
+        with self.connection() as conn:
+            conn.autocommit = False
+            self._thread_local.pending_ingest = {}
+            try:
+                yield conn
+                conn.commit()
+                committed = True
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                pending_ingest, self._thread_local.pending_ingest = self._thread_local.pending_ingest, None
+                if not conn.closed:
+                    conn.autocommit = True
+        if committed:
+            for doc_id, document_type in pending_ingest.items():
+                self._notify_ingest(doc_id, document_type)
+
+    def add_document_chunks_bulk(self, doc_id: uuid.UUID, chunks: List[Dict[str, Any]], page_size: int = 500) -> List[uuid.UUID]:
+        """
+        Insert many chunks of one document and their embeddings with multi-row INSERTs in one transaction. With
+        SUMMARY_EMBEDDINGS_AT_INGEST the document's summary embeddings (hierarchical retrieval) are refreshed in it; otherwise
+        the document is marked pending (refresh_pending_summary_embeddings).
+        Each chunk dict takes the add_document_chunk arguments: chunk_text (required), page_number, section, tags.
+        Chunks take consecutive chunk_ordinal positions in list order, after any the document already has.
+        Returns the new chunk_ids in input order.
+        """
+        if not chunks:
+            return []
+        chunk_ids = [uuid.uuid4() for _ in chunks]
+        vectors = get_embedding_service().embed([c['chunk_text'] for c in chunks]) # Batched model calls
+        embedding_rows = [(str(cid), vec.tolist()) for cid, vec in zip(chunk_ids, vectors)]
+        with self.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute(NEXT_CHUNK_ORDINAL_QUERY + ";", (str(doc_id),))
+                first_ordinal = cur.fetchone()[0]
+                chunk_rows = [(str(cid), str(doc_id), c.get('page_number'), c.get('section'), c['chunk_text'], c.get('tags') or [], first_ordinal + i)
+                              for i, (cid, c) in enumerate(zip(chunk_ids, chunks))]
+                execute_values(cur, "INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text, tags, chunk_ordinal) VALUES %s",
+                               chunk_rows, page_size=page_size)
+                execute_values(cur, "INSERT INTO chunk_embeddings (chunk_id, embedding) VALUES %s",
+                               embedding_rows, template="(%s, %s::vector)", page_size=page_size)
+                if SUMMARY_EMBEDDINGS_AT_INGEST:
+                    cur.execute(SUMMARY_EMBEDDINGS_REFRESH_QUERY, ([str(doc_id)],))
+        with self._pending_summary_lock:
+            if SUMMARY_EMBEDDINGS_AT_INGEST:
+                self._pending_summary_docs.discard(str(doc_id))
+            else:
+                self._pending_summary_docs.add(str(doc_id))
+        self._notify_ingest(doc_id, None)
+        return chunk_ids
+
+    def ingest_document(self, filename: str, title: Optional[str], document_type: Optional[str], source: Optional[str],
+                        chunks: List[Dict[str, Any]], page_count: Optional[int] = None, tags: Optional[List[str]] = None,
+                        page_size: int = 500) -> Dict[str, Any]:
+        """
+        Insert a document row plus all of its chunks and embeddings in one transaction; with EVIDENCE_INDEX_ENABLED the
+        chunks are tagged with their evidence categories and appended to the application's evidence index in it too.
+        Returns ingest stats: doc_id, chunk_ids, evidence tags, rows written and rows per second.
+        """
+        start = time.perf_counter()
+        with self.transaction():
+            doc_id = self.add_document(filename, title, document_type, source, page_count, tags)
+            chunk_ids = self.add_document_chunks_bulk(doc_id, chunks, page_size=page_size)
+            evidence_tags = self._index_evidence(source, {"filename": filename, "title": title, "document_type": document_type},
+                                                 chunks, chunk_ids)
+        elapsed = time.perf_counter() - start
+        rows_written = 1 + 2 * len(chunk_ids) # documents + document_chunks + chunk_embeddings
+        stats = {
+            "doc_id": doc_id,
+            "chunk_ids": chunk_ids,
+            "chunk_count": len(chunk_ids),
+            "evidence_tags": evidence_tags,
+            "rows_written": rows_written,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_second": round(rows_written / elapsed, 1) if elapsed > 0 else None,
+        }
+        print(f"INFO: Ingested '{filename}' ({len(chunk_ids)} chunks, {rows_written} rows) in {elapsed:.3f}s ({stats['rows_per_second']} rows/s).")
+        return stats
+
+    def refresh_summary_embeddings(self, doc_ids: List[uuid.UUID]):
+        """Recomputes the document and section summary embeddings of the given documents from their chunk vectors."""
+        if doc_ids:
+            with self._pending_summary_lock:
+                self._pending_summary_docs.difference_update(str(d) for d in doc_ids)
+            self.execute_query(SUMMARY_EMBEDDINGS_REFRESH_QUERY, ([str(d) for d in doc_ids],))
+
+    def refresh_pending_summary_embeddings(self) -> int:
+        """
+        Refreshes, in one query, the summaries of documents that gained chunks since their last refresh without one at
+        ingest. Runs before hierarchical searches; the first call also backfills documents that have no summaries.
+        Returns the number of pending documents refreshed.
+        """
+        if not self._summaries_backfilled:
+            self.execute_query(SUMMARY_EMBEDDINGS_BACKFILL_QUERY)
+            self._summaries_backfilled = True
+        with self._pending_summary_lock:
+            pending = list(self._pending_summary_docs)
+            self._pending_summary_docs.clear()
+        if pending:
+            try:
+                self.execute_query(SUMMARY_EMBEDDINGS_REFRESH_QUERY, (pending,))
+            except Exception:
+                with self._pending_summary_lock:
+                    self._pending_summary_docs.update(pending) # Retried by the next search
+                raise
+        return len(pending)
+
+    def _index_evidence(self, source: Optional[str], document: Dict[str, Any], chunks: List[Dict[str, Any]],
+                        chunk_ids: List[uuid.UUID]) -> int:
+        """Tags the new chunks (retrieval/evidence_index.py) and appends them to the source's index entries; returns the tag count."""
+        if not EVIDENCE_INDEX_ENABLED or not source or not chunk_ids:
+            return 0
+        from retrieval.evidence_index import get_evidence_tagger # Local import: the retrieval package imports db_manager
+        categories, tagged_ids = get_evidence_tagger().index_entries(document, chunks, chunk_ids)
+        if categories:
+            self.execute_query(EVIDENCE_INDEX_APPEND_QUERY, (source, categories, tagged_ids))
+        return len(categories)
+
+    def replace_evidence_index(self, source: str, categories: List[str], chunk_ids: List[uuid.UUID]):
+        """Replaces every evidence index entry of `source` with the given (category, chunk_id) pairs (rebuild_evidence_index)."""
+        with self.transaction():
+            self.execute_query("DELETE FROM application_evidence_index WHERE source = %s;", (source,))
+            if categories:
+                self.execute_query(EVIDENCE_INDEX_APPEND_QUERY, (source, list(categories), list(chunk_ids)))
+
+    def get_evidence_tagging_rows(self, sources: List[str]) -> List[Dict[str, Any]]:
+        """Per chunk of the sources: its document's descriptors, section and the first EVIDENCE_TAG_LEAD_CHARS of its text."""
+        if not sources:
+            return []
+        return self.execute_query(EVIDENCE_TAGGING_ROWS_QUERY, (list(sources),), fetch_all=True) or []
+
+    def get_evidence_chunks(self, sources: List[str], categories: List[str], include_text: bool = True) -> List[Dict[str, Any]]:
+        """Chunks indexed under any of `categories` for the sources (build_evidence_chunks_query); ranked by the retriever."""
+        if not sources or not categories:
+            return []
+        query, params = build_evidence_chunks_query(sources, categories, include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
     def get_full_document_text_by_id(self, doc_id: uuid.UUID) -> Optional[str]:
-        query = "SELECT chunk_text FROM document_chunks WHERE doc_id = %s ORDER BY page_number, created_at;" # created_at for tie-breaking
+        query = "SELECT chunk_text FROM document_chunks WHERE doc_id = %s ORDER BY page_number, created_at, chunk_ordinal;" # Reading order (migrations/006)
         results = self.execute_query(query, (doc_id,), fetch_all=True)
         return "\n\n".join([row['chunk_text'] for row in results]) if results else None
 
+    def get_chunk_texts(self, chunk_ids: List[uuid.UUID]) -> Dict[uuid.UUID, str]:
+        """chunk_id -> text for chunks a RunChunkStore does not hold yet (searches run with include_text=False)."""
+        if not chunk_ids:
+            return {}
+        results = self.execute_query(CHUNK_TEXTS_QUERY, (list(chunk_ids),), fetch_all=True) or []
+        return {row['chunk_id']: row['chunk_text'] for row in results}
+
+    def get_chunk_embeddings(self, chunk_ids: List[uuid.UUID]) -> List[Dict[str, Any]]:
+        """{chunk_id, embedding} rows for the given chunks (MMR re-ranking); vector_cache.rows_to_matrix parses them."""
+        if not chunk_ids:
+            return []
+        return self.execute_query(CHUNK_EMBEDDINGS_QUERY, (list(chunk_ids),), fetch_all=True) or []
+
+    def get_section_chunks(self, doc_sections: List[Tuple[uuid.UUID, str]], max_chunks_per_section: Optional[int] = None,
+                           include_text: bool = True) -> List[Dict[str, Any]]:
+        """Whole sections for the context packer in one round-trip (build_section_chunks_query); oversized sections are skipped."""
+        if not doc_sections:
+            return []
+        query, params = build_section_chunks_query(doc_sections, max_chunks_per_section, include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def semantic_search_chunks(self, query_embedding: List[float], limit: int = 10, document_types: Optional[List[str]] = None,
+                               sources: Optional[List[str]] = None, include_text: bool = True) -> List[Dict[str, Any]]:
+        """Nearest chunks by L2 distance, optionally restricted to document types / sources; rows carry doc_title, document_type and distance."""
+        query, params = build_semantic_chunk_query(query_embedding, limit, self.vector_index_mode, # pgvector expects a list, not a tuple
+                                                   document_types=document_types, sources=sources, include_text=include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def hierarchical_search_chunks(self, query_embedding: List[float], limit: int, doc_limit: int, section_limit: int,
+                                   document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                                   include_text: bool = True) -> List[Dict[str, Any]]:
+        """
+        Coarse-to-fine semantic search (build_hierarchical_chunk_query): nearest documents, then nearest sections within
+        them, by summary embedding; then the nearest chunks within those sections. Rows as semantic_search_chunks.
+        """
+        self.refresh_pending_summary_embeddings()
+        query, params = build_hierarchical_chunk_query(query_embedding, limit, doc_limit, section_limit,
+                                                       document_types=document_types, sources=sources, include_text=include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def get_neighbour_chunks(self, chunk_ids: List[uuid.UUID], window: int, include_text: bool = True) -> List[Dict[str, Any]]:
+        """Each hit plus its `window` neighbours on either side, de-duplicated, in one round-trip (build_neighbour_chunks_query)."""
+        if not chunk_ids or window <= 0:
+            return []
+        query, params = build_neighbour_chunks_query(chunk_ids, window, include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def batch_search_chunks(self, requests: List[Dict[str, Any]], include_text: bool = True) -> List[List[Dict[str, Any]]]:
+        """
+        Several semantic / keyword / filter chunk searches in one round-trip (build_batch_chunk_search_query).
+        Returns one result list per request, in request order, with the rows the single-request search would return.
+        """
+        if not requests:
+            return []
+        if any(request.get("doc_limit") for request in requests): # Hierarchical requests read the summary embeddings
+            self.refresh_pending_summary_embeddings()
+        query, params = build_batch_chunk_search_query(requests, self.vector_index_mode, include_text=include_text)
+        return split_batch_rows(self.execute_query(query, params, fetch_all=True) or [], len(requests))
+
+    def ensure_vector_index(self, drop_unused: bool = True) -> Dict[str, Any]:
+        """
+        Creates the ANN index for this deployment's vector_index_mode if missing and, with drop_unused, drops the
+        indexes of the other modes so only one ANN index is kept in memory. Returns the index names and sizes.
+        """
+        mode = self.vector_index_mode
+        index_name = VECTOR_INDEX_NAMES[mode]
+        existing = {row['indexname'] for row in (self.execute_query(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'chunk_embeddings' AND indexname = ANY(%s);",
+            (list(VECTOR_INDEX_NAMES.values()),), fetch_all=True) or [])}
+        if index_name not in existing:
+            print(f"INFO: Building '{mode}' vector index {index_name} (may take a while on large tables)...")
+            start = time.perf_counter()
+            self.execute_query(f"CREATE INDEX IF NOT EXISTS {index_name} ON chunk_embeddings {vector_index_definition(mode)};")
+            print(f"INFO: Built {index_name} in {time.perf_counter() - start:.1f}s.")
+        dropped = []
+        if drop_unused:
+            for other_mode, other_name in VECTOR_INDEX_NAMES.items():
+                if other_mode != mode and other_name in existing:
+                    self.execute_query(f"DROP INDEX IF EXISTS {other_name};")
+                    dropped.append(other_name)
+        size_row = self.execute_query("SELECT pg_relation_size(%s::regclass) AS index_bytes, pg_relation_size('chunk_embeddings') AS table_bytes;",
+                                      (index_name,), fetch_one=True) or {}
+        return {"mode": mode, "index": index_name, "dropped": dropped,
+                "index_bytes": size_row.get('index_bytes'), "table_bytes": size_row.get('table_bytes')}
+
+    def get_chunks_with_embeddings_by_sources(self, sources: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Every chunk (semantic_search_chunks columns plus source) and its embedding for documents whose source is in `sources`."""
+        if not sources:
+            return []
+        query = """
+        SELECT dc.chunk_id, dc.chunk_text, dc.page_number, dc.section,
+               d.doc_id, d.title as doc_title, d.document_type, d.source, ce.embedding
+        FROM document_chunks dc
+        JOIN documents d ON dc.doc_id = d.doc_id
+        JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id
+        WHERE d.source = ANY(%s)
+        ORDER BY d.doc_id, dc.page_number
+        LIMIT %s;
+        """
+        return self.execute_query(query, (list(sources), limit), fetch_all=True) or [] # LIMIT NULL means no limit
+
+    def get_policy_chunks_with_embeddings(self) -> List[Dict[str, Any]]:
+        """Every policy chunk with its metadata and embedding (loaded once by PolicyManager's in-process index)."""
+        query = f"""
+        SELECT {POLICY_CHUNK_COLUMNS}, ce.embedding
+        FROM document_chunks dc
+        JOIN documents d ON dc.doc_id = d.doc_id
+        JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id
+        WHERE d.document_type LIKE %s
+        ORDER BY d.source, dc.page_number;
+        """
+        return self.execute_query(query, (POLICY_DOCUMENT_TYPE_PATTERN,), fetch_all=True) or []
+
+    def search_chunks(self, document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                      keywords: Optional[List[str]] = None, limit: int = 75, include_text: bool = True) -> List[Dict[str, Any]]:
+        query, params = build_chunk_search_query(document_types, sources, keywords, limit, include_text)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def search_policy_chunks(self, text_terms: Optional[List[str]] = None, query_embedding: Optional[List[float]] = None,
+                             policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                             limit: int = 5) -> List[Dict[str, Any]]:
+        query, params = build_policy_search_query(text_terms, query_embedding, policy_ids, document_sources, limit)
+        return self.execute_query(query, params, fetch_all=True) or []
+
+    def batch_search_policy_chunks(self, query_embeddings: List[List[float]], text_terms: Optional[List[str]] = None,
+                                   policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                                   limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """search_policy_chunks for several query embeddings sharing one set of filters, in one round-trip; one result list per embedding."""
+        if not query_embeddings:
+            return []
+        query, params = build_batch_policy_search_query(query_embeddings, text_terms, policy_ids, document_sources, limit)
+        return split_batch_rows(self.execute_query(query, params, fetch_all=True) or [], len(query_embeddings))
+
+    def get_policy_chunk_by_id_tag(self, policy_id_tag: str) -> Optional[Dict[str, Any]]:
+        return self.execute_query(POLICY_CHUNK_BY_ID_TAG_QUERY, (policy_id_tag, POLICY_DOCUMENT_TYPE_PATTERN), fetch_one=True)
+
+    def get_application_chunk(self, application_refs: List[str], document_type_contains: str, tag: str) -> Optional[Dict[str, Any]]:
+        """Most recently uploaded chunk for the application whose document type contains `document_type_contains` or that carries `tag`."""
+        return self.execute_query(APPLICATION_CHUNK_QUERY, (list(application_refs), f"%{document_type_contains}%", tag), fetch_one=True)
+
+    def get_document_sources(self, doc_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Optional[str]]:
+        """doc_id -> source (application reference) for the given documents, in one query (used by ingest listeners)."""
+        if not doc_ids:
+            return {}
+        rows = self.execute_query("SELECT doc_id, source FROM documents WHERE doc_id = ANY(%s::uuid[]);", (list(doc_ids),), fetch_all=True) or []
+        return {row['doc_id']: row['source'] for row in rows}
+
+    def find_document(self, source: Optional[str] = None, document_type: Optional[str] = None, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """First document matching every given field (used for ingestion checks)."""
+        conditions = []; params: List[Any] = []
+        for column, value in (("filename", filename), ("source", source), ("document_type", document_type)):
+            if value is not None:
+                conditions.append(f"{column} = %s"); params.append(value)
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.execute_query(f"SELECT doc_id, filename, title, document_type, source FROM documents{where_sql} LIMIT 1;", tuple(params), fetch_one=True)
+
     def log_retrieval(self, query_text: str, filters: Optional[Dict], matched_chunk_ids: List[uuid.UUID], agent_context: str):
         log_id_val = uuid.uuid4()
         # Ensure matched_chunk_ids is a list of UUIDs, not strings, if your DB expects UUID array directly
@@ -102,7 +1036,49 @@ class DatabaseManager:
         """
         self.execute_query(db_query, (log_id_val, query_text, Json(filters or {}), matched_chunk_ids, agent_context))
 
+    def log_retrievals_bulk(self, records: List[Tuple[uuid.UUID, str, Optional[Dict], List[uuid.UUID], str, datetime]]):
+        """Insert many retrieval log records (log_id, query, filters, matched_chunk_ids, agent_context, timestamp) in one statement."""
+        if not records:
+            return
+        rows = [(log_id, query_text, Json(filters or {}), matched_ids, agent_context, ts)
+                for log_id, query_text, filters, matched_ids, agent_context, ts in records]
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, "INSERT INTO retrieval_logs (log_id, query, filters, matched_chunk_ids, agent_context, timestamp) VALUES %s",
+                               rows, template="(%s, %s, %s, %s::uuid[], %s, %s)")
+
+    def add_close_hook(self, hook: Callable[[], None]):
+        """Register a callable run by close() before connections are released (e.g. to flush write-behind buffers)."""
+        self._close_hooks.append(hook)
+
+    def add_ingest_hook(self, hook: Callable[[uuid.UUID, Optional[str]], None]):
+        """
+        Register a callable run after documents or chunks are written, with (doc_id, document_type);
+        document_type is None when only chunks were added. Used to invalidate in-process indexes and caches.
+        """
+        self._ingest_hooks.append(hook)
+
+    def _notify_ingest(self, doc_id: uuid.UUID, document_type: Optional[str]):
+        pending = getattr(self._thread_local, "pending_ingest", None)
+        if pending is not None: # Inside transaction(): deferred until commit, once per document
+            pending[doc_id] = pending.get(doc_id) or document_type
+            return
+        for hook in list(self._ingest_hooks):
+            try:
+                hook(doc_id, document_type)
+            except Exception as e:
+                print(f"WARN: DatabaseManager ingest hook failed: {type(e).__name__} - {e}")
+
     def close(self):
+        while self._close_hooks:
+            hook = self._close_hooks.pop(0)
+            try:
+                hook()
+            except Exception as e:
+                print(f"WARN: DatabaseManager close hook failed: {type(e).__name__} - {e}")
+        if self._pool is not None and not self._pool.closed:
+            self._pool.closeall()
+            # print("INFO: Database connection pool closed.") # Can be verbose
         if self.conn and not self.conn.closed:
             self.conn.close()
             # print("INFO: Database connection closed.") # Can be verbose
@@ -0,0 +1,39 @@
+"""
+Embedding subsystem shared by ingestion (DatabaseManager / LocalDatabaseManager) and retrieval
+(AgenticRetriever, PolicyManager).
+
+Usage:
+    from embeddings import get_embedding_service
+
+    service = get_embedding_service()
+    vectors = service.embed(["chunk one", "chunk two"])   # float32 array, shape (2, EMBEDDING_DIMENSION)
+    query_vector = service.embed_query("flood risk policy") # list of floats, ready to bind as a SQL parameter
+"""
+
+from .backends import (
+    EmbeddingBackend,
+    PlaceholderEmbeddingBackend,
+    SentenceTransformerBackend,
+    create_embedding_backend
+)
+
+from .cache import (
+    EmbeddingCache,
+    embedding_cache_key
+)
+
+from .service import (
+    EmbeddingService,
+    get_embedding_service
+)
+
+__all__ = [
+    'EmbeddingBackend',
+    'PlaceholderEmbeddingBackend',
+    'SentenceTransformerBackend',
+    'create_embedding_backend',
+    'EmbeddingCache',
+    'embedding_cache_key',
+    'EmbeddingService',
+    'get_embedding_service'
+]
@@ -0,0 +1,67 @@
+# embeddings/backends.py
+# Embedding model backends. Each backend encodes a batch of texts into a float32 matrix.
+from typing import List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_DIMENSION, EMBEDDING_MODEL_NAME, EMBEDDING_DEVICE, EMBEDDING_NORMALIZE
+
+
+class EmbeddingBackend:
+    """Base class: `encode(texts)` returns a float32 array of shape (len(texts), dimension)."""
+    model_name: str = "base"
+    dimension: int = EMBEDDING_DIMENSION
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class PlaceholderEmbeddingBackend(EmbeddingBackend):
+    """
+    The original dummy embedding (every component 0.1). Needs no model download, so it remains the default
+    for demos and CI; every text gets the same vector, so semantic ranking is effectively a tie.
+    """
+    model_name = "placeholder"
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.dimension = dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.full((len(texts), self.dimension), 0.1, dtype=np.float32)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Local CPU-friendly model via sentence-transformers (optional dependency).
+    The default all-mpnet-base-v2 produces 768-dim vectors, matching the chunk_embeddings.embedding column.
+    """
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, device: str = EMBEDDING_DEVICE, normalize: bool = EMBEDDING_NORMALIZE):
+        from sentence_transformers import SentenceTransformer # ImportError is handled by create_embedding_backend
+        self.model_name = model_name
+        self.normalize = normalize
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dimension = int(self.model.get_sentence_embedding_dimension())
+        if self.dimension != EMBEDDING_DIMENSION:
+            print(f"WARNING: Embedding model '{model_name}' produces {self.dimension}-dim vectors but EMBEDDING_DIMENSION is {EMBEDDING_DIMENSION}. "
+                  "The database vector column must match the model.")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # The service already batches; encode each batch in one forward pass
+        vectors = self.model.encode(texts, batch_size=max(1, len(texts)), convert_to_numpy=True,
+                                    normalize_embeddings=self.normalize, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_embedding_backend(backend_name: str, model_name: Optional[str] = None) -> EmbeddingBackend:
+    """Builds the configured backend, falling back to the placeholder when the model cannot be loaded."""
+    backend_name = (backend_name or "placeholder").lower()
+    if backend_name in ("sentence-transformers", "sentence_transformers"):
+        try:
+            return SentenceTransformerBackend(model_name or EMBEDDING_MODEL_NAME)
+        except ImportError:
+            print("WARNING: sentence-transformers not installed. Falling back to placeholder embeddings.")
+        except Exception as e:
+            print(f"WARNING: Could not load embedding model '{model_name or EMBEDDING_MODEL_NAME}': {type(e).__name__} - {e}. Falling back to placeholder embeddings.")
+    elif backend_name != "placeholder":
+        print(f"WARNING: Unknown EMBEDDING_BACKEND '{backend_name}'. Using placeholder embeddings.")
+    return PlaceholderEmbeddingBackend()
@@ -0,0 +1,161 @@
+# embeddings/cache.py
+# Persistent content-addressed embedding cache: a memory-mapped vector file plus an append-only index of
+# text digests, so identical chunk texts and query strings are encoded once across runs and processes.
+import hashlib
+import os
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl # POSIX advisory locks; serialise appends from concurrent processes
+except ImportError: # pragma: no cover - Windows
+    fcntl = None
+
+DIGEST_BYTES = 16 # blake2b digest size; one index record per cached vector
+CACHE_GROWTH_ROWS = 4096 # Minimum number of rows the vector file grows by
+
+
+def embedding_cache_key(model_name: str, text: str) -> bytes:
+    """Content address of (model, text)."""
+    return hashlib.blake2b(f"{model_name}\x00{text}".encode("utf-8"), digest_size=DIGEST_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    Files per (model, dimension, dtype) under `cache_dir`:
+      <name>.index   - append-only sequence of 16-byte digests; record i describes row i
+      <name>.vectors - raw float32/float16 matrix, memory-mapped and grown in CACHE_GROWTH_ROWS steps
+    A vector is written and flushed before its digest is appended, so a crash can only leave an unreferenced row.
+    Other processes' appends are picked up by re-reading the index tail before lookups that miss.
+    """
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        os.makedirs(cache_dir, exist_ok=True)
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        base = os.path.join(cache_dir, f"{safe_model}_{dimension}d_{dtype}")
+        self.index_path = base + ".index"
+        self.vectors_path = base + ".vectors"
+
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._index_records = 0 # Records read from the index file (may exceed len(_rows) if two processes raced on a key)
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        open(self.index_path, "ab").close()
+        open(self.vectors_path, "ab").close()
+        with self._lock:
+            self._refresh_index()
+
+    # --- File handling (call with self._lock held) ---
+
+    def _row_bytes(self) -> int:
+        return self.dimension * self.dtype.itemsize
+
+    def _refresh_index(self):
+        """Loads index records appended since the last read (by this or another process)."""
+        known = self._index_records
+        with open(self.index_path, "rb") as f_idx:
+            f_idx.seek(known * DIGEST_BYTES)
+            tail = f_idx.read()
+        usable = len(tail) - (len(tail) % DIGEST_BYTES) # Ignore a partially written trailing record
+        for offset in range(0, usable, DIGEST_BYTES):
+            self._rows.setdefault(tail[offset:offset + DIGEST_BYTES], known + offset // DIGEST_BYTES)
+        self._index_records = known + usable // DIGEST_BYTES
+        self._remap(self._index_records)
+
+    def _remap(self, rows_needed: int):
+        file_rows = os.path.getsize(self.vectors_path) // self._row_bytes()
+        if self._vectors is not None and file_rows == self._capacity and rows_needed <= self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._capacity = file_rows
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(file_rows, self.dimension)) if file_rows else None
+
+    @staticmethod
+    def _lock_file(f_obj):
+        if fcntl is not None:
+            fcntl.flock(f_obj.fileno(), fcntl.LOCK_EX)
+
+    @staticmethod
+    def _unlock_file(f_obj):
+        if fcntl is not None:
+            fcntl.flock(f_obj.fileno(), fcntl.LOCK_UN)
+
+    # --- Public API ---
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Returns (vectors, miss_positions); vectors[i] is None for every position listed in miss_positions."""
+        keys = [embedding_cache_key(self.model_name, t) for t in texts]
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._refresh_index() # Another process may have cached them since we last looked
+            found: List[Optional[np.ndarray]] = []
+            misses: List[int] = []
+            for pos, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is not None and self._vectors is not None and row < self._capacity:
+                    found.append(np.asarray(self._vectors[row], dtype=np.float32))
+                else:
+                    found.append(None); misses.append(pos)
+            self._stats["hits"] += len(keys) - len(misses)
+            self._stats["misses"] += len(misses)
+        return found, misses
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Appends vectors for texts not already cached."""
+        if len(texts) == 0:
+            return
+        with self._lock, open(self.index_path, "ab") as f_idx:
+            self._lock_file(f_idx)
+            try:
+                self._refresh_index()
+                new_keys: List[bytes] = []; new_vectors = []; seen = set()
+                for text, vector in zip(texts, vectors):
+                    key = embedding_cache_key(self.model_name, text)
+                    if key not in self._rows and key not in seen:
+                        seen.add(key); new_keys.append(key); new_vectors.append(vector)
+                if not new_keys:
+                    return
+                first_row = self._index_records
+                needed = first_row + len(new_keys)
+                if needed > self._capacity:
+                    with open(self.vectors_path, "r+b") as f_vec:
+                        f_vec.truncate(max(needed, self._capacity * 2, CACHE_GROWTH_ROWS) * self._row_bytes())
+                    self._remap(needed)
+                assert self._vectors is not None
+                self._vectors[first_row:needed] = np.asarray(new_vectors, dtype=self.dtype)
+                self._vectors.flush() # Vectors are durable before the index references them
+                f_idx.write(b"".join(new_keys))
+                f_idx.flush()
+                for offset, key in enumerate(new_keys):
+                    self._rows[key] = first_row + offset
+                self._index_records = needed
+                self._stats["writes"] += len(new_keys)
+            finally:
+                self._unlock_file(f_idx)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._rows)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["dtype"] = self.dtype.name
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+                self._capacity = 0
@@ -0,0 +1,134 @@
+# embeddings/service.py
+# Batched embedding service: one entry point for ingest and query paths, with configurable batch size and
+# thread-level parallelism across batches.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from config import (EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_NUM_THREADS, EMBEDDING_CACHE_ENABLED,
+                    EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DTYPE)
+from .backends import EmbeddingBackend, PlaceholderEmbeddingBackend, create_embedding_backend
+from .cache import EmbeddingCache
+
+
+class EmbeddingService:
+    """
+    Splits texts into batches of `batch_size` and encodes them with the backend. With `num_threads` > 1,
+    batches are encoded concurrently on a thread pool (model inference releases the GIL).
+    Texts already in the persistent EmbeddingCache, and duplicates within one call, are not encoded again.
+    Thread-safe: ParallelProcessor workers may call embed()/embed_query() concurrently.
+    """
+    def __init__(self, backend: Optional[EmbeddingBackend] = None, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 num_threads: int = EMBEDDING_NUM_THREADS, cache: Optional[EmbeddingCache] = None):
+        self.backend = backend or create_embedding_backend(EMBEDDING_BACKEND)
+        self.batch_size = max(1, batch_size)
+        self.num_threads = max(1, num_threads)
+        if cache is None and EMBEDDING_CACHE_ENABLED and not isinstance(self.backend, PlaceholderEmbeddingBackend):
+            try:
+                cache = EmbeddingCache(EMBEDDING_CACHE_DIR, self.backend.model_name, self.backend.dimension, EMBEDDING_CACHE_DTYPE)
+            except Exception as e:
+                print(f"WARNING: Embedding cache unavailable ({type(e).__name__} - {e}). Embeddings will not be cached.")
+        self.cache = cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"texts_requested": 0, "texts_embedded": 0, "batches": 0, "calls": 0, "encode_seconds": 0.0}
+        print(f"INFO: EmbeddingService using backend '{self.backend.model_name}' (dim={self.backend.dimension}, batch_size={self.batch_size}, threads={self.num_threads}).")
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    @property
+    def dimension(self) -> int:
+        return self.backend.dimension
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="EmbeddingService")
+            return self._executor
+
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        start = time.perf_counter()
+        vectors = self.backend.encode(batch)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["encode_seconds"] += time.perf_counter() - start
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.num_threads > 1 and len(batches) > 1:
+            encoded = list(self._get_executor().map(self._encode_batch, batches))
+        else:
+            encoded = [self._encode_batch(batch) for batch in batches]
+        return np.vstack(encoded).astype(np.float32, copy=False)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts in input order; returns a float32 array of shape (len(texts), dimension)."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        unique_texts = list(dict.fromkeys(texts))
+        if self.cache is not None:
+            vectors, miss_positions = self.cache.get_many(unique_texts)
+        else:
+            vectors, miss_positions = [None] * len(unique_texts), list(range(len(unique_texts)))
+        if miss_positions:
+            miss_texts = [unique_texts[pos] for pos in miss_positions]
+            encoded = self._encode(miss_texts)
+            if self.cache is not None:
+                try:
+                    self.cache.put_many(miss_texts, encoded)
+                except Exception as e: # A cache write failure must not fail ingestion or retrieval
+                    print(f"WARNING: Failed to write {len(miss_texts)} embeddings to cache: {type(e).__name__} - {e}")
+            for pos, vector in zip(miss_positions, encoded):
+                vectors[pos] = vector
+        with self._stats_lock:
+            self._stats["texts_requested"] += len(texts)
+            self._stats["texts_embedded"] += len(miss_positions)
+            self._stats["calls"] += 1
+        vector_by_text = dict(zip(unique_texts, vectors))
+        return np.vstack([vector_by_text[t] for t in texts]).astype(np.float32, copy=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Single text as a plain list of floats (binds directly as a `%s::vector` parameter)."""
+        return self.embed([text])[0].tolist()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["encode_seconds"] = round(stats["encode_seconds"], 4)
+        stats.update({"backend": self.backend.model_name, "dimension": self.dimension,
+                      "batch_size": self.batch_size, "num_threads": self.num_threads})
+        if self.cache is not None:
+            stats.update({f"cache_{k}": v for k, v in self.cache.get_stats().items()})
+        else:
+            stats["cache"] = "disabled"
+        return stats
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        if self.cache is not None:
+            self.cache.close()
+
+
+_default_service: Optional[EmbeddingService] = None
+_default_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide EmbeddingService built from config on first use (loads the model once)."""
+    global _default_service
+    if _default_service is None:
+        with _default_service_lock:
+            if _default_service is None:
+                _default_service = EmbeddingService()
+    return _default_service
@@ -0,0 +1,214 @@
+# knowledge_base/policy_index.py
+# In-process index over the policy corpus: clause embeddings in one float32 matrix plus tag/section/keyword
+# postings, so PolicyManager answers semantic, tag and keyword policy queries without a database round-trip.
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+from config import EMBEDDING_DIMENSION
+from retrieval.text_search import clean_terms, word_stems
+from retrieval.vector_cache import rows_to_matrix
+
+POLICY_DOCUMENT_TYPE_PREFIX = "PolicyDocument_"
+
+
+class _PolicyCorpus:
+    """Immutable snapshot; a refresh builds a new one and swaps it in, so searches never see a partial load."""
+    def __init__(self, rows: List[Dict[str, Any]], dimension: int):
+        self.rows, self.matrix = rows_to_matrix(rows, dimension)
+        n = len(self.rows)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix).astype(np.float32)
+
+        sources = [row.get('policy_document_source') or "" for row in self.rows]
+        self.unique_sources = sorted(set(sources))
+        source_code = {src: i for i, src in enumerate(self.unique_sources)}
+        self.source_codes = np.fromiter((source_code[s] for s in sources), dtype=np.int32, count=n)
+        self.pages = np.fromiter(((row.get('page_number') or 0) for row in self.rows), dtype=np.int64, count=n)
+        self.default_order = np.lexsort((self.pages, self.source_codes)) # ORDER BY d.source, dc.page_number
+
+        # Postings: exact tag -> rows, section (policy id tag) -> rows, word stem -> (rows, term frequency)
+        tag_rows: Dict[str, List[int]] = {}; section_rows: Dict[str, List[int]] = {}
+        stem_counts: Dict[str, Dict[int, int]] = {}
+        doc_lengths = np.zeros(n, dtype=np.float32)
+        for i, row in enumerate(self.rows):
+            for tag in set(row.get('chunk_tags') or []):
+                tag_rows.setdefault(tag, []).append(i)
+            if row.get('policy_id_tag'):
+                section_rows.setdefault(row['policy_id_tag'], []).append(i)
+            stems = word_stems(row.get('chunk_text') or "")
+            doc_lengths[i] = len(stems)
+            for stem in stems:
+                counts = stem_counts.setdefault(stem, {})
+                counts[i] = counts.get(i, 0) + 1
+        self.tag_rows = {tag: np.asarray(idx, dtype=np.int64) for tag, idx in tag_rows.items()}
+        self.section_rows = {sec: np.asarray(idx, dtype=np.int64) for sec, idx in section_rows.items()}
+        self.postings = {stem: (np.fromiter(c.keys(), dtype=np.int64, count=len(c)), np.fromiter(c.values(), dtype=np.float32, count=len(c)))
+                         for stem, c in stem_counts.items()}
+        self.length_norm = 1.0 + np.log1p(doc_lengths) # ts_rank_cd-style document length normalisation
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class PolicyVectorIndex:
+    """
+    Mirrors DatabaseManager.search_policy_chunks over an in-memory snapshot of all policy chunks:
+      - document_sources: case-insensitive substring match on the document source (like ILIKE '%src%')
+      - policy_ids: section equals the id or the id is a chunk tag
+      - text_terms: words within a term must all occur (stemmed), terms are ORed; an exact tag match also qualifies
+      - query_embedding: L2 distance over the filtered rows (same metric as pgvector `<->`)
+    Ordering matches the SQL: distance with an embedding, else keyword rank, else source/page.
+    The snapshot is reloaded lazily on the next search after `invalidate()` (wired to the database ingest hook).
+    """
+    def __init__(self, db_manager, dimension: int = EMBEDDING_DIMENSION):
+        self.db_manager = db_manager
+        self.dimension = dimension
+        self._corpus: Optional[_PolicyCorpus] = None
+        self._stale = True
+        self._load_lock = threading.Lock()
+        self._stats = {"loads": 0, "searches": 0, "last_load_seconds": 0.0}
+
+    # --- Loading ---
+
+    def refresh(self) -> int:
+        """Reloads every policy chunk and embedding in one query; returns the number of indexed clauses."""
+        with self._load_lock:
+            self._stale = False # Cleared first: an ingest during the load marks the new snapshot stale again
+            start = time.perf_counter()
+            try:
+                corpus = _PolicyCorpus(self.db_manager.get_policy_chunks_with_embeddings(), self.dimension)
+            except Exception:
+                self._stale = True
+                raise
+            self._corpus = corpus
+            self._stats["loads"] += 1
+            self._stats["last_load_seconds"] = round(time.perf_counter() - start, 4)
+        print(f"INFO: Policy vector index loaded {len(corpus)} clauses in {self._stats['last_load_seconds']:.3f}s.")
+        return len(corpus)
+
+    def invalidate(self):
+        self._stale = True
+
+    def on_document_ingested(self, doc_id: uuid.UUID, document_type: Optional[str]):
+        """DatabaseManager ingest hook; chunk-only writes (document_type None) may belong to a policy document."""
+        if document_type is None or document_type.startswith(POLICY_DOCUMENT_TYPE_PREFIX):
+            self.invalidate()
+
+    def _current(self) -> _PolicyCorpus:
+        if self._stale or self._corpus is None:
+            self.refresh()
+        assert self._corpus is not None
+        return self._corpus
+
+    # --- Search ---
+
+    @staticmethod
+    def _rows_for(postings: Dict[str, np.ndarray], keys: Iterable[str], n: int) -> np.ndarray:
+        mask = np.zeros(n, dtype=bool)
+        for key in keys:
+            rows = postings.get(key)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _keyword_scores(self, corpus: _PolicyCorpus, terms: List[str]) -> np.ndarray:
+        """Per-row relevance (0 where no term matches): summed term frequency of fully matched terms over length norm."""
+        scores = np.zeros(len(corpus), dtype=np.float32)
+        for term in terms:
+            stems = list(dict.fromkeys(word_stems(term)))
+            if not stems or any(stem not in corpus.postings for stem in stems):
+                continue
+            rows, tf = corpus.postings[stems[0]]
+            for stem in stems[1:]: # AND: keep rows containing every word of the term
+                other_rows, other_tf = corpus.postings[stem]
+                rows, left, right = np.intersect1d(rows, other_rows, assume_unique=True, return_indices=True)
+                tf = np.minimum(tf[left], other_tf[right])
+                if len(rows) == 0:
+                    break
+            scores[rows] += tf
+        return scores / corpus.length_norm
+
+    def _filter(self, corpus: _PolicyCorpus, text_terms: Optional[List[str]], policy_ids: Optional[List[str]],
+                document_sources: Optional[List[str]]) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """(row mask, candidate rows, keyword scores or None) for the filters shared by search() and search_multi()."""
+        n = len(corpus)
+        mask = np.ones(n, dtype=bool)
+        if document_sources:
+            wanted = [src.lower() for src in document_sources if src]
+            codes = [i for i, src in enumerate(corpus.unique_sources) if any(w in src.lower() for w in wanted)]
+            mask &= np.isin(corpus.source_codes, codes)
+        if policy_ids:
+            mask &= self._rows_for(corpus.section_rows, policy_ids, n) | self._rows_for(corpus.tag_rows, policy_ids, n)
+        terms = clean_terms(text_terms)
+        keyword_scores = None
+        if terms:
+            keyword_scores = self._keyword_scores(corpus, terms)
+            mask &= (keyword_scores > 0) | self._rows_for(corpus.tag_rows, terms, n)
+        return mask, np.flatnonzero(mask), keyword_scores
+
+    @staticmethod
+    def _nearest(corpus: _PolicyCorpus, candidates: np.ndarray, distances: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        k = min(limit, len(candidates))
+        top = np.argpartition(distances, k - 1)[:k]
+        results = []
+        for pos in top[np.argsort(distances[top], kind="stable")]:
+            row = dict(corpus.rows[candidates[pos]])
+            row['distance'] = float(distances[pos])
+            results.append(row)
+        return results
+
+    def search(self, text_terms: Optional[List[str]] = None, query_embedding: Optional[List[float]] = None,
+               policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+               limit: int = 5) -> List[Dict[str, Any]]:
+        """Same arguments and result rows as DatabaseManager.search_policy_chunks."""
+        corpus = self._current()
+        self._stats["searches"] += 1
+        if len(corpus) == 0 or limit <= 0:
+            return []
+        mask, candidates, keyword_scores = self._filter(corpus, text_terms, policy_ids, document_sources)
+        if len(candidates) == 0:
+            return []
+
+        if query_embedding is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            distances = np.sqrt(np.maximum(corpus.sq_norms[candidates] - 2.0 * (corpus.matrix[candidates] @ query) + float(query @ query), 0.0))
+            return self._nearest(corpus, candidates, distances, limit)
+        if keyword_scores is None:
+            in_default_order = corpus.default_order[mask[corpus.default_order]]
+            return [dict(corpus.rows[i]) for i in in_default_order[:limit]]
+
+        results = []
+        for pos in np.lexsort((corpus.pages[candidates], corpus.source_codes[candidates], -keyword_scores[candidates]))[:limit]:
+            row = dict(corpus.rows[candidates[pos]])
+            row['keyword_rank'] = float(keyword_scores[candidates[pos]])
+            results.append(row)
+        return results
+
+    def search_multi(self, query_embeddings: np.ndarray, text_terms: Optional[List[str]] = None,
+                     policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                     limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        search() for several query embeddings that share one set of filters (DatabaseManager.batch_search_policy_chunks):
+        the filters are applied once and every distance comes from one matrix product. One result list per query.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        corpus = self._current()
+        self._stats["searches"] += len(queries)
+        if len(corpus) == 0 or limit <= 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        _, candidates, _ = self._filter(corpus, text_terms, policy_ids, document_sources)
+        if len(candidates) == 0:
+            return [[] for _ in range(len(queries))]
+        sq_distances = (corpus.sq_norms[candidates][:, None] - 2.0 * (corpus.matrix[candidates] @ queries.T)
+                        + np.einsum("ij,ij->i", queries, queries)[None, :])
+        distances = np.sqrt(np.maximum(sq_distances, 0.0))
+        return [self._nearest(corpus, candidates, distances[:, q], limit) for q in range(len(queries))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["clauses"] = len(self._corpus) if self._corpus is not None else 0
+        stats["stale"] = self._stale
+        return stats
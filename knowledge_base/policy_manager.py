@@ -1,27 +1,54 @@
 # knowledge_base/policy_manager.py
+import asyncio
 import json
 import os
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, TYPE_CHECKING
 from uuid import UUID
 
-from db_manager import DatabaseManager, get_embedding as db_get_embedding
-from config import POLICY_KB_DIR, EMBEDDING_DIMENSION
+from db_manager import DatabaseManager
+from embeddings import EmbeddingService, get_embedding_service
+from config import POLICY_KB_DIR, POLICY_VECTOR_INDEX_ENABLED
+from retrieval.text_search import clean_terms
+from retrieval.hybrid_ranker import reciprocal_rank_fusion
+from knowledge_base.policy_index import PolicyVectorIndex
+
+if TYPE_CHECKING:
+    from async_db_manager import AsyncDatabaseManager
 
 
 class PolicyManager:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, async_db_manager: Optional["AsyncDatabaseManager"] = None,
+                 embedding_service: Optional[EmbeddingService] = None, use_vector_index: bool = POLICY_VECTOR_INDEX_ENABLED):
         self.db_manager = db_manager
+        self.async_db_manager = async_db_manager # Optional; used by search_policies_async
+        self.embedding_service = embedding_service or get_embedding_service()
         print(f"INFO: PolicyManager initialized (uses database for policy storage).")
         self._ensure_default_policies_ingested_if_needed()
+        # The policy corpus is small and rarely changes: keep it in memory and reload it after policy ingests
+        self.policy_index: Optional[PolicyVectorIndex] = None
+        if use_vector_index:
+            self.policy_index = PolicyVectorIndex(db_manager, dimension=self.embedding_service.dimension)
+            db_manager.add_ingest_hook(self.policy_index.on_document_ingested)
+            if async_db_manager is not None:
+                async_db_manager.add_ingest_hook(self.policy_index.on_document_ingested)
+            try:
+                self.policy_index.refresh()
+            except Exception as e:
+                print(f"WARNING: Could not load policy vector index ({type(e).__name__} - {e}). Will retry on first search.")
+
+    def set_async_db_manager(self, async_db_manager: Optional["AsyncDatabaseManager"]):
+        """Serve search_policies_async from `async_db_manager` (policy ingests through it reload the index); None uses worker threads."""
+        if async_db_manager is not None and async_db_manager is not self.async_db_manager and self.policy_index is not None:
+            async_db_manager.add_ingest_hook(self.policy_index.on_document_ingested)
+        self.async_db_manager = async_db_manager
 
     def _ensure_default_policies_ingested_if_needed(self):
         # Check for a known policy document source to see if ingestion might have happened.
         # This is a simple check; a more robust system might use a dedicated metadata table.
-        query = "SELECT doc_id FROM documents WHERE source = %s AND document_type = %s LIMIT 1;"
         # Using a specific source name expected from sample JSON, e.g., "NPPF_SAMPLE" if nppf_sample.json exists
         # Or make it more generic if multiple default files are expected.
         # For this example, let's assume "NPPF_SAMPLE" is a key default policy set.
-        nppf_check = self.db_manager.execute_query(query, ("NPPF_SAMPLE", "PolicyDocument_NPPF"), fetch_one=True)
+        nppf_check = self.db_manager.find_document(source="NPPF_SAMPLE", document_type="PolicyDocument_NPPF")
         if not nppf_check:
             print("WARN: Default NPPF policies not found in DB via PolicyManager check. Attempting dummy ingestion from all JSONs in POLICY_KB_DIR.")
             self._ingest_sample_policies_from_json() 
@@ -48,22 +75,13 @@ class PolicyManager:
                         doc_type = f"PolicyDocument_{doc_type_prefix}"
                         
                         # Check if this "document collection" already exists to avoid re-ingestion
-                        existing_doc_query = "SELECT doc_id FROM documents WHERE filename = %s AND source = %s AND document_type = %s LIMIT 1;"
-                        existing_doc = self.db_manager.execute_query(existing_doc_query, (filename, doc_source_name, doc_type), fetch_one=True)
+                        existing_doc = self.db_manager.find_document(source=doc_source_name, document_type=doc_type, filename=filename)
                         
                         if existing_doc:
                             print(f"Policy doc collection for '{filename}' (source: {doc_source_name}) already in DB. Skipping ingestion for this file.")
                             continue
 
-                        doc_id = self.db_manager.add_document(
-                            filename=filename, 
-                            title=doc_title, 
-                            document_type=doc_type, 
-                            source=doc_source_name, 
-                            page_count=len(policy_list), 
-                            tags=["policy_document", doc_type_prefix.lower()]
-                        )
-                        print(f"INFO: Ingesting policies from {filename} as doc_id {doc_id} (Source: {doc_source_name}, Type: {doc_type})")
+                        policy_chunks = []
                         for i, pol_data in enumerate(policy_list):
                             pol_id_tag = pol_data.get("id", f"{doc_source_name}_Item_{i+1}")
                             # Construct chunk text carefully
@@ -81,119 +99,150 @@ class PolicyManager:
                             if pol_data.get("source_document"): chunk_tags.append(f"src_doc:{pol_data['source_document'].replace(' ', '_')}")
                             if pol_data.get("chapter_or_section_ref"): chunk_tags.append(f"ref:{pol_data['chapter_or_section_ref'].replace(' ', '_')}")
 
-                            self.db_manager.add_document_chunk(
-                                doc_id=doc_id, 
-                                page_number=i + 1, # Using index as a pseudo page number
-                                chunk_text=chunk_txt_final, 
-                                section=pol_id_tag, # Storing policy ID in section for easier lookup
-                                tags=list(set(chunk_tags)) # Ensure unique tags
-                            )
-                        print(f"Successfully ingested {len(policy_list)} policy items from {filename} under doc_id {doc_id}.")
+                            policy_chunks.append({
+                                "page_number": i + 1, # Using index as a pseudo page number
+                                "chunk_text": chunk_txt_final, 
+                                "section": pol_id_tag, # Storing policy ID in section for easier lookup
+                                "tags": list(set(chunk_tags)) # Ensure unique tags
+                            })
+
+                        print(f"INFO: Ingesting policies from {filename} (Source: {doc_source_name}, Type: {doc_type})")
+                        # One transaction per policy file: document row, chunks and embeddings are batched together
+                        ingest_stats = self.db_manager.ingest_document(
+                            filename=filename, 
+                            title=doc_title, 
+                            document_type=doc_type, 
+                            source=doc_source_name, 
+                            chunks=policy_chunks,
+                            page_count=len(policy_list), 
+                            tags=["policy_document", doc_type_prefix.lower()]
+                        )
+                        print(f"Successfully ingested {ingest_stats['chunk_count']} policy items from {filename} under doc_id {ingest_stats['doc_id']}.")
                 except Exception as e: 
                     print(f"ERROR ingesting policies from {filepath}: {type(e).__name__} - {e}")
 
+    def _policy_search_args(self, themes: Optional[List[str]]=None, keywords: Optional[List[str]]=None, 
+                            semantic_query: Optional[str]=None, policy_ids: Optional[List[str]]=None, 
+                            document_sources: Optional[List[str]]=None, limit: int=5) -> Dict[str, Any]:
+        """Maps search_policies arguments onto db_manager.search_policy_chunks (themes and keywords are matched alike)."""
+        return {
+            "text_terms": clean_terms((themes or []) + (keywords or [])),
+            "query_embedding": self.embedding_service.embed_query(semantic_query) if semantic_query else None,
+            "policy_ids": policy_ids,
+            "document_sources": document_sources,
+            "limit": limit,
+        }
+
+    def _format_policy_results(self, results: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        output_list = []
+        if results:
+            for r in results:
+                output_list.append({
+                    "policy_clause_id": str(r["chunk_id"]), 
+                    "policy_id_tag": r["policy_id_tag"], # This is from dc.section
+                    "policy_document_title": r["policy_document_title"],
+                    "policy_document_source": r["policy_document_source"], # e.g. NPPF_SAMPLE
+                    "text_snippet": r["chunk_text"], 
+                    "semantic_distance": r.get("distance"), # Will be None if not semantic_query
+                    "tags": r.get("chunk_tags", [])
+                })
+        return output_list
+
     def search_policies(self, themes: Optional[List[str]]=None, keywords: Optional[List[str]]=None, 
                         semantic_query: Optional[str]=None, policy_ids: Optional[List[str]]=None, 
                         document_sources: Optional[List[str]]=None, limit: int=5) -> List[Dict[str, Any]]:
-        sql_clauses: List[str] = []
-        sql_params: List[Any] = []
-
-        # Filter by document_type (must be a policy document)
-        # Policy documents are identified by type "PolicyDocument_%"
-        sql_clauses.append("d.document_type ILIKE %s")
-        sql_params.append("PolicyDocument_%")
-
-        if document_sources:
-            # document_sources might be like "NPPF", "LocalPlan", etc.
-            # These correspond to d.source like "NPPF_SAMPLE", "LOCAL_PLAN_CORE_STRATEGY"
-            source_conditions = []
-            for src_keyword in document_sources:
-                source_conditions.append("d.source ILIKE %s")
-                sql_params.append(f"%{src_keyword}%")
-            if source_conditions:
-                sql_clauses.append(f"({' OR '.join(source_conditions)})")
-        
-        if policy_ids:
-            # policy_ids are stored in dc.section or as a tag
-            id_conditions = []
-            for pid in policy_ids:
-                id_conditions.append("(dc.section = %s OR %s = ANY(dc.tags))")
-                sql_params.extend([pid, pid])
-            if id_conditions:
-                sql_clauses.append(f"({' OR '.join(id_conditions)})")
-
-        all_text_terms = list(set((themes or []) + (keywords or [])))
-        text_search_conditions = []
-        if all_text_terms:
-            for term in all_text_terms:
-                if term and isinstance(term, str):
-                    text_search_conditions.append("(dc.chunk_text ILIKE %s OR %s = ANY(dc.tags))")
-                    sql_params.extend([f"%{term}%", term])
-            if text_search_conditions:
-                sql_clauses.append(f"({' OR '.join(text_search_conditions)})")
-        
-        cols_to_select = "dc.chunk_id, dc.chunk_text, dc.page_number, dc.section as policy_id_tag, dc.tags as chunk_tags, d.doc_id, d.title as policy_document_title, d.document_type as policy_document_type, d.source as policy_document_source"
-        base_query_select = f"SELECT {cols_to_select}"
-        from_join_clause = " FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
-        
-        final_query_parts = [base_query_select]
-
-        if semantic_query:
-            # Use the get_embedding function imported from db_manager
-            query_embedding = db_get_embedding(semantic_query) 
-            final_query_parts[0] += ", ce.embedding <-> %s::vector AS distance" # Add distance to SELECT
-            from_join_clause += " JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id"
-            # pgvector expects list for embedding param, insert at the beginning of sql_params
-            sql_params.insert(0, query_embedding) 
-            order_by_clause = "ORDER BY distance ASC"
-        else:
-            order_by_clause = "ORDER BY d.source, dc.page_number" # Default order if no semantic query
-
-        final_query_parts.append(from_join_clause)
-        if sql_clauses:
-            final_query_parts.append(f"WHERE {' AND '.join(sql_clauses)}")
-        final_query_parts.append(order_by_clause)
-        final_query_parts.append(f"LIMIT %s")
-        sql_params.append(limit)
-
-        final_query = " ".join(final_query_parts)
-        
+        search_args = self._policy_search_args(themes, keywords, semantic_query, policy_ids, document_sources, limit)
+        if self.policy_index is not None:
+            try:
+                return self._format_policy_results(self.policy_index.search(**search_args))
+            except Exception as e:
+                print(f"WARNING: Policy vector index search failed ({type(e).__name__} - {e}). Falling back to database search.")
         try:
-            results = self.db_manager.execute_query(final_query, tuple(sql_params), fetch_all=True)
-            # print(f"DEBUG: Policy search query: {final_query} with params {sql_params}")
+            results = self.db_manager.search_policy_chunks(**search_args)
             # print(f"DEBUG: Policy search results count: {len(results if results else [])}")
-            
-            output_list = []
-            if results:
-                for r in results:
-                    output_list.append({
-                        "policy_clause_id": str(r["chunk_id"]), 
-                        "policy_id_tag": r["policy_id_tag"], # This is from dc.section
-                        "policy_document_title": r["policy_document_title"],
-                        "policy_document_source": r["policy_document_source"], # e.g. NPPF_SAMPLE
-                        "text_snippet": r["chunk_text"], 
-                        "semantic_distance": r.get("distance"), # Will be None if not semantic_query
-                        "tags": r.get("chunk_tags", [])
-                    })
-            return output_list
+            return self._format_policy_results(results)
         except Exception as e:
             print(f"ERROR during policy search: {type(e).__name__} - {e}")
-            print(f"Failed Query: {final_query}")
-            print(f"Failed Params: {sql_params}")
+            print(f"Failed Search: themes={themes}, keywords={keywords}, semantic_query={semantic_query!r}, policy_ids={policy_ids}, document_sources={document_sources}")
+            return []
+
+    async def search_policies_async(self, themes: Optional[List[str]]=None, keywords: Optional[List[str]]=None, 
+                                    semantic_query: Optional[str]=None, policy_ids: Optional[List[str]]=None, 
+                                    document_sources: Optional[List[str]]=None, limit: int=5) -> List[Dict[str, Any]]:
+        """Event-loop variant of search_policies; falls back to the sync path in a worker thread without an async manager."""
+        if self.async_db_manager is None or self.policy_index is not None: # The in-process index needs no I/O
+            return await asyncio.to_thread(self.search_policies, themes, keywords, semantic_query, policy_ids, document_sources, limit)
+        search_args = await asyncio.to_thread(self._policy_search_args, themes, keywords, semantic_query, policy_ids, document_sources, limit) # Query embedding off the event loop
+        try:
+            results = await self.async_db_manager.search_policy_chunks(**search_args)
+            return self._format_policy_results(results)
+        except Exception as e:
+            print(f"ERROR during async policy search: {type(e).__name__} - {e}")
+            print(f"Failed Search: themes={themes}, keywords={keywords}, semantic_query={semantic_query!r}, policy_ids={policy_ids}, document_sources={document_sources}")
             return []
 
+    def _fuse_policy_results(self, queries: List[str], ranked_lists: List[List[Dict[str, Any]]],
+                             limit: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Reciprocal rank fusion of the per-query lists, one row per clause. Each result carries its best distance
+        (`semantic_distance`), `fused_score`, the 1-based rank in each query's list (`query_ranks`) and the query
+        that ranked it highest (`search_context` / `search_query`).
+        """
+        best_distance: Dict[Any, float] = {}
+        for rows in ranked_lists:
+            for row in rows:
+                if row.get("distance") is not None and row["distance"] < best_distance.get(row["chunk_id"], float("inf")):
+                    best_distance[row["chunk_id"]] = row["distance"]
+        fused = reciprocal_rank_fusion({str(i): rows for i, rows in enumerate(ranked_lists)}, weights={})
+        for row in fused:
+            row["distance"] = best_distance.get(row["chunk_id"], row.get("distance"))
+        fused = fused[:limit] if limit is not None else fused
+        output_list = self._format_policy_results(fused)
+        for result, row in zip(output_list, fused):
+            query_ranks = {int(stage) + 1: rank for stage, rank in row["stage_ranks"].items()}
+            best_query = min(query_ranks, key=lambda q: (query_ranks[q], q))
+            result.update({"fused_score": round(row["rrf_score"], 6), "query_ranks": query_ranks,
+                           "search_context": f"semantic_query_{best_query}", "search_query": queries[best_query - 1]})
+        return output_list
+
+    def search_policies_multi(self, semantic_queries: List[str], themes: Optional[List[str]]=None, keywords: Optional[List[str]]=None,
+                              policy_ids: Optional[List[str]]=None, document_sources: Optional[List[str]]=None,
+                              limit: int=5, fused_limit: Optional[int]=None) -> List[Dict[str, Any]]:
+        """
+        search_policies for several semantic queries sharing one set of filters: the queries are embedded in one batch,
+        searched in one pass (one matrix product in the policy index, one round-trip otherwise) with `limit` clauses
+        each, and the lists are fused and de-duplicated by clause (see _fuse_policy_results), best first.
+        """
+        queries = list(dict.fromkeys(q for q in semantic_queries if q and q.strip()))
+        if not queries: # Filter / keyword search only
+            return self.search_policies(themes, keywords, None, policy_ids, document_sources, fused_limit or limit)
+        search_args = self._policy_search_args(themes, keywords, None, policy_ids, document_sources, limit)
+        search_args.pop("query_embedding")
+        embeddings = self.embedding_service.embed(queries)
+        ranked_lists = None
+        if self.policy_index is not None:
+            try:
+                ranked_lists = self.policy_index.search_multi(embeddings, **search_args)
+            except Exception as e:
+                print(f"WARNING: Policy vector index search failed ({type(e).__name__} - {e}). Falling back to database search.")
+        if ranked_lists is None:
+            try:
+                ranked_lists = self.db_manager.batch_search_policy_chunks(embeddings.tolist(), **search_args)
+            except Exception as e:
+                print(f"ERROR during batched policy search: {type(e).__name__} - {e}")
+                print(f"Failed Search: themes={themes}, keywords={keywords}, semantic_queries={queries!r}, policy_ids={policy_ids}, document_sources={document_sources}")
+                return []
+        return self._fuse_policy_results(queries, ranked_lists, fused_limit)
+
+    def refresh_policy_index(self) -> int:
+        """Reloads the in-process policy index now (it also reloads itself after policy documents are ingested)."""
+        return self.policy_index.refresh() if self.policy_index is not None else 0
+
     def get_policy_details_by_id_tag(self, policy_id_tag: str) -> Optional[Dict[str, Any]]:
         # This method aims to get more structured details if available, 
         # potentially by reconstructing from the chunk or if policies were stored more atomically.
         # For now, it's similar to get_policy_full_text_by_id_tag but could be expanded.
-        query = """
-        SELECT dc.chunk_id, dc.chunk_text, dc.section as policy_id_tag, d.title as doc_title, d.source as doc_source
-        FROM document_chunks dc
-        JOIN documents d ON dc.doc_id = d.doc_id
-        WHERE dc.section = %s AND d.document_type ILIKE 'PolicyDocument_%'
-        LIMIT 1;
-        """
-        result = self.db_manager.execute_query(query, (policy_id_tag,), fetch_one=True)
+        result = self.db_manager.get_policy_chunk_by_id_tag(policy_id_tag)
         if result:
             # Attempt to parse structured info if stored in chunk_text or infer from context
             # For now, returning the main fields
@@ -209,14 +258,7 @@ class PolicyManager:
     def get_policy_full_text_by_id_tag(self, policy_id_tag: str) -> Optional[str]:
         # Assumes the 'section' in document_chunks stores the unique policy ID tag
         # and the chunk_text for that section contains the relevant text.
-        query = """
-        SELECT chunk_text 
-        FROM document_chunks dc
-        JOIN documents d ON dc.doc_id = d.doc_id
-        WHERE dc.section = %s AND d.document_type ILIKE 'PolicyDocument_%' 
-        LIMIT 1;
-        """
-        result = self.db_manager.execute_query(query, (policy_id_tag,), fetch_one=True)
+        result = self.db_manager.get_policy_chunk_by_id_tag(policy_id_tag)
         return result['chunk_text'] if result else None
 
     # This method was in the target IntentDefiner, but not in this PolicyManager.
@@ -0,0 +1,801 @@
+# local_db_manager.py
+# Embedded, in-process storage backend: documents, chunks and logs in SQLite (FTS5 for keyword search) and chunk
+# embeddings in a memory-mapped float32 NumPy matrix searched with vectorized L2 distance.
+# Implements the DatabaseManager contract, so AgenticRetriever, PolicyManager and ApplicationContextManager run on it
+# unchanged. Intended for single-application runs and CI, where a Postgres/pgvector server is overkill.
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
+
+import numpy as np
+
+from config import LOCAL_DB_DIR, EMBEDDING_DIMENSION, EVIDENCE_INDEX_ENABLED, EVIDENCE_TAG_LEAD_CHARS, SUMMARY_EMBEDDINGS_AT_INGEST
+from embeddings import get_embedding_service
+from retrieval.text_search import clean_terms
+from retrieval.hierarchy import summary_rows, nearest
+
+LOCAL_DB_FILENAME = "agentic_retrieval.sqlite3"
+LOCAL_EMBEDDINGS_FILENAME = "chunk_embeddings.f32" # Raw float32 matrix, one EMBEDDING_DIMENSION row per chunk
+EMBEDDING_GROWTH_ROWS = 1024 # Minimum number of rows the embedding file grows by
+
+_UUID_COLUMNS = {"chunk_id", "doc_id", "log_id"}
+_JSON_COLUMNS = {"tags", "chunk_tags", "filters", "matched_chunk_ids", "evidence_categories"}
+
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+  doc_id TEXT PRIMARY KEY,
+  filename TEXT NOT NULL,
+  title TEXT,
+  document_type TEXT,
+  source TEXT,
+  page_count INTEGER,
+  upload_date TEXT,
+  tags TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_documents_source_type ON documents (source, document_type);
+
+CREATE TABLE IF NOT EXISTS document_chunks (
+  chunk_rowid INTEGER PRIMARY KEY,
+  chunk_id TEXT NOT NULL UNIQUE,
+  doc_id TEXT NOT NULL REFERENCES documents(doc_id) ON DELETE CASCADE,
+  page_number INTEGER,
+  section TEXT,
+  chunk_text TEXT NOT NULL,
+  tags TEXT NOT NULL DEFAULT '[]',
+  created_at TEXT NOT NULL,
+  embedding_row INTEGER UNIQUE -- Row of this chunk's vector in the embeddings matrix
+);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_doc_order ON document_chunks (doc_id, page_number, created_at);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_section ON document_chunks (section);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS document_chunks_fts USING fts5(
+  chunk_text, content='document_chunks', content_rowid='chunk_rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS trg_document_chunks_fts_insert AFTER INSERT ON document_chunks BEGIN
+  INSERT INTO document_chunks_fts (rowid, chunk_text) VALUES (new.chunk_rowid, new.chunk_text);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_document_chunks_fts_delete AFTER DELETE ON document_chunks BEGIN
+  INSERT INTO document_chunks_fts (document_chunks_fts, rowid, chunk_text) VALUES ('delete', old.chunk_rowid, old.chunk_text);
+END;
+
+CREATE TABLE IF NOT EXISTS evidence_index ( -- migrations/004 application_evidence_index; chunk_ids is a JSON array
+  source TEXT NOT NULL,
+  category TEXT NOT NULL,
+  chunk_ids TEXT NOT NULL DEFAULT '[]',
+  updated_at TEXT,
+  PRIMARY KEY (source, category)
+);
+
+CREATE TABLE IF NOT EXISTS summary_embeddings ( -- migrations/005 document_summary_embeddings; embedding is float32 bytes
+  doc_id TEXT NOT NULL REFERENCES documents(doc_id) ON DELETE CASCADE,
+  level TEXT NOT NULL,
+  section TEXT NOT NULL DEFAULT '',
+  chunk_count INTEGER NOT NULL,
+  embedding BLOB NOT NULL,
+  PRIMARY KEY (doc_id, level, section)
+);
+
+CREATE TABLE IF NOT EXISTS retrieval_logs (
+  log_id TEXT PRIMARY KEY,
+  timestamp TEXT,
+  query TEXT,
+  filters TEXT,
+  matched_chunk_ids TEXT,
+  agent_context TEXT
+);
+"""
+
+# Mirrors SEMANTIC_CHUNK_QUERY / build_chunk_search_query column names in db_manager.py
+_CHUNK_COLUMNS = "dc.chunk_id, dc.chunk_text, dc.page_number, dc.section, d.doc_id, d.title as doc_title, d.document_type"
+_CHUNK_COLUMNS_NO_TEXT = _CHUNK_COLUMNS.replace("dc.chunk_text", "length(dc.chunk_text) AS chunk_chars") # db_manager.chunk_result_columns(False)
+_POLICY_COLUMNS = ("dc.chunk_id, dc.chunk_text, dc.page_number, dc.section as policy_id_tag, dc.tags as chunk_tags, d.doc_id, "
+                   "d.title as policy_document_title, d.document_type as policy_document_type, d.source as policy_document_source")
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+
+
+def _to_sqlite_param(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return json.dumps([str(v) if isinstance(v, uuid.UUID) else v for v in value])
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _from_sqlite_row(row: sqlite3.Row) -> Dict[str, Any]:
+    """Returns rows shaped like RealDictCursor rows from DatabaseManager (uuid.UUID ids, list tags)."""
+    out: Dict[str, Any] = {}
+    for key in row.keys():
+        value = row[key]
+        if value is not None and key in _UUID_COLUMNS:
+            value = uuid.UUID(value)
+        elif value is not None and key in _JSON_COLUMNS:
+            value = json.loads(value)
+        out[key] = value
+    return out
+
+
+def fts_match_expression(terms: Optional[List[Any]]) -> Optional[str]:
+    """
+    FTS5 equivalent of retrieval.text_search.build_keyword_clause: words within a term are ANDed, terms are ORed.
+    Every word is quoted, so user text cannot inject FTS5 query syntax.
+    """
+    groups = []
+    for term in clean_terms(terms):
+        words = re.findall(r"\w+", term.lower())
+        if words:
+            groups.append("(" + " AND ".join(f'"{w}"' for w in words) + ")")
+    return " OR ".join(groups) if groups else None
+
+
+def _placeholders(values: List[Any]) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _document_filter(document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None) -> Tuple[List[str], List[Any]]:
+    """SQLite form of db_manager.chunk_filter_clauses (over the documents table aliased d)."""
+    clauses: List[str] = []; params: List[Any] = []
+    if document_types:
+        clauses.append(f"d.document_type IN ({_placeholders(document_types)})"); params.extend(document_types)
+    if sources:
+        clauses.append(f"d.source IN ({_placeholders(sources)})"); params.extend(sources)
+    return clauses, params
+
+
+class LocalDatabaseManager:
+    """
+    SQLite + NumPy implementation of the DatabaseManager contract (no server, no network round-trips).
+
+    One SQLite connection is shared by all threads behind a re-entrant lock, so ParallelProcessor workers
+    serialise on it; for small corpora each query is sub-millisecond, which is still far cheaper than a socket.
+    Embeddings live in `chunk_embeddings.f32` (memory-mapped, grown in EMBEDDING_GROWTH_ROWS steps); squared
+    row norms are kept in memory so a search is one matrix-vector product plus argpartition.
+    execute_query accepts simple SQL written with %s placeholders; Postgres-only syntax must go through the
+    search methods instead.
+    """
+    def __init__(self, db_dir: str = LOCAL_DB_DIR, embedding_dimension: int = EMBEDDING_DIMENSION):
+        self.db_dir = db_dir
+        self.embedding_dimension = embedding_dimension
+        os.makedirs(db_dir, exist_ok=True)
+        self.db_path = os.path.join(db_dir, LOCAL_DB_FILENAME)
+        self.embeddings_path = os.path.join(db_dir, LOCAL_EMBEDDINGS_FILENAME)
+        self.fresh_database = not os.path.exists(self.db_path) # Mirrors MigrationRunner.fresh_database for main.py
+
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        self._close_hooks: List[Callable[[], None]] = []
+        self._ingest_hooks: List[Callable[[uuid.UUID, Optional[str]], None]] = []
+        self._pending_summary_docs: set = set() # add_document_chunk writes; summarised before the next hierarchical search
+        self._pending_ingest: Optional[Dict[uuid.UUID, Optional[str]]] = None # Ingest notifications held until commit
+        self.conn: Optional[sqlite3.Connection] = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON;")
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.executescript(LOCAL_SCHEMA)
+
+        self._embeddings: Optional[np.memmap] = None
+        self._embedding_capacity = 0
+        self._embedding_count = 0
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._load_embeddings()
+        self._summaries_backfilled = False
+        print(f"INFO: LocalDatabaseManager using {self.db_path} ({self._embedding_count} embedded chunks).")
+
+    # --- Embedding matrix ---
+
+    def _load_embeddings(self):
+        row = self.conn.execute("SELECT COALESCE(MAX(embedding_row) + 1, 0) AS n FROM document_chunks;").fetchone()
+        self._embedding_count = int(row["n"])
+        row_bytes = self.embedding_dimension * 4
+        file_rows = os.path.getsize(self.embeddings_path) // row_bytes if os.path.exists(self.embeddings_path) else 0
+        if file_rows < self._embedding_count:
+            raise RuntimeError(f"{self.embeddings_path} holds {file_rows} rows but the database references {self._embedding_count}.")
+        self._embedding_capacity = file_rows
+        self._embeddings = self._open_memmap() if file_rows else None
+        if self._embeddings is not None and self._embedding_count:
+            active = self._embeddings[:self._embedding_count]
+            self._sq_norms = np.einsum("ij,ij->i", active, active).astype(np.float32)
+        else:
+            self._sq_norms = np.zeros(0, dtype=np.float32)
+
+    def _open_memmap(self) -> np.memmap:
+        return np.memmap(self.embeddings_path, dtype=np.float32, mode="r+", shape=(self._embedding_capacity, self.embedding_dimension))
+
+    def _append_embeddings(self, vectors: np.ndarray) -> int:
+        """Writes vectors after the last used row (growing the file if needed); returns the first row index."""
+        first_row = self._embedding_count
+        needed = first_row + len(vectors)
+        if needed > self._embedding_capacity:
+            if self._embeddings is not None:
+                self._embeddings.flush()
+                self._embeddings = None
+            new_capacity = max(needed, self._embedding_capacity * 2, EMBEDDING_GROWTH_ROWS)
+            with open(self.embeddings_path, "ab") as f_emb:
+                f_emb.truncate(new_capacity * self.embedding_dimension * 4)
+            self._embedding_capacity = new_capacity
+            self._embeddings = self._open_memmap()
+        assert self._embeddings is not None
+        self._embeddings[first_row:needed] = vectors
+        self._embeddings.flush()
+        self._sq_norms = np.concatenate([self._sq_norms[:first_row], np.einsum("ij,ij->i", vectors, vectors).astype(np.float32)])
+        self._embedding_count = needed
+        return first_row
+
+    def _summary_matrix(self, rows: List[sqlite3.Row]) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        return np.frombuffer(b"".join(row['embedding'] for row in rows), dtype=np.float32).reshape(len(rows), self.embedding_dimension)
+
+    def _refresh_summaries(self, conn: sqlite3.Connection, doc_ids: List[str]):
+        """Recomputes the documents' summary embeddings (retrieval/hierarchy.py) from their rows in the embeddings matrix."""
+        if not doc_ids or self._embeddings is None:
+            return
+        rows = conn.execute(f"SELECT doc_id, section, embedding_row FROM document_chunks WHERE doc_id IN ({_placeholders(doc_ids)}) "
+                            "AND embedding_row IS NOT NULL;", doc_ids).fetchall()
+        if not rows:
+            return
+        vectors = np.asarray(self._embeddings[[row['embedding_row'] for row in rows]], dtype=np.float32)
+        conn.executemany("""
+        INSERT INTO summary_embeddings (doc_id, level, section, chunk_count, embedding) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (doc_id, level, section) DO UPDATE SET chunk_count = excluded.chunk_count, embedding = excluded.embedding;
+        """, [(doc_id, level, section, count, vector.astype(np.float32).tobytes())
+              for doc_id, level, section, count, vector in summary_rows([row['doc_id'] for row in rows], [row['section'] for row in rows], vectors)])
+
+    def _backfill_summary_embeddings(self):
+        """Summaries for documents stored without them (SUMMARY_EMBEDDINGS_AT_INGEST off); run before the first hierarchical search."""
+        with self.connection() as conn:
+            missing = [row['doc_id'] for row in conn.execute(
+                "SELECT DISTINCT doc_id FROM document_chunks WHERE doc_id NOT IN (SELECT doc_id FROM summary_embeddings);").fetchall()]
+        if missing:
+            with self.transaction() as conn:
+                self._pending_summary_docs.difference_update(missing)
+                self._refresh_summaries(conn, missing)
+            print(f"INFO: Built summary embeddings for {len(missing)} documents.")
+
+    def refresh_summary_embeddings(self, doc_ids: List[uuid.UUID]):
+        with self.transaction() as conn:
+            self._pending_summary_docs.difference_update(str(d) for d in doc_ids)
+            self._refresh_summaries(conn, [str(d) for d in doc_ids])
+
+    def refresh_pending_summary_embeddings(self) -> int:
+        """Same as DatabaseManager.refresh_pending_summary_embeddings."""
+        with self._lock:
+            if not self._summaries_backfilled:
+                self._backfill_summary_embeddings()
+                self._summaries_backfilled = True
+            pending = list(self._pending_summary_docs)
+            if pending:
+                self.refresh_summary_embeddings(pending)
+        return len(pending)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = get_embedding_service().embed(texts)
+        if vectors.shape[1] != self.embedding_dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the local store ({self.embedding_dimension}).")
+        return vectors
+
+    def _nearest_rows(self, query_embedding: List[float], limit: int, candidate_rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Exact L2 nearest neighbours over all rows, or over `candidate_rows` only; returns (row, distance) ascending."""
+        if self._embeddings is None or self._embedding_count == 0 or limit <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if candidate_rows is None:
+            matrix = self._embeddings[:self._embedding_count]; sq_norms = self._sq_norms
+            rows = np.arange(self._embedding_count)
+        else:
+            if len(candidate_rows) == 0:
+                return []
+            rows = np.asarray(candidate_rows, dtype=np.int64)
+            matrix = self._embeddings[rows]; sq_norms = self._sq_norms[rows]
+        distances = np.sqrt(np.maximum(sq_norms - 2.0 * (matrix @ query) + float(query @ query), 0.0))
+        k = min(limit, len(distances))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(int(rows[i]), float(distances[i])) for i in top]
+
+    # --- Core contract ---
+
+    @property
+    def is_pooled(self) -> bool:
+        return False
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self.conn is None:
+                raise RuntimeError("LocalDatabaseManager is closed.")
+            yield self.conn
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return {"mode": "local", "pool_size": 1, "connected": self.conn is not None, "path": self.db_path,
+                "embedded_chunks": self._embedding_count, "embedding_capacity": self._embedding_capacity}
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False, fetch_all: bool = False) -> Any:
+        sqlite_query = query.replace("%s", "?").replace("%%", "%")
+        sqlite_params = tuple(_to_sqlite_param(p) for p in (params or ()))
+        with self.connection() as conn:
+            try:
+                cur = conn.execute(sqlite_query, sqlite_params)
+                if fetch_one:
+                    row = cur.fetchone()
+                    return _from_sqlite_row(row) if row else None
+                if fetch_all:
+                    return [_from_sqlite_row(row) for row in cur.fetchall()]
+                return None
+            except sqlite3.Error as e:
+                print(f"ERROR: Local DB Query failed: {type(e).__name__} - {e}")
+                print(f"Query: {query[:500]}...")
+                print(f"Params: {params}")
+                raise
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Single transaction for the block; nested transaction() calls join the outermost one. Ingest hooks raised
+        inside it run once per document after the outermost commit (none after a rollback).
+        """
+        committed = False
+        with self.connection() as conn:
+            outermost = self._tx_depth == 0
+            if outermost:
+                conn.execute("BEGIN;")
+                self._pending_ingest = {}
+            self._tx_depth += 1
+            try:
+                yield conn
+                if outermost:
+                    conn.execute("COMMIT;")
+                    committed = True
+            except Exception:
+                if outermost:
+                    conn.execute("ROLLBACK;")
+                    self._load_embeddings() # Forget vectors written for rows that were rolled back
+                raise
+            finally:
+                self._tx_depth -= 1
+                if outermost:
+                    pending_ingest, self._pending_ingest = self._pending_ingest, None
+        if committed:
+            for doc_id, document_type in pending_ingest.items():
+                self._notify_ingest(doc_id, document_type)
+
+    def add_document(self, filename: str, title: Optional[str], document_type: Optional[str], source: Optional[str], page_count: Optional[int], tags: Optional[List[str]] = None) -> uuid.UUID:
+        doc_id_val = uuid.uuid4()
+        self.execute_query(
+            "INSERT INTO documents (doc_id, filename, title, document_type, source, page_count, upload_date, tags) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
+            (doc_id_val, filename, title, document_type, source, page_count, datetime.now(timezone.utc).date().isoformat(), tags or []))
+        self._notify_ingest(doc_id_val, document_type)
+        return doc_id_val
+
+    def add_document_chunk(self, doc_id: uuid.UUID, page_number: Optional[int], chunk_text: str, section: Optional[str] = None, tags: Optional[List[str]] = None) -> uuid.UUID:
+        chunk = {"page_number": page_number, "chunk_text": chunk_text, "section": section, "tags": tags}
+        return self._add_chunks(doc_id, [chunk], refresh_summaries=False)[0]
+
+    def add_document_chunks_bulk(self, doc_id: uuid.UUID, chunks: List[Dict[str, Any]], page_size: int = 500) -> List[uuid.UUID]:
+        """Same contract as DatabaseManager.add_document_chunks_bulk; page_size is accepted for compatibility."""
+        return self._add_chunks(doc_id, chunks, refresh_summaries=SUMMARY_EMBEDDINGS_AT_INGEST)
+
+    def _add_chunks(self, doc_id: uuid.UUID, chunks: List[Dict[str, Any]], refresh_summaries: bool) -> List[uuid.UUID]:
+        if not chunks:
+            return []
+        chunk_ids = [uuid.uuid4() for _ in chunks]
+        vectors = self._embed([c['chunk_text'] for c in chunks])
+        created_at = _utc_now()
+        with self.transaction() as conn:
+            first_row = self._append_embeddings(vectors)
+            conn.executemany(
+                "INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text, tags, created_at, embedding_row) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                [(str(cid), str(doc_id), c.get('page_number'), c.get('section'), c['chunk_text'], json.dumps(c.get('tags') or []), created_at, first_row + i)
+                 for i, (cid, c) in enumerate(zip(chunk_ids, chunks))])
+            if refresh_summaries:
+                self._pending_summary_docs.discard(str(doc_id))
+                self._refresh_summaries(conn, [str(doc_id)])
+            else: # One refresh per document, not per chunk (refresh_pending_summary_embeddings)
+                self._pending_summary_docs.add(str(doc_id))
+        self._notify_ingest(doc_id, None)
+        return chunk_ids
+
+    def ingest_document(self, filename: str, title: Optional[str], document_type: Optional[str], source: Optional[str],
+                        chunks: List[Dict[str, Any]], page_count: Optional[int] = None, tags: Optional[List[str]] = None,
+                        page_size: int = 500) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with self.transaction():
+            doc_id = self.add_document(filename, title, document_type, source, page_count, tags)
+            chunk_ids = self.add_document_chunks_bulk(doc_id, chunks, page_size=page_size)
+            evidence_tags = self._index_evidence(source, {"filename": filename, "title": title, "document_type": document_type},
+                                                 chunks, chunk_ids)
+        elapsed = time.perf_counter() - start
+        rows_written = 1 + 2 * len(chunk_ids) # documents + document_chunks + embedding rows
+        stats = {
+            "doc_id": doc_id,
+            "chunk_ids": chunk_ids,
+            "chunk_count": len(chunk_ids),
+            "evidence_tags": evidence_tags,
+            "rows_written": rows_written,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_second": round(rows_written / elapsed, 1) if elapsed > 0 else None,
+        }
+        print(f"INFO: Ingested '{filename}' ({len(chunk_ids)} chunks, {rows_written} rows) in {elapsed:.3f}s ({stats['rows_per_second']} rows/s).")
+        return stats
+
+    def _append_evidence(self, conn: sqlite3.Connection, source: str, categories: List[str], chunk_ids: List[uuid.UUID]):
+        grouped: Dict[str, List[str]] = {}
+        for category, chunk_id in zip(categories, chunk_ids):
+            grouped.setdefault(category, []).append(str(chunk_id))
+        conn.executemany("""
+        INSERT INTO evidence_index (source, category, chunk_ids, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (source, category) DO UPDATE
+        SET chunk_ids = (SELECT json_group_array(value) FROM (SELECT value FROM json_each(evidence_index.chunk_ids)
+                                                              UNION ALL SELECT value FROM json_each(excluded.chunk_ids))),
+            updated_at = excluded.updated_at;
+        """, [(source, category, json.dumps(ids), _utc_now()) for category, ids in grouped.items()])
+
+    def _index_evidence(self, source: Optional[str], document: Dict[str, Any], chunks: List[Dict[str, Any]],
+                        chunk_ids: List[uuid.UUID]) -> int:
+        if not EVIDENCE_INDEX_ENABLED or not source or not chunk_ids:
+            return 0
+        from retrieval.evidence_index import get_evidence_tagger
+        categories, tagged_ids = get_evidence_tagger().index_entries(document, chunks, chunk_ids)
+        if categories:
+            with self.transaction() as conn:
+                self._append_evidence(conn, source, categories, tagged_ids)
+        return len(categories)
+
+    def replace_evidence_index(self, source: str, categories: List[str], chunk_ids: List[uuid.UUID]):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM evidence_index WHERE source = ?;", (source,))
+            self._append_evidence(conn, source, list(categories), list(chunk_ids))
+
+    def get_evidence_tagging_rows(self, sources: List[str]) -> List[Dict[str, Any]]:
+        sources = list(sources)
+        if not sources:
+            return []
+        with self.connection() as conn:
+            rows = conn.execute(f"""
+            SELECT dc.chunk_id, dc.section, substr(dc.chunk_text, 1, ?) AS chunk_text, d.doc_id, d.filename, d.title, d.document_type
+            FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id
+            WHERE d.source IN ({_placeholders(sources)})
+            ORDER BY d.doc_id, dc.page_number, dc.created_at, dc.chunk_rowid;
+            """, [EVIDENCE_TAG_LEAD_CHARS] + sources).fetchall()
+        return [_from_sqlite_row(r) for r in rows]
+
+    def get_evidence_chunks(self, sources: List[str], categories: List[str], include_text: bool = True) -> List[Dict[str, Any]]:
+        sources, categories = list(sources), list(categories)
+        if not sources or not categories:
+            return []
+        with self.connection() as conn:
+            rows = conn.execute(f"""
+            WITH hits AS (
+              SELECT je.value AS chunk_id, json_group_array(DISTINCT ei.category) AS evidence_categories
+              FROM evidence_index ei, json_each(ei.chunk_ids) je
+              WHERE ei.source IN ({_placeholders(sources)}) AND ei.category IN ({_placeholders(categories)})
+              GROUP BY je.value
+            )
+            SELECT {_CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT}, d.source, hits.evidence_categories
+            FROM hits
+            JOIN document_chunks dc ON dc.chunk_id = hits.chunk_id
+            JOIN documents d ON dc.doc_id = d.doc_id
+            ORDER BY d.doc_id, dc.page_number, dc.created_at, dc.chunk_rowid;
+            """, sources + categories).fetchall()
+        return [_from_sqlite_row(r) for r in rows]
+
+    def get_full_document_text_by_id(self, doc_id: uuid.UUID) -> Optional[str]:
+        with self.connection() as conn:
+            rows = conn.execute("SELECT chunk_text FROM document_chunks WHERE doc_id = ? "
+                                "ORDER BY page_number, created_at, chunk_rowid;", (str(doc_id),)).fetchall()
+        return "\n\n".join(row['chunk_text'] for row in rows) if rows else None
+
+    def get_chunk_texts(self, chunk_ids: List[uuid.UUID]) -> Dict[uuid.UUID, str]:
+        if not chunk_ids:
+            return {}
+        ids = [str(c) for c in chunk_ids]
+        with self.connection() as conn:
+            rows = conn.execute(f"SELECT chunk_id, chunk_text FROM document_chunks WHERE chunk_id IN ({_placeholders(ids)});", ids).fetchall()
+        return {uuid.UUID(row['chunk_id']): row['chunk_text'] for row in rows}
+
+    def get_chunk_embeddings(self, chunk_ids: List[uuid.UUID]) -> List[Dict[str, Any]]:
+        if not chunk_ids or self._embeddings is None:
+            return []
+        ids = [str(c) for c in chunk_ids]
+        with self.connection() as conn:
+            rows = conn.execute(f"SELECT chunk_id, embedding_row FROM document_chunks WHERE chunk_id IN ({_placeholders(ids)}) "
+                                "AND embedding_row IS NOT NULL;", ids).fetchall()
+        return [{"chunk_id": uuid.UUID(row['chunk_id']), "embedding": np.array(self._embeddings[row['embedding_row']])} for row in rows]
+
+    def get_section_chunks(self, doc_sections: List[Tuple[uuid.UUID, str]], max_chunks_per_section: Optional[int] = None,
+                           include_text: bool = True) -> List[Dict[str, Any]]:
+        if not doc_sections:
+            return []
+        pairs = " OR ".join(["(dc.doc_id = ? AND dc.section = ?)"] * len(doc_sections))
+        params: List[Any] = [v for doc_id, section in doc_sections for v in (str(doc_id), section)]
+        with self.connection() as conn:
+            rows = conn.execute(f"""
+            SELECT * FROM (
+              SELECT {_CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT}, dc.created_at, dc.chunk_rowid,
+                     COUNT(*) OVER (PARTITION BY dc.doc_id, dc.section) AS section_chunk_count
+              FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id
+              WHERE {pairs}
+            ) WHERE section_chunk_count <= ?
+            ORDER BY doc_id, page_number, created_at, chunk_rowid;
+            """, params + [max_chunks_per_section if max_chunks_per_section is not None else 2 ** 62]).fetchall()
+        results = []
+        for row in map(_from_sqlite_row, rows):
+            for key in ('created_at', 'chunk_rowid', 'section_chunk_count'):
+                row.pop(key, None)
+            results.append(row)
+        return results
+
+    def get_neighbour_chunks(self, chunk_ids: List[uuid.UUID], window: int, include_text: bool = True) -> List[Dict[str, Any]]:
+        if not chunk_ids or window <= 0:
+            return []
+        ids = [str(c) for c in chunk_ids]
+        with self.connection() as conn:
+            rows = conn.execute(f"""
+            WITH ordered AS (
+              SELECT {_CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT},
+                     row_number() OVER (PARTITION BY dc.doc_id ORDER BY dc.page_number, dc.created_at, dc.chunk_rowid) AS doc_position
+              FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id
+              WHERE dc.doc_id IN (SELECT doc_id FROM document_chunks WHERE chunk_id IN ({_placeholders(ids)}))
+            )
+            SELECT o.* FROM ordered o
+            WHERE EXISTS (SELECT 1 FROM ordered h
+                          WHERE h.chunk_id IN ({_placeholders(ids)}) AND h.doc_id = o.doc_id
+                            AND o.doc_position BETWEEN h.doc_position - ? AND h.doc_position + ?)
+            ORDER BY o.doc_id, o.doc_position;
+            """, ids + ids + [window, window]).fetchall()
+        return [_from_sqlite_row(r) for r in rows]
+
+    # --- Search contract (see the query builders in db_manager.py for the Postgres equivalents) ---
+
+    def _fetch_chunk_rows_by_embedding_row(self, columns: str, ranked_rows: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        if not ranked_rows:
+            return []
+        row_ids = [r for r, _ in ranked_rows]
+        with self.connection() as conn:
+            fetched = conn.execute(f"SELECT {columns}, dc.embedding_row FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+                                   f"WHERE dc.embedding_row IN ({_placeholders(row_ids)});", row_ids).fetchall()
+        by_row = {r['embedding_row']: _from_sqlite_row(r) for r in fetched}
+        results = []
+        for emb_row, distance in ranked_rows:
+            if emb_row in by_row:
+                result = by_row[emb_row]; result.pop('embedding_row', None); result['distance'] = distance
+                results.append(result)
+        return results
+
+    def semantic_search_chunks(self, query_embedding: List[float], limit: int = 10, document_types: Optional[List[str]] = None,
+                               sources: Optional[List[str]] = None, include_text: bool = True) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            candidate_rows = None
+            if document_types or sources:
+                # Filter in SQLite, then rank only the surviving chunks
+                clauses, params = _document_filter(document_types, sources)
+                rows = conn.execute("SELECT dc.embedding_row FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+                                    f"WHERE {' AND '.join(clauses)};", params).fetchall()
+                candidate_rows = np.fromiter((r['embedding_row'] for r in rows), dtype=np.int64, count=len(rows))
+            return self._fetch_chunk_rows_by_embedding_row(_CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT,
+                                                           self._nearest_rows(query_embedding, limit, candidate_rows))
+
+    def hierarchical_search_chunks(self, query_embedding: List[float], limit: int, doc_limit: int, section_limit: int,
+                                   document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                                   include_text: bool = True) -> List[Dict[str, Any]]:
+        """Same contract as DatabaseManager.hierarchical_search_chunks: documents, then sections, then chunks within them."""
+        self.refresh_pending_summary_embeddings()
+        query = np.asarray(query_embedding, dtype=np.float32)
+        clauses, params = _document_filter(document_types, sources)
+        with self.connection() as conn:
+            docs = conn.execute("SELECT s.doc_id, s.embedding FROM summary_embeddings s JOIN documents d ON d.doc_id = s.doc_id "
+                                "WHERE " + " AND ".join(["s.level = 'document'"] + clauses) + ";", params).fetchall()
+            doc_ids = [docs[i]['doc_id'] for i in nearest(self._summary_matrix(docs), query, doc_limit)[0]]
+            if not doc_ids:
+                return []
+            sections = conn.execute(f"SELECT doc_id, section, embedding FROM summary_embeddings WHERE level = 'section' "
+                                    f"AND doc_id IN ({_placeholders(doc_ids)});", doc_ids).fetchall()
+            pairs = [(sections[i]['doc_id'], sections[i]['section']) for i in nearest(self._summary_matrix(sections), query, section_limit)[0]]
+            if not pairs:
+                return []
+            rows = conn.execute("SELECT embedding_row FROM document_chunks WHERE embedding_row IS NOT NULL AND ("
+                                + " OR ".join(["(doc_id = ? AND coalesce(section, '') = ?)"] * len(pairs)) + ");",
+                                [v for pair in pairs for v in pair]).fetchall()
+            candidate_rows = np.fromiter((r['embedding_row'] for r in rows), dtype=np.int64, count=len(rows))
+            return self._fetch_chunk_rows_by_embedding_row(_CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT,
+                                                           self._nearest_rows(query_embedding, limit, candidate_rows))
+
+    def search_chunks(self, document_types: Optional[List[str]] = None, sources: Optional[List[str]] = None,
+                      keywords: Optional[List[str]] = None, limit: int = 75, include_text: bool = True) -> List[Dict[str, Any]]:
+        clauses: List[str] = []; params: List[Any] = []
+        select_cols = _CHUNK_COLUMNS if include_text else _CHUNK_COLUMNS_NO_TEXT
+        from_clause = "FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
+        order_by = ""
+        if match_expr := fts_match_expression(keywords):
+            # bm25() is lower-is-better; negate it so keyword_rank orders DESC like ts_rank_cd
+            from_clause += " JOIN (SELECT rowid AS fts_rowid, -bm25(document_chunks_fts) AS keyword_rank FROM document_chunks_fts WHERE document_chunks_fts MATCH ?) k ON k.fts_rowid = dc.chunk_rowid"
+            params.append(match_expr)
+            select_cols += ", k.keyword_rank"
+            order_by = " ORDER BY k.keyword_rank DESC"
+        if document_types:
+            clauses.append(f"d.document_type IN ({_placeholders(document_types)})"); params.extend(document_types)
+        if sources:
+            clauses.append(f"d.source IN ({_placeholders(sources)})"); params.extend(sources)
+        query = f"SELECT {select_cols} {from_clause}" + (f" WHERE {' AND '.join(clauses)}" if clauses else "") + order_by + " LIMIT ?;"
+        params.append(limit)
+        with self.connection() as conn:
+            return [_from_sqlite_row(r) for r in conn.execute(query, params).fetchall()]
+
+    def batch_search_chunks(self, requests: List[Dict[str, Any]], include_text: bool = True) -> List[List[Dict[str, Any]]]:
+        """Same contract as DatabaseManager.batch_search_chunks; the searches run in-process, so there is no round-trip to save."""
+        results = []
+        for request in requests:
+            filters = {"document_types": request.get("document_types"), "sources": request.get("sources"), "include_text": include_text}
+            if request.get("query_embedding") is not None and request.get("doc_limit") and request.get("section_limit"):
+                results.append(self.hierarchical_search_chunks(request["query_embedding"], request.get("limit", 10), request["doc_limit"],
+                                                               request["section_limit"], **filters))
+            elif request.get("query_embedding") is not None:
+                results.append(self.semantic_search_chunks(request["query_embedding"], request.get("limit", 10), **filters))
+            else:
+                results.append(self.search_chunks(keywords=request.get("keywords"), limit=request.get("limit", 75), **filters))
+        return results
+
+    def search_policy_chunks(self, text_terms: Optional[List[str]] = None, query_embedding: Optional[List[float]] = None,
+                             policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                             limit: int = 5) -> List[Dict[str, Any]]:
+        clauses = ["d.document_type LIKE 'PolicyDocument\\_%' ESCAPE '\\'"]
+        params: List[Any] = []
+        select_cols = _POLICY_COLUMNS
+        from_clause = "FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
+        terms = clean_terms(text_terms)
+        match_expr = fts_match_expression(terms)
+        if match_expr:
+            from_clause += " LEFT JOIN (SELECT rowid AS fts_rowid, -bm25(document_chunks_fts) AS keyword_rank FROM document_chunks_fts WHERE document_chunks_fts MATCH ?) k ON k.fts_rowid = dc.chunk_rowid"
+            params.append(match_expr)
+            select_cols += ", COALESCE(k.keyword_rank, 0) AS keyword_rank"
+
+        if document_sources:
+            clauses.append("(" + " OR ".join(["d.source LIKE ?"] * len(document_sources)) + ")") # LIKE is case-insensitive for ASCII, like ILIKE
+            params.extend(f"%{src}%" for src in document_sources)
+        if policy_ids:
+            clauses.append("(" + " OR ".join(["(dc.section = ? OR EXISTS (SELECT 1 FROM json_each(dc.tags) WHERE value = ?))"] * len(policy_ids)) + ")")
+            for pid in policy_ids:
+                params.extend([pid, pid])
+        if match_expr:
+            # Full-text match, or an exact tag overlap
+            clauses.append(f"(k.fts_rowid IS NOT NULL OR EXISTS (SELECT 1 FROM json_each(dc.tags) WHERE value IN ({_placeholders(terms)})))")
+            params.extend(terms)
+
+        query = f"SELECT {select_cols}, dc.embedding_row {from_clause} WHERE {' AND '.join(clauses)}"
+        with self.connection() as conn:
+            if query_embedding is not None:
+                # Filter in SQLite, then rank only the surviving chunks by exact vector distance
+                candidates = {r['embedding_row']: r for r in conn.execute(query, params).fetchall()}
+                ranked = self._nearest_rows(query_embedding, limit, np.fromiter(candidates.keys(), dtype=np.int64, count=len(candidates)))
+                results = []
+                for emb_row, distance in ranked:
+                    result = _from_sqlite_row(candidates[emb_row]); result.pop('embedding_row', None); result['distance'] = distance
+                    results.append(result)
+                return results
+            order_by = " ORDER BY keyword_rank DESC, d.source, dc.page_number" if match_expr else " ORDER BY d.source, dc.page_number"
+            rows = conn.execute(query + order_by + " LIMIT ?;", params + [limit]).fetchall()
+        results = [_from_sqlite_row(r) for r in rows]
+        for result in results:
+            result.pop('embedding_row', None)
+        return results
+
+    def batch_search_policy_chunks(self, query_embeddings: List[List[float]], text_terms: Optional[List[str]] = None,
+                                   policy_ids: Optional[List[str]] = None, document_sources: Optional[List[str]] = None,
+                                   limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """Same contract as DatabaseManager.batch_search_policy_chunks; the searches run in-process, so there is no round-trip to save."""
+        return [self.search_policy_chunks(text_terms, query_embedding, policy_ids, document_sources, limit) for query_embedding in query_embeddings]
+
+    def get_chunks_with_embeddings_by_sources(self, sources: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sources = list(sources)
+        if not sources:
+            return []
+        with self.connection() as conn:
+            rows = conn.execute(f"SELECT {_CHUNK_COLUMNS}, d.source, dc.embedding_row FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+                                f"WHERE d.source IN ({_placeholders(sources)}) ORDER BY d.doc_id, dc.page_number LIMIT ?;",
+                                sources + [limit if limit is not None else -1]).fetchall() # LIMIT -1 means no limit
+            results = []
+            for row in rows:
+                result = _from_sqlite_row(row)
+                emb_row = result.pop('embedding_row')
+                result['embedding'] = np.array(self._embeddings[emb_row]) if self._embeddings is not None and emb_row is not None else None
+                results.append(result)
+        return results
+
+    def get_policy_chunks_with_embeddings(self) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            rows = conn.execute(f"SELECT {_POLICY_COLUMNS}, dc.embedding_row FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+                                "WHERE d.document_type LIKE 'PolicyDocument\\_%' ESCAPE '\\' ORDER BY d.source, dc.page_number;").fetchall()
+            results = []
+            for row in rows:
+                result = _from_sqlite_row(row)
+                emb_row = result.pop('embedding_row')
+                result['embedding'] = np.array(self._embeddings[emb_row]) if self._embeddings is not None and emb_row is not None else None
+                results.append(result)
+        return results
+
+    def get_policy_chunk_by_id_tag(self, policy_id_tag: str) -> Optional[Dict[str, Any]]:
+        return self.execute_query(
+            "SELECT dc.chunk_id, dc.chunk_text, dc.section as policy_id_tag, d.title as doc_title, d.source as doc_source "
+            "FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+            "WHERE dc.section = %s AND d.document_type LIKE 'PolicyDocument\\_%%' ESCAPE '\\' LIMIT 1;", (policy_id_tag,), fetch_one=True)
+
+    def get_application_chunk(self, application_refs: List[str], document_type_contains: str, tag: str) -> Optional[Dict[str, Any]]:
+        refs = list(application_refs)
+        if not refs:
+            return None
+        return self.execute_query(
+            f"SELECT {_CHUNK_COLUMNS} FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id "
+            f"WHERE d.source IN ({', '.join(['%s'] * len(refs))}) "
+            "AND (d.document_type LIKE %s OR EXISTS (SELECT 1 FROM json_each(dc.tags) WHERE value = %s)) "
+            "ORDER BY d.upload_date DESC, dc.page_number ASC LIMIT 1;",
+            tuple(refs) + (f"%{document_type_contains}%", tag), fetch_one=True)
+
+    def get_document_sources(self, doc_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Optional[str]]:
+        if not doc_ids:
+            return {}
+        rows = self.execute_query(f"SELECT doc_id, source FROM documents WHERE doc_id IN ({_placeholders(doc_ids)});",
+                                  tuple(doc_ids), fetch_all=True) or []
+        return {row['doc_id']: row['source'] for row in rows}
+
+    def find_document(self, source: Optional[str] = None, document_type: Optional[str] = None, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        conditions = []; params: List[Any] = []
+        for column, value in (("filename", filename), ("source", source), ("document_type", document_type)):
+            if value is not None:
+                conditions.append(f"{column} = %s"); params.append(value)
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.execute_query(f"SELECT doc_id, filename, title, document_type, source FROM documents{where_sql} LIMIT 1;", tuple(params), fetch_one=True)
+
+    # --- Logging and lifecycle ---
+
+    def log_retrieval(self, query_text: str, filters: Optional[Dict], matched_chunk_ids: List[uuid.UUID], agent_context: str):
+        self.log_retrievals_bulk([(uuid.uuid4(), query_text, filters, matched_chunk_ids, agent_context, datetime.now(timezone.utc).replace(tzinfo=None))])
+
+    def log_retrievals_bulk(self, records: List[Tuple[uuid.UUID, str, Optional[Dict], List[uuid.UUID], str, datetime]]):
+        if not records:
+            return
+        rows = [(str(log_id), ts.isoformat(sep=" "), query_text, _to_sqlite_param(filters or {}), _to_sqlite_param(list(matched_ids)), agent_context)
+                for log_id, query_text, filters, matched_ids, agent_context, ts in records]
+        with self.connection() as conn:
+            conn.executemany("INSERT INTO retrieval_logs (log_id, timestamp, query, filters, matched_chunk_ids, agent_context) VALUES (?, ?, ?, ?, ?, ?);", rows)
+
+    def add_close_hook(self, hook: Callable[[], None]):
+        self._close_hooks.append(hook)
+
+    def add_ingest_hook(self, hook: Callable[[uuid.UUID, Optional[str]], None]):
+        self._ingest_hooks.append(hook)
+
+    def _notify_ingest(self, doc_id: uuid.UUID, document_type: Optional[str]):
+        if self._pending_ingest is not None: # Inside transaction(): deferred until commit, once per document
+            self._pending_ingest[doc_id] = self._pending_ingest.get(doc_id) or document_type
+            return
+        for hook in list(self._ingest_hooks):
+            try:
+                hook(doc_id, document_type)
+            except Exception as e:
+                print(f"WARN: LocalDatabaseManager ingest hook failed: {type(e).__name__} - {e}")
+
+    def close(self):
+        while self._close_hooks:
+            hook = self._close_hooks.pop(0)
+            try:
+                hook()
+            except Exception as e:
+                print(f"WARN: LocalDatabaseManager close hook failed: {type(e).__name__} - {e}")
+        with self._lock:
+            if self._embeddings is not None:
+                self._embeddings.flush()
+                self._embeddings = None
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
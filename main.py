@@ -9,6 +9,9 @@ from google import genai
 
 # Modular imports
 from db_manager import DatabaseManager
+from local_db_manager import LocalDatabaseManager
+from embeddings import get_embedding_service
+from migration_runner import MigrationRunner
 from mrm.mrm_orchestrator import MRMOrchestrator # MODIFIED: Renamed MRM to MRMOrchestrator
 from knowledge_base.policy_manager import PolicyManager
 from knowledge_base.report_template_manager import ReportTemplateManager
@@ -19,12 +22,12 @@ import config
 if __name__ == "__main__":
     load_dotenv()  # Ensure .env is loaded before any config import
     importlib.reload(config)
-    from config import GEMINI_API_KEY, REPORT_TEMPLATE_DIR, POLICY_KB_DIR, MC_ONTOLOGY_DIR, DB_CONFIG
+    from config import GEMINI_API_KEY, REPORT_TEMPLATE_DIR, POLICY_KB_DIR, MC_ONTOLOGY_DIR, DB_CONFIG, DB_BACKEND
     print("DEBUG DB_CONFIG:", DB_CONFIG)  # DEBUG PRINT
     start_time = time.time()
     if not GEMINI_API_KEY: print("CRITICAL: GEMINI_API_KEY is not set. Exiting."); exit(1)
     # ADDED: Check for DB_CONFIG components
-    if not all(DB_CONFIG.get(k) for k in ['dbname', 'user', 'password', 'host', 'port']):
+    if DB_BACKEND != "local" and not all(DB_CONFIG.get(k) for k in ['dbname', 'user', 'password', 'host', 'port']):
         print("CRITICAL: Database configuration is incomplete. Check .env file for DB_NAME, DB_USER, DB_PASS, DB_HOST, DB_PORT. Exiting.")
         exit(1)
 
@@ -32,68 +35,76 @@ if __name__ == "__main__":
     for kb_dir_path in [REPORT_TEMPLATE_DIR, POLICY_KB_DIR, MC_ONTOLOGY_DIR]:
         if not os.path.exists(kb_dir_path): os.makedirs(kb_dir_path); print(f"Created KB directory: {kb_dir_path}")
     
+    # Configuration for parallel processing
+    USE_PARALLEL_PROCESSING = os.getenv("USE_PARALLEL_PROCESSING", "true").lower() == "true"
+    MAX_PARALLEL_NODES = int(os.getenv("MAX_PARALLEL_NODES", "12"))  # Increased from 5 to 12 for better concurrency
+
     db_man = None # Initialize db_man outside try block for finally clause
     try:
-        print("\n--- Initializing Database Manager ---")
-        db_man = DatabaseManager()
-        
+        print(f"\n--- Initializing Database Manager (backend: {DB_BACKEND}) ---")
+        if DB_BACKEND == "local":
+            # Embedded SQLite + NumPy store; creates its own schema, no server or migrations needed
+            db_man = LocalDatabaseManager()
+            fresh_database = db_man.fresh_database
+        else:
+            # Parallel runs get one pooled connection per concurrently processed node (DB_POOL_ENABLED forces pooling regardless)
+            db_man = DatabaseManager(pool_size=MAX_PARALLEL_NODES if USE_PARALLEL_PROCESSING else None)
+
+            print("\n--- Applying Schema Migrations ---")
+            # Migrations run before PolicyManager, whose constructor already queries the documents table
+            migration_runner = MigrationRunner(db_man)
+            try:
+                applied_migrations = migration_runner.apply_pending()
+                for version, name in applied_migrations:
+                    print(f"Applied migration {version:03d}_{name}")
+            except FileNotFoundError as mig_missing:
+                print(f"ERROR: {mig_missing}. Ensure the migrations/ directory sits next to main.py."); exit(1)
+            except psycopg2.Error as db_err: # More specific error handling for DB operations
+                print(f"ERROR during schema migration (DB operation): {db_err}")
+                exit(1) # Each migration runs in its own transaction, so a failed one has already rolled back
+            try: # Diagnostic only: a failed check must not stop the run
+                for index_check in migration_runner.verify_index_usage():
+                    if not index_check["ok"]:
+                        print(f"WARN: Hot-path query '{index_check['name']}' cannot use expected indexes {index_check['missing_indexes']} (uses: {index_check['indexes_used']})")
+            except Exception as check_err:
+                print(f"WARN: Could not verify hot-path index usage: {type(check_err).__name__} - {check_err}")
+            fresh_database = migration_runner.fresh_database
+            try:
+                vector_index_info = db_man.ensure_vector_index() # VECTOR_INDEX_MODE: full / halfvec / binary
+                print(f"Vector index: {vector_index_info}")
+            except psycopg2.Error as db_err: # e.g. pgvector too old for halfvec/binary_quantize (needs 0.7+)
+                print(f"ERROR preparing '{db_man.vector_index_mode}' vector index: {db_err}")
+                exit(1)
+
         print("\n--- Initializing Knowledge Base Managers ---")
         report_template_man = ReportTemplateManager()
         mc_ontology_man = MaterialConsiderationOntology()
         policy_man = PolicyManager(db_man) # PolicyManager now requires db_man
 
-        print("\n--- Ensuring Schema and Ingesting Minimal Sample Data (if first run) ---")
-        schema_file_path = "./schema.sql";
-        try:
-            with open(schema_file_path, "r") as f_schema:
-                if db_man.conn is not None:
-                    cur = db_man.conn.cursor()
-                    # Check if 'documents' table exists to infer if schema was run
-                    cur.execute("SELECT to_regclass('public.documents');")
-                    table_exists = cur.fetchone()[0]
-                    cur.close()
-                else:
-                    # This case should ideally not be reached if DatabaseManager() succeeded
-                    raise RuntimeError("Database connection is not established after DatabaseManager initialization.")
-
-                if not table_exists:
-                    print("Executing schema.sql...")
-                    # Read the entire schema file
-                    sql_commands = f_schema.read()
-                    # Split commands if necessary, though execute_query might handle multi-statement SQL
-                    # For simplicity, assuming execute_query can handle it or schema.sql is single/batchable
-                    db_man.execute_query(sql_commands) # Pass the whole content
-                    print("Schema executed.")
-                    
-                    # Ingest sample data only if schema was just created
-                    print("Ingesting minimal sample data for initial scan...")
-                    ug_doc_id = db_man.add_document(filename="UserGuide_EC.pdf", title="Earls Court User Guide", document_type="UserGuide", source="ECDC_EarlsCourt_App", page_count=54)
-                    if ug_doc_id:
-                        db_man.add_document_chunk(doc_id=ug_doc_id, page_number=1, chunk_text="This major hybrid application for Earls Court proposes 4000 homes and extensive commercial space, including significant public realm and measures for sustainability and heritage conservation.", section="Executive Summary")
-                    
-                    es_nts_id = db_man.add_document(filename="ES_NTS_EC.pdf", title="ES Non-Technical Summary", document_type="ES_NTS", source="ECDC_EarlsCourt_App", page_count=20)
-                    if es_nts_id:
-                        db_man.add_document_chunk(doc_id=es_nts_id, page_number=2, chunk_text="The Environmental Statement covers impacts on: Housing, Design, Townscape, Heritage, Transport, Air Quality, Noise, Biodiversity, Flood Risk, Socio-economics.", section="ES Scope")
-                    
-                    # ADDED: Ingest sample policy data via PolicyManager
-                    print("Ingesting sample policy data...")
-                    policy_man._ingest_sample_policies_from_json() # Call the method to ingest policies
-                    print("Minimal sample data (application & policy) ingested.")
-                else: 
-                    print("Tables exist. Skipping schema/data ingestion.")
-        except FileNotFoundError: 
-            print(f"ERROR: schema.sql not found at {schema_file_path}. Ensure it's in the same directory as main.py."); exit(1)
-        except psycopg2.Error as db_err: # More specific error handling for DB operations
-            print(f"ERROR during schema/data setup (DB operation): {db_err}")
-            # db_man.conn might be None or closed, or in an unusable state
-            if db_man and db_man.conn: 
-                try: db_man.conn.rollback() # Attempt to rollback if transaction was open
-                except: pass # Ignore rollback errors
-            exit(1) # Exit on schema/data setup errors
-        except Exception as schema_e: 
-            print(f"ERROR during schema/data setup (General): {schema_e}"); 
-            import traceback; traceback.print_exc()
-            exit(1) # Exit on schema/data setup errors
+        if fresh_database:
+            print("\n--- Ingesting Minimal Sample Data (first run) ---")
+            try:
+                ug_doc_id = db_man.add_document(filename="UserGuide_EC.pdf", title="Earls Court User Guide", document_type="UserGuide", source="ECDC_EarlsCourt_App", page_count=54)
+                if ug_doc_id:
+                    db_man.add_document_chunk(doc_id=ug_doc_id, page_number=1, chunk_text="This major hybrid application for Earls Court proposes 4000 homes and extensive commercial space, including significant public realm and measures for sustainability and heritage conservation.", section="Executive Summary")
+                
+                es_nts_id = db_man.add_document(filename="ES_NTS_EC.pdf", title="ES Non-Technical Summary", document_type="ES_NTS", source="ECDC_EarlsCourt_App", page_count=20)
+                if es_nts_id:
+                    db_man.add_document_chunk(doc_id=es_nts_id, page_number=2, chunk_text="The Environmental Statement covers impacts on: Housing, Design, Townscape, Heritage, Transport, Air Quality, Noise, Biodiversity, Flood Risk, Socio-economics.", section="ES Scope")
+                
+                # ADDED: Ingest sample policy data via PolicyManager (files already ingested by its constructor are skipped)
+                print("Ingesting sample policy data...")
+                policy_man._ingest_sample_policies_from_json() # Call the method to ingest policies
+                print("Minimal sample data (application & policy) ingested.")
+            except psycopg2.Error as db_err:
+                print(f"ERROR during sample data ingestion (DB operation): {db_err}")
+                exit(1)
+            except Exception as ingest_e: 
+                print(f"ERROR during sample data ingestion (General): {ingest_e}"); 
+                import traceback; traceback.print_exc()
+                exit(1)
+        else: 
+            print("Existing database. Skipping sample data ingestion.")
 
         print("\n--- Initializing MRM Orchestrator ---")
         report_type_key_to_use = "Default_MajorHybrid" # Example report type
@@ -102,10 +113,6 @@ if __name__ == "__main__":
         # Use the renamed MRMOrchestrator class
         mrm_instance = MRMOrchestrator(db_man, report_template_man, mc_ontology_man, policy_man)
 
-        # Configuration for parallel processing
-        USE_PARALLEL_PROCESSING = os.getenv("USE_PARALLEL_PROCESSING", "true").lower() == "true"
-        MAX_PARALLEL_NODES = int(os.getenv("MAX_PARALLEL_NODES", "12"))  # Increased from 5 to 12 for better concurrency
-
         print(f"\n--- Starting {'Parallel' if USE_PARALLEL_PROCESSING else 'Sequential'} Report Orchestration for type: {report_type_key_to_use} ---")
         print(f"--- Max parallel nodes: {MAX_PARALLEL_NODES if USE_PARALLEL_PROCESSING else 'N/A (sequential)'} ---")
 
@@ -233,6 +240,22 @@ if __name__ == "__main__":
                     
                     f.write(f"- Final Report Status: {final_report.get('status', 'unknown')}\n")
                     f.write(f"- Report Size (JSON): {len(json.dumps(final_report, default=str))} characters\n")
+
+                f.write(f"\nDATABASE CONNECTIONS:\n")
+                for stat_key, stat_val in db_man.get_pool_stats().items():
+                    f.write(f"- {stat_key}: {stat_val}\n")
+                f.write(f"\nEMBEDDINGS:\n")
+                for stat_key, stat_val in get_embedding_service().get_stats().items():
+                    f.write(f"- {stat_key}: {stat_val}\n")
+                reranker = getattr(getattr(mrm_instance, 'retriever', None), 'reranker', None)
+                if reranker is not None: # Scoring time set against the candidate tokens it kept out of the contexts
+                    f.write(f"\nCROSS-ENCODER RE-RANKER:\n")
+                    for stat_key, stat_val in reranker.get_stats().items():
+                        f.write(f"- {stat_key}: {stat_val}\n")
+                if getattr(mrm_instance, 'retrieval_log_buffer', None):
+                    f.write(f"\nRETRIEVAL LOG BUFFER:\n")
+                    for stat_key, stat_val in mrm_instance.retrieval_log_buffer.get_stats().items():
+                        f.write(f"- {stat_key}: {stat_val}\n")
                 
                 f.write(f"\nFILE OUTPUTS:\n")
                 f.write(f"- Report File: {report_file}\n")
@@ -0,0 +1,166 @@
+# migration_runner.py
+# Applies numbered SQL migrations (migrations/NNN_description.sql) in order and records them in schema_migrations.
+# Replaces the old "does public.documents exist?" check in main.py.
+import os
+import re
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+from db_manager import DatabaseManager
+from config import MIGRATIONS_DIR
+
+MIGRATION_FILENAME_PATTERN = re.compile(r"^(\d+)_([A-Za-z0-9_\-]+)\.sql$")
+MIGRATION_LOCK_KEY = 727_001 # Arbitrary pg_advisory_xact_lock key so concurrent starters don't race
+
+# Representative shapes of the hot retrieval/policy queries and the indexes each one must be able to use.
+# Parameters are dummies; EXPLAIN only needs the shape.
+HOT_PATH_QUERIES: List[Dict[str, Any]] = [
+    {
+        "name": "full_document_text_by_id",
+        "query": "SELECT chunk_text FROM document_chunks WHERE doc_id = %s ORDER BY page_number, created_at, chunk_ordinal;",
+        "params": (str(uuid.uuid4()),),
+        "expected_indexes": ["idx_document_chunks_doc_order"],
+    },
+    {
+        "name": "retriever_structured_filters",
+        "query": "SELECT dc.chunk_id FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id WHERE d.document_type = ANY(%s) AND d.source = ANY(%s);",
+        "params": (["PlanningStatement"], ["APP_REF"]),
+        "expected_indexes": ["idx_documents_source_type"],
+    },
+    {
+        "name": "policy_ingestion_check",
+        "query": "SELECT doc_id FROM documents WHERE source = %s AND document_type = %s LIMIT 1;",
+        "params": ("NPPF_SAMPLE", "PolicyDocument_NPPF"),
+        "expected_indexes": ["idx_documents_source_type"],
+    },
+    {
+        "name": "policy_document_type_prefix",
+        "query": "SELECT doc_id FROM documents d WHERE d.document_type LIKE %s;",
+        "params": ("PolicyDocument_%",),
+        "expected_indexes": ["idx_documents_document_type"],
+    },
+    {
+        "name": "policy_by_id_tag",
+        "query": "SELECT dc.chunk_id FROM document_chunks dc WHERE dc.section = %s;",
+        "params": ("NPPF_Para_11",),
+        "expected_indexes": ["idx_document_chunks_section"],
+    },
+    {
+        "name": "chunk_tag_containment",
+        "query": "SELECT dc.chunk_id FROM document_chunks dc WHERE dc.tags @> ARRAY[%s]::text[];",
+        "params": ("site_description",),
+        "expected_indexes": ["idx_document_chunks_tags"],
+    },
+    {
+        "name": "keyword_full_text",
+        "query": "SELECT dc.chunk_id FROM document_chunks dc WHERE dc.chunk_tsv @@ (plainto_tsquery('english', %s) || plainto_tsquery('english', %s));",
+        "params": ("affordable housing", "flood risk"),
+        "expected_indexes": ["idx_document_chunks_tsv"],
+    },
+    {
+        "name": "evidence_index_lookup",
+        "query": "SELECT chunk_ids FROM application_evidence_index WHERE source = ANY(%s) AND category = ANY(%s);",
+        "params": (["APP_REF"], ["HousingStatement", "DAS_ResidentialChapter"]),
+        "expected_indexes": ["application_evidence_index_pkey"],
+    },
+    {
+        "name": "hierarchical_section_summaries",
+        "query": "SELECT section, embedding FROM document_summary_embeddings WHERE level = 'section' AND doc_id = ANY(%s::uuid[]);",
+        "params": ([str(uuid.uuid4()), str(uuid.uuid4())],),
+        "expected_indexes": ["document_summary_embeddings_pkey"],
+    },
+    {
+        "name": "keyword_fuzzy_trigram",
+        "query": "SELECT dc.chunk_id FROM document_chunks dc WHERE %s <%% dc.chunk_text;",
+        "params": ("daylght",),
+        "expected_indexes": ["idx_document_chunks_text_trgm"],
+    },
+]
+
+
+def _collect_index_names(plan_node: Dict[str, Any]) -> List[str]:
+    names = [plan_node["Index Name"]] if "Index Name" in plan_node else []
+    for child in plan_node.get("Plans", []):
+        names.extend(_collect_index_names(child))
+    return names
+
+
+class MigrationRunner:
+    """Applies pending numbered migrations, each in its own transaction, and verifies hot-path index usage."""
+
+    def __init__(self, db_manager: DatabaseManager, migrations_dir: str = MIGRATIONS_DIR):
+        self.db_manager = db_manager
+        self.migrations_dir = migrations_dir
+        self.fresh_database: Optional[bool] = None # Set by apply_pending(): True if the core tables did not exist beforehand
+
+    def discover_migrations(self) -> List[Tuple[int, str, str]]:
+        """Returns (version, name, path) for every migration file, sorted by version."""
+        if not os.path.isdir(self.migrations_dir):
+            raise FileNotFoundError(f"Migrations directory not found: {self.migrations_dir}")
+        migrations = []
+        for filename in os.listdir(self.migrations_dir):
+            match = MIGRATION_FILENAME_PATTERN.match(filename)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2), os.path.join(self.migrations_dir, filename)))
+        migrations.sort()
+        versions = [m[0] for m in migrations]
+        if len(versions) != len(set(versions)):
+            raise ValueError(f"Duplicate migration version numbers in {self.migrations_dir}: {versions}")
+        return migrations
+
+    def _ensure_migrations_table(self):
+        self.db_manager.execute_query("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version INTEGER PRIMARY KEY,
+          name TEXT NOT NULL,
+          applied_at TIMESTAMP DEFAULT timezone('utc', now())
+        );
+        """)
+
+    def applied_versions(self) -> List[int]:
+        rows = self.db_manager.execute_query("SELECT version FROM schema_migrations ORDER BY version;", fetch_all=True) or []
+        return [row['version'] for row in rows]
+
+    def apply_pending(self) -> List[Tuple[int, str]]:
+        """Applies every migration newer than those recorded in schema_migrations. Returns the (version, name) pairs applied."""
+        regclass_row = self.db_manager.execute_query("SELECT to_regclass('public.documents') AS documents_table;", fetch_one=True)
+        self.fresh_database = not (regclass_row and regclass_row['documents_table'])
+        self._ensure_migrations_table()
+
+        already_applied = set(self.applied_versions())
+        applied_now: List[Tuple[int, str]] = []
+        for version, name, path in self.discover_migrations():
+            if version in already_applied:
+                continue
+            with open(path, "r") as f_sql:
+                sql_text = f_sql.read()
+            with self.db_manager.transaction() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+                    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (version,))
+                    if cur.fetchone():
+                        continue # Already applied (possibly by a concurrent starter while we waited on the lock)
+                    print(f"INFO: Applying migration {version:03d}_{name}...")
+                    cur.execute(sql_text)
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+            applied_now.append((version, name))
+        if not applied_now:
+            print("INFO: Database schema is up to date.")
+        return applied_now
+
+    def verify_index_usage(self, queries: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        EXPLAINs each hot-path query and reports whether the planner can use the expected indexes.
+        Sequential scans are disabled for the check, so the result reflects index applicability even on small tables.
+        """
+        report = []
+        for check in queries or HOT_PATH_QUERIES:
+            with self.db_manager.transaction() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL enable_seqscan = off;")
+                    cur.execute("EXPLAIN (FORMAT JSON) " + check["query"], check["params"])
+                    plan = cur.fetchone()[0][0]["Plan"]
+            used = sorted(set(_collect_index_names(plan)))
+            missing = [idx for idx in check["expected_indexes"] if idx not in used]
+            report.append({"name": check["name"], "indexes_used": used, "missing_indexes": missing, "ok": not missing})
+        return report
@@ -1,4 +1,4 @@
--- schema.sql
+-- migrations/001_baseline_schema.sql (formerly schema.sql)
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS vector;
 
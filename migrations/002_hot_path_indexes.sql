@@ -0,0 +1,25 @@
+-- migrations/002_hot_path_indexes.sql
+-- Indexes for the filters and sort orders used by AgenticRetriever, PolicyManager and ApplicationContextManager.
+
+-- get_full_document_text_by_id: WHERE doc_id = ? ORDER BY page_number, created_at (also serves the dc.doc_id join)
+CREATE INDEX IF NOT EXISTS idx_document_chunks_doc_order
+ON document_chunks (doc_id, page_number, created_at);
+
+-- Policy lookups by ID tag: dc.section = ?
+CREATE INDEX IF NOT EXISTS idx_document_chunks_section
+ON document_chunks (section);
+
+-- Tag containment: dc.tags @> ARRAY[?]
+CREATE INDEX IF NOT EXISTS idx_document_chunks_tags
+ON document_chunks USING gin (tags);
+
+-- Application scoping (d.source = ANY(?)) and policy ingestion checks (source = ? AND document_type = ?)
+CREATE INDEX IF NOT EXISTS idx_documents_source_type
+ON documents (source, document_type);
+
+-- Document type equality (= ANY(?)) and prefix matches (LIKE 'PolicyDocument_%')
+CREATE INDEX IF NOT EXISTS idx_documents_document_type
+ON documents (document_type text_pattern_ops);
+
+ANALYZE documents;
+ANALYZE document_chunks;
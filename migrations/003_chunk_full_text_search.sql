@@ -0,0 +1,16 @@
+-- migrations/003_chunk_full_text_search.sql
+-- Stored tsvector + GIN index for the keyword half of hybrid retrieval (replaces ILIKE '%term%' OR-chains),
+-- and a trigram index for the optional fuzzy-term fallback (word_similarity / <% operator).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE document_chunks
+  ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+  GENERATED ALWAYS AS (to_tsvector('english', coalesce(chunk_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_tsv
+ON document_chunks USING gin (chunk_tsv);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_text_trgm
+ON document_chunks USING gin (chunk_text gin_trgm_ops);
+
+ANALYZE document_chunks;
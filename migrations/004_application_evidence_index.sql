@@ -0,0 +1,12 @@
+-- migrations/004_application_evidence_index.sql
+-- Per-application evidence index, maintained at ingest (retrieval/evidence_index.py): for each application
+-- (documents.source) and key evidence category ("HousingStatement", "DAS_ResidentialChapter", ...), the ids of the
+-- chunks tagged with it. Intents look their node's categories up by primary key instead of scanning chunk text.
+-- Documents ingested before this migration are indexed with retrieval.evidence_index.rebuild_evidence_index().
+CREATE TABLE IF NOT EXISTS application_evidence_index (
+  source TEXT NOT NULL,
+  category TEXT NOT NULL,
+  chunk_ids UUID[] NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (source, category)
+);
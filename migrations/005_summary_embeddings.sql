@@ -0,0 +1,16 @@
+-- migrations/005_summary_embeddings.sql
+-- Document- and section-level summary embeddings for hierarchical retrieval (retrieval/hierarchy.py): the normalised
+-- centroid of each document's and each section's chunk vectors, computed by refresh_summary_embeddings() at ingest when
+-- HIERARCHICAL_RETRIEVAL_TASKS is set, else before a manager's first hierarchical search (which also backfills documents
+-- without summaries). Computing them needs l2_normalize (pgvector 0.7+); this migration itself does not.
+-- Chunks without a section are summarised under section ''; the document row also uses section ''.
+CREATE TABLE IF NOT EXISTS document_summary_embeddings (
+  doc_id UUID NOT NULL REFERENCES documents(doc_id) ON DELETE CASCADE,
+  level TEXT NOT NULL CHECK (level IN ('document', 'section')),
+  section TEXT NOT NULL DEFAULT '',
+  chunk_count INTEGER NOT NULL,
+  embedding vector(768) NOT NULL,
+  PRIMARY KEY (doc_id, level, section)
+);
+
+ANALYZE document_summary_embeddings;
@@ -0,0 +1,20 @@
+-- migrations/006_chunk_ordinal.sql
+-- Per-document ingest position of each chunk. Batched ingest writes all chunks of a document in one transaction, so
+-- they share created_at (now() is the transaction start); reading order is (page_number, created_at, chunk_ordinal).
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_ordinal INTEGER;
+
+-- Backfill: chunks written before this migration were inserted one per transaction, so created_at is their ingest order
+UPDATE document_chunks dc
+SET chunk_ordinal = o.ordinal
+FROM (
+  SELECT chunk_id, row_number() OVER (PARTITION BY doc_id ORDER BY created_at, page_number, chunk_id) - 1 AS ordinal
+  FROM document_chunks
+) o
+WHERE dc.chunk_id = o.chunk_id AND dc.chunk_ordinal IS NULL;
+
+-- Replaces the 002 reading-order index so it covers the tie-break
+DROP INDEX IF EXISTS idx_document_chunks_doc_order;
+CREATE INDEX IF NOT EXISTS idx_document_chunks_doc_order
+ON document_chunks (doc_id, page_number, created_at, chunk_ordinal);
+
+ANALYZE document_chunks;
@@ -30,22 +30,8 @@ class ApplicationContextManager:
         if cache_key in self.application_context_cache:
             return self.application_context_cache[cache_key]
         
-        # Query for site description
-        site_desc_query = """
-            SELECT chunk_text 
-            FROM document_chunks dc 
-            JOIN documents d ON dc.doc_id = d.doc_id 
-            WHERE d.source = ANY(%s) 
-            AND (d.document_type ILIKE %s OR dc.tags @> ARRAY[%s]) 
-            ORDER BY d.upload_date DESC, dc.page_number ASC 
-            LIMIT 1
-        """
-        
-        site_text_row = self.db_manager.execute_query(
-            site_desc_query, 
-            (application_refs, "%SiteDescription%", "site_description"), 
-            fetch_one=True
-        )
+        # Query for site description (document type contains "SiteDescription", or chunk tagged site_description)
+        site_text_row = self.db_manager.get_application_chunk(application_refs, "SiteDescription", "site_description")
         site_summary = (
             site_text_row['chunk_text'][:500] + "..." 
             if site_text_row and site_text_row['chunk_text'] 
@@ -53,11 +39,7 @@ class ApplicationContextManager:
         )
 
         # Query for proposal description
-        proposal_text_row = self.db_manager.execute_query(
-            site_desc_query, 
-            (application_refs, "%ProposalDescription%", "proposal_summary"), 
-            fetch_one=True
-        )
+        proposal_text_row = self.db_manager.get_application_chunk(application_refs, "ProposalDescription", "proposal_summary")
         proposal_summary = (
             proposal_text_row['chunk_text'][:500] + "..." 
             if proposal_text_row and proposal_text_row['chunk_text'] 
@@ -68,50 +68,31 @@ class IntentDefiner:
             "primary_descriptors": node.thematic_policy_descriptors[:3]
         })
         
-        # Perform multiple semantic searches to capture diverse relevant policies
-        all_relevant_policies = []
-        
-        for i, semantic_query in enumerate(semantic_queries[:3]):  # Limit to avoid over-querying
-            try:
-                policies = self.policy_manager.search_policies(
-                    themes=search_themes[:5],  # Top themes
-                    semantic_query=semantic_query,
-                    limit=8  # More policies per search
-                )
-                
-                # Add search context to policies
-                for policy in policies:
-                    policy['search_context'] = f"semantic_query_{i+1}"
-                    policy['search_query'] = semantic_query
-                
-                all_relevant_policies.extend(policies)
-                node_provenance.add_action(f"Semantic search {i+1} completed", {
-                    "query": semantic_query[:100],
-                    "results_count": len(policies)
-                })
-                
-            except Exception as e:
-                node_provenance.add_action(f"Semantic search {i+1} failed", {"error": str(e)})
-                print(f"WARN: Semantic policy search failed: {e}")
-        
-        # Deduplicate policies by policy_clause_id
-        unique_policies = {}
-        for policy in all_relevant_policies:
-            policy_id = policy.get('policy_clause_id') or policy.get('id')
-            if policy_id not in unique_policies:
-                unique_policies[policy_id] = policy
-        
-        final_policies = list(unique_policies.values())
-        
-        # Sort by semantic relevance (distance) if available
-        final_policies.sort(key=lambda p: p.get('semantic_distance', 1.0))
+        # One batched search for all queries: embedded together, searched in one pass, fused and de-duplicated by clause
+        semantic_queries = semantic_queries[:3]  # Limit to avoid over-querying
+        final_policies = []
+        try:
+            final_policies = self.policy_manager.search_policies_multi(
+                semantic_queries,
+                themes=search_themes[:5],  # Top themes
+                limit=8,  # More policies per search
+                fused_limit=12
+            )
+            node_provenance.add_action("Batched semantic policy search completed", {
+                "queries": [query[:100] for query in semantic_queries],
+                "fused_results_by_query": [sum(1 for p in final_policies if i + 1 in p.get('query_ranks', {})) for i in range(len(semantic_queries))],
+                "fused_results": len(final_policies)
+            })
+        except Exception as e:
+            node_provenance.add_action("Batched semantic policy search failed", {"error": str(e)})
+            print(f"WARN: Semantic policy search failed: {e}")
         
         node_provenance.add_action("Thematic policy search completed", {
             "total_policies_found": len(final_policies),
             "unique_sources": list(set(p.get('policy_document_source', 'unknown') for p in final_policies))
         })
         
-        return final_policies[:12]  # Return top 12 most relevant policies
+        return final_policies  # Top 12 by fused rank
 
     def define_intent_spec_via_llm(self, node: ReasoningNode, application_refs: List[str], application_display_name: str,
                                    report_type: str, site_summary_context: Optional[str], proposal_summary_context: Optional[str],
@@ -248,7 +229,11 @@ class IntentDefiner:
             if not all(k in intent_spec_dict for k in required_keys):
                 missing_keys = [k for k in required_keys if k not in intent_spec_dict]
                 raise ValueError(f"LLM-generated Intent Spec missing required keys: {missing_keys}")
-            
+
+            # The node's key evidence categories are looked up in the application's evidence index at retrieval time
+            if node.key_evidence_document_types and isinstance(intent_spec_dict.get("retrieval_config"), dict):
+                intent_spec_dict["retrieval_config"].setdefault("evidence_categories", list(dict.fromkeys(node.key_evidence_document_types)))
+
             node_provenance.add_action("Enhanced Intent Spec generated successfully", {
                 "keys_generated": list(intent_spec_dict.keys()),
                 "policies_considered": len(relevant_policies),
@@ -14,6 +14,11 @@ from knowledge_base.report_template_manager import ReportTemplateManager
 from knowledge_base.material_consideration_ontology import MaterialConsiderationOntology
 from knowledge_base.policy_manager import PolicyManager
 from retrieval.retriever import AgenticRetriever
+from retrieval.log_buffer import RetrievalLogBuffer
+from retrieval.vector_cache import ApplicationVectorCache
+from retrieval.chunk_store import RunChunkStore
+from retrieval.memo import RetrievalMemo
+from retrieval.batcher import RetrievalBatcher
 from mrm.intent_definer import IntentDefiner
 from mrm.node_processor import NodeProcessor
 
@@ -28,7 +33,7 @@ from agents.visual_heritage_agent import VisualHeritageAgent
 from agents.policy_analysis_agent import PolicyAnalysisAgent, DefaultPlanningAnalystAgent, LLMPlanningPolicyAnalyst
 from agents.base_agent import BaseSubsidiaryAgent 
 
-from config import GEMINI_API_KEY, MRM_MODEL_NAME, SUBSIDIARY_AGENT_MODEL_NAME, DB_CONFIG, REPORT_TEMPLATE_DIR, MC_ONTOLOGY_DIR, POLICY_KB_DIR, PARALLEL_ASYNC_LLM_MODE, MAX_CONCURRENT_LLM_CALLS
+from config import GEMINI_API_KEY, MRM_MODEL_NAME, SUBSIDIARY_AGENT_MODEL_NAME, DB_CONFIG, REPORT_TEMPLATE_DIR, MC_ONTOLOGY_DIR, POLICY_KB_DIR, PARALLEL_ASYNC_LLM_MODE, MAX_CONCURRENT_LLM_CALLS, RETRIEVAL_LOG_BUFFER_ENABLED, RUN_VECTOR_CACHE_ENABLED, RUN_VECTOR_CACHE_MAX_CHUNKS, RUN_CHUNK_STORE_ENABLED, RETRIEVAL_BATCH_ENABLED, RETRIEVAL_MEMO_ENABLED, RETRIEVAL_MEMO_ACROSS_RUNS, ASYNC_DB_ENABLED
 
 if not GEMINI_API_KEY:
     raise ValueError("CRITICAL: GEMINI_API_KEY not found. Please set it in your environment or .env file.")
@@ -55,8 +60,9 @@ class MRMOrchestrator:
         
         print(f"INFO: MRMOrchestrator initializing with DB: {type(db_manager).__name__}, PolicyMgr: {type(policy_manager).__name__}")
 
-        # Initialize retriever
-        self.retriever = AgenticRetriever(self.db_manager)
+        # Initialize retriever (retrieval logs are written behind the critical path when buffering is enabled)
+        self.retrieval_log_buffer = RetrievalLogBuffer(self.db_manager) if RETRIEVAL_LOG_BUFFER_ENABLED else None
+        self.retriever = AgenticRetriever(self.db_manager, retrieval_log_buffer=self.retrieval_log_buffer)
         print(f"INFO: AgenticRetriever initialized with DB: {type(db_manager).__name__}")
 
         # Initialize subsidiary agents
@@ -126,6 +132,10 @@ class MRMOrchestrator:
         prov.add_action(f"Starting synchronous orchestration for {len(application_refs)} application refs")
         
         try:
+            self._start_run_chunk_store(prov)
+            self._start_retrieval_memo(prov)
+            self._start_run_vector_cache(application_refs, prov)
+
             # Get application context using modular component
             app_context_summary = self.context_manager.get_or_create_application_context_summary(
                 application_refs, application_display_name
@@ -202,6 +212,105 @@ class MRMOrchestrator:
         except Exception as e:
             prov.complete("ERROR", {"error": str(e)})
             return self.report_generator.generate_error_response(e)
+        finally:
+            self._end_run_vector_cache(prov)
+            self._end_retrieval_memo(prov)
+            self._end_run_chunk_store(prov)
+
+    def _start_run_vector_cache(self, application_refs: List[str], prov: ProvenanceLog):
+        """Loads the applications' chunk embeddings once so this run's semantic retrieval needs no database queries."""
+        if not RUN_VECTOR_CACHE_ENABLED or not application_refs:
+            return
+        try:
+            cache = ApplicationVectorCache.load(self.db_manager, application_refs, dimension=self.retriever.embedding_service.dimension,
+                                                max_chunks=RUN_VECTOR_CACHE_MAX_CHUNKS)
+        except Exception as e:
+            print(f"WARNING: Could not load run vector cache ({type(e).__name__} - {e}). Semantic retrieval will query the database.")
+            return
+        if cache is not None:
+            if self.retriever.chunk_store is not None:
+                self.retriever.chunk_store.intern_rows(cache.rows) # The cache's texts become the run's shared copies
+            self.retriever.set_run_vector_cache(cache)
+            prov.add_action("RunVectorCacheLoaded", cache.get_stats())
+            print(f"INFO: Run vector cache loaded {len(cache)} chunks ({cache.matrix.nbytes / (1024 * 1024):.1f} MB) in {cache.load_seconds:.3f}s.")
+
+    def _end_run_vector_cache(self, prov: ProvenanceLog):
+        cache = self.retriever.run_vector_cache
+        if cache is not None:
+            prov.add_action("RunVectorCacheReleased", cache.get_stats())
+        self.retriever.set_run_vector_cache(None)
+
+    def _start_run_chunk_store(self, prov: ProvenanceLog):
+        """One RunChunkStore per run: every intent shares each chunk text, and texts already seen are not fetched again."""
+        if RUN_CHUNK_STORE_ENABLED:
+            self.retriever.set_chunk_store(RunChunkStore())
+            prov.add_action("RunChunkStoreStarted")
+
+    def _end_run_chunk_store(self, prov: ProvenanceLog):
+        store = self.retriever.chunk_store
+        if store is not None:
+            prov.add_action("RunChunkStoreReleased", store.get_stats())
+        self.retriever.set_chunk_store(None)
+
+    def _start_retrieval_memo(self, prov: ProvenanceLog):
+        """Intents of this run that repeat a retrieval request reuse its ranked chunks; with RETRIEVAL_MEMO_ACROSS_RUNS, so do later runs."""
+        if not RETRIEVAL_MEMO_ENABLED:
+            return
+        memo = self.retriever.retrieval_memo
+        reused = memo is not None
+        if not reused:
+            memo = RetrievalMemo()
+            self.retriever.set_retrieval_memo(memo)
+        prov.add_action("RetrievalMemoStarted", {"reused": reused, "entries": len(memo)})
+
+    def _end_retrieval_memo(self, prov: ProvenanceLog):
+        memo = self.retriever.retrieval_memo
+        if memo is not None:
+            prov.add_action("RetrievalMemoReleased", memo.get_stats())
+        if not RETRIEVAL_MEMO_ACROSS_RUNS:
+            self.retriever.set_retrieval_memo(None)
+
+    def _start_retrieval_batcher(self, max_parallel_nodes: int, prov: ProvenanceLog):
+        """
+        Nodes of one wave that reach retrieval together share one batched search round-trip (async runs only).
+        With an AsyncDatabaseManager open, every retrieval (batched or not) runs on this run's event loop.
+        """
+        batching = RETRIEVAL_BATCH_ENABLED and max_parallel_nodes > 1
+        loop = asyncio.get_running_loop() if self.retriever.async_db_manager is not None else None
+        if batching or loop is not None:
+            max_batch = max_parallel_nodes if batching else 1
+            self.node_processor.retrieval_batcher = RetrievalBatcher(self.retriever, max_batch=max_batch, loop=loop)
+            prov.add_action("RetrievalBatcherStarted", {"max_batch": max_batch, "event_loop": loop is not None})
+
+    def _end_retrieval_batcher(self, prov: ProvenanceLog):
+        batcher = self.node_processor.retrieval_batcher
+        if batcher is not None:
+            prov.add_action("RetrievalBatcherReleased", batcher.get_stats())
+        self.node_processor.retrieval_batcher = None
+
+    async def _open_async_db_manager(self, prov: ProvenanceLog):
+        """Opens an AsyncDatabaseManager pool for this run and hands it to the retriever and the policy manager (postgres only)."""
+        if not ASYNC_DB_ENABLED or not isinstance(self.db_manager, DatabaseManager):
+            return
+        try:
+            from async_db_manager import AsyncDatabaseManager # Optional dependency (psycopg 3 / psycopg_pool)
+            async_db = AsyncDatabaseManager(db_config=self.db_manager.db_config, vector_index_mode=self.db_manager.vector_index_mode)
+            await async_db.open()
+        except Exception as e:
+            print(f"WARNING: Could not open AsyncDatabaseManager ({type(e).__name__} - {e}). Async run will query the database from worker threads.")
+            return
+        self.retriever.set_async_db_manager(async_db)
+        self.policy_manager.set_async_db_manager(async_db)
+        prov.add_action("AsyncDatabaseManagerOpened", async_db.get_pool_stats())
+
+    async def _close_async_db_manager(self, prov: ProvenanceLog):
+        async_db = self.retriever.async_db_manager
+        if async_db is None:
+            return
+        self.retriever.set_async_db_manager(None)
+        self.policy_manager.set_async_db_manager(None)
+        prov.add_action("AsyncDatabaseManagerClosed", async_db.get_pool_stats())
+        await async_db.close()
 
     def _process_node_sync(self, node: ReasoningNode, 
                           application_refs: List[str], 
@@ -325,6 +434,12 @@ class MRMOrchestrator:
             prov.add_action(f"Max Concurrent LLM Calls: {self.parallel_processor.max_concurrent_llm_calls}")
         
         try:
+            self._start_run_chunk_store(prov)
+            self._start_retrieval_memo(prov)
+            await self._open_async_db_manager(prov)
+            await asyncio.to_thread(self._start_run_vector_cache, application_refs, prov)
+            self._start_retrieval_batcher(max_parallel_nodes, prov)
+
             # Get application context using modular component
             app_context_summary = self.context_manager.get_or_create_application_context_summary(
                 application_refs, app_display_name
@@ -387,6 +502,12 @@ class MRMOrchestrator:
                 **self.parallel_processor.get_processing_stats()
             }
             return self.report_generator.generate_error_response(e, processing_metadata)
+        finally:
+            self._end_retrieval_batcher(prov)
+            await self._close_async_db_manager(prov)
+            self._end_run_vector_cache(prov)
+            self._end_retrieval_memo(prov)
+            self._end_run_chunk_store(prov)
 
     async def _expand_dynamic_nodes_async(self, 
                                         root_node: ReasoningNode, 
@@ -8,6 +8,7 @@ from config import MRM_CORE_GEN_CONFIG, MRM_MODEL_NAME, CACHE_ENABLED, create_ll
 
 from core_types import ReasoningNode, Intent, IntentStatus, ProvenanceLog
 from retrieval.retriever import AgenticRetriever
+from retrieval.batcher import RetrievalBatcher
 from agents.base_agent import BaseSubsidiaryAgent
 from knowledge_base.policy_manager import PolicyManager
 from knowledge_base.report_template_manager import ReportTemplateManager
@@ -23,6 +24,7 @@ class NodeProcessor:
         self.retriever = retriever
         self.subsidiary_agents = subsidiary_agents
         self.policy_manager = policy_manager
+        self.retrieval_batcher: Optional[RetrievalBatcher] = None # Set by MRMOrchestrator for async runs; batches concurrent retrievals
         
         # Initialize cache if enabled
         self.cache = GeminiResponseCache() if CACHE_ENABLED else None
@@ -104,7 +106,7 @@ class NodeProcessor:
             )
         )
         if needs_app_doc_retrieval:
-            try: self.retriever.retrieve_and_prepare_context(intent)
+            try: (self.retrieval_batcher or self.retriever).retrieve_and_prepare_context(intent)
             except Exception as e: intent.status = IntentStatus.FAILED; intent.error_message = f"App Doc Retrieval failed: {e}"
 
         if intent.status != IntentStatus.FAILED and intent.agent_to_invoke:
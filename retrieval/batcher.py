@@ -0,0 +1,96 @@
+# retrieval/batcher.py
+# Coalesces the retrievals of concurrently processed nodes: intents that reach retrieval within a short window are
+# answered together by AgenticRetriever.retrieve_and_prepare_contexts (one search round-trip instead of one per intent).
+import asyncio
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+
+from core_types import Intent
+from config import RETRIEVAL_BATCH_WINDOW_MS
+
+if TYPE_CHECKING:
+    from retrieval.retriever import AgenticRetriever
+
+
+class _PendingRetrieval:
+    __slots__ = ("intent", "done", "error")
+
+    def __init__(self, intent: Intent):
+        self.intent = intent
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+class RetrievalBatcher:
+    """
+    Drop-in for AgenticRetriever.retrieve_and_prepare_context, called from the worker threads of one wave of nodes.
+    The first caller leads: it waits up to `window_ms` (less once `max_batch` intents are queued), then retrieves
+    the queued intents in one batch while the others block on their own entry. Each caller gets its own intent's
+    exception, so per-intent failure handling is unchanged.
+    With `loop` (the running event loop of an async report run) each batch runs as retrieve_and_prepare_contexts_async
+    on that loop, so its queries use the retriever's AsyncDatabaseManager pool; callers must not be on the loop's thread.
+    """
+    def __init__(self, retriever: "AgenticRetriever", max_batch: int = 8, window_ms: float = RETRIEVAL_BATCH_WINDOW_MS,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.retriever = retriever
+        self.loop = loop
+        self.max_batch = max(1, max_batch)
+        self.window_seconds = max(0.0, window_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._pending: List[_PendingRetrieval] = []
+        self._leading = False
+        self._stats = {"intents": 0, "batches": 0, "largest_batch": 0, "failed_intents": 0}
+
+    def retrieve_and_prepare_context(self, intent: Intent):
+        entry = _PendingRetrieval(intent)
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+        while not entry.done.is_set():
+            with self._lock:
+                lead = not self._leading
+                self._leading = True
+            if not lead:
+                entry.done.wait(self.window_seconds or 0.001) # Re-check: the leader may have left this entry for a later batch
+                continue
+            try:
+                self._full.wait(self.window_seconds)
+                with self._lock:
+                    batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                    if len(self._pending) < self.max_batch:
+                        self._full.clear()
+                self._run(batch)
+            finally:
+                with self._lock:
+                    self._leading = False
+        if entry.error is not None:
+            raise entry.error
+
+    def _run(self, batch: List[_PendingRetrieval]):
+        if not batch:
+            return
+        try:
+            intents = [entry.intent for entry in batch]
+            if self.loop is not None:
+                errors: Dict[uuid.UUID, Exception] = asyncio.run_coroutine_threadsafe(
+                    self.retriever.retrieve_and_prepare_contexts_async(intents), self.loop).result()
+            else:
+                errors = self.retriever.retrieve_and_prepare_contexts(intents)
+        except Exception as e:
+            errors = {entry.intent.intent_id: e for entry in batch}
+        with self._lock:
+            self._stats["intents"] += len(batch); self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+            self._stats["failed_intents"] += len(errors)
+        for entry in batch:
+            entry.error = errors.get(entry.intent.intent_id)
+            entry.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({"max_batch": self.max_batch, "window_ms": round(self.window_seconds * 1000, 2), "event_loop": self.loop is not None})
+        return stats
@@ -0,0 +1,94 @@
+# retrieval/chunk_store.py
+# Report-scoped shared chunk store: each chunk text of a run is held once, keyed by chunk_id. Intents reference the
+# stored strings instead of carrying their own copies, and texts the store already holds are never fetched again.
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, Callable, Tuple, Awaitable, Iterable
+
+
+class RunChunkStore:
+    """
+    chunk_id -> text for one report run, shared by every intent the run processes (thread-safe).
+    Chunk texts are immutable per chunk_id, so entries never go stale; the store is dropped when the run ends.
+    Searches run with include_text=False while a store is set: rows carry chunk_chars only, and after the retriever
+    has chosen what goes into context, `attach_texts()` fetches just the texts the store does not hold, in one call.
+    """
+    def __init__(self):
+        self._texts: Dict[uuid.UUID, str] = {}
+        self._joined: Dict[Tuple[uuid.UUID, ...], str] = {} # Multi-chunk context units, shared by intents that pack the same unit
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "fetches": 0, "fetched_chars": 0, "skipped_fetch_chars": 0, "shared_chars": 0}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, chunk_id: uuid.UUID) -> bool:
+        return chunk_id in self._texts
+
+    def text(self, chunk_id: uuid.UUID) -> Optional[str]:
+        return self._texts.get(chunk_id)
+
+    def intern_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Rows that already carry chunk_text (e.g. the run vector cache) are stored, or pointed at the stored copy."""
+        with self._lock:
+            for row in rows:
+                text = row.get('chunk_text')
+                if text is None:
+                    continue
+                stored = self._texts.setdefault(row['chunk_id'], text)
+                if stored is not text:
+                    row['chunk_text'] = stored
+                    self._stats["shared_chars"] += len(stored)
+
+    def _missing(self, rows: List[Dict[str, Any]]) -> List[uuid.UUID]:
+        self.intern_rows(rows)
+        with self._lock:
+            missing = list(dict.fromkeys(r['chunk_id'] for r in rows if r.get('chunk_text') is None and r['chunk_id'] not in self._texts))
+            known = {r['chunk_id'] for r in rows if r.get('chunk_text') is None and r['chunk_id'] in self._texts}
+            self._stats["hits"] += len(known)
+            self._stats["skipped_fetch_chars"] += sum(len(self._texts[cid]) for cid in known)
+            self._stats["misses"] += len(missing)
+        return missing
+
+    def _fill(self, rows: List[Dict[str, Any]], fetched: Dict[uuid.UUID, str]) -> Dict[str, int]:
+        with self._lock:
+            if fetched:
+                self._stats["fetches"] += 1
+                self._stats["fetched_chars"] += sum(len(t) for t in fetched.values())
+            for chunk_id, text in fetched.items():
+                self._texts.setdefault(chunk_id, text)
+            for row in rows:
+                if row.get('chunk_text') is None and row['chunk_id'] in self._texts:
+                    row['chunk_text'] = self._texts[row['chunk_id']]
+                    row.pop('chunk_chars', None)
+        return {"rows": len(rows), "fetched": len(fetched)}
+
+    def attach_texts(self, rows: List[Dict[str, Any]], fetch: Callable[[List[uuid.UUID]], Dict[uuid.UUID, str]]) -> Dict[str, int]:
+        """Sets row['chunk_text'] from the store, fetching the unknown chunk ids with one `fetch(ids)` call (get_chunk_texts)."""
+        missing = self._missing(rows)
+        return self._fill(rows, fetch(missing) if missing else {})
+
+    async def attach_texts_async(self, rows: List[Dict[str, Any]],
+                                 fetch: Callable[[List[uuid.UUID]], Awaitable[Dict[uuid.UUID, str]]]) -> Dict[str, int]:
+        missing = self._missing(rows)
+        return self._fill(rows, await fetch(missing) if missing else {})
+
+    def joined(self, chunk_ids: List[uuid.UUID], separator: str = "\n\n") -> str:
+        """The texts of `chunk_ids` joined in the given order; built once per distinct unit and then shared."""
+        if len(chunk_ids) == 1:
+            return self._texts.get(chunk_ids[0], "")
+        key = tuple(chunk_ids)
+        with self._lock:
+            text = self._joined.get(key)
+            if text is None:
+                text = self._joined[key] = separator.join(self._texts.get(cid, "") for cid in chunk_ids)
+            else:
+                self._stats["shared_chars"] += len(text)
+        return text
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"chunks": len(self._texts), "text_chars": sum(len(t) for t in self._texts.values()),
+                          "joined_units": len(self._joined)})
+        return stats
@@ -0,0 +1,301 @@
+# retrieval/context_packer.py
+# Token-budget context packer: fills each intent's per-task token budget greedily by relevance per token with a mix
+# of whole sections, neighbour windows, runs of neighbouring chunks and single chunks, replacing all-or-nothing
+# full-document injection.
+import math
+import uuid
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from config import (CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGETS, CONTEXT_PACK_CONTEXT_WEIGHT, CONTEXT_PACK_MAX_SECTION_SHARE,
+                    CONTEXT_PACK_UNIT_OVERHEAD_TOKENS, CONTEXT_NEIGHBOUR_WINDOW, MAX_TOKENS_PER_GEMINI_CALL_APPROX, APPROX_CHARS_PER_TOKEN,
+                    HYBRID_RRF_K)
+
+
+def parse_token_budgets(spec: str) -> Dict[str, int]:
+    """'ASSESS=16000,RETRIEVE=6000' -> {'ASSESS': 16000, 'RETRIEVE': 6000}; malformed entries are skipped."""
+    budgets: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            budgets[name.strip().upper()] = int(value)
+        except ValueError:
+            if part.strip():
+                print(f"WARNING: Ignoring malformed CONTEXT_TOKEN_BUDGETS entry '{part.strip()}'.")
+    return budgets
+
+
+DEFAULT_TOKEN_BUDGETS = parse_token_budgets(CONTEXT_TOKEN_BUDGETS)
+MAX_CONTEXT_TOKENS = int(MAX_TOKENS_PER_GEMINI_CALL_APPROX * 0.75) # Leave 25% for prompt, output
+
+
+def approx_tokens(text: Optional[str]) -> int:
+    return math.ceil(len(text or "") / APPROX_CHARS_PER_TOKEN)
+
+
+def row_tokens(row: Dict[str, Any]) -> int:
+    """From the text, or from chunk_chars for rows fetched without text (include_text=False)."""
+    if row.get('chunk_text') is not None:
+        return approx_tokens(row['chunk_text'])
+    return math.ceil((row.get('chunk_chars') or 0) / APPROX_CHARS_PER_TOKEN)
+
+
+def ranked_score(row: Dict[str, Any], rank: int) -> float:
+    """
+    Relevance of the chunk at `rank` of a ranked list: its fused rrf_score, or the RRF score of its position when it
+    has none or when the list was re-ordered by the cross-encoder (rerank_score set; its scores are in model units).
+    """
+    if row.get('rerank_score') is None and row.get('rrf_score'):
+        return row['rrf_score']
+    return 1.0 / (HYBRID_RRF_K + rank + 1)
+
+
+def token_budget_for(task_type: Optional[str], retrieval_config: Optional[Dict[str, Any]] = None,
+                     budgets: Optional[Dict[str, int]] = None) -> Tuple[int, str]:
+    """
+    (budget, where it came from). retrieval_config['context_token_budget'] wins; otherwise the longest
+    CONTEXT_TOKEN_BUDGETS key contained in the task type (so 'ASSESS_POLICY_COMPLIANCE' uses 'ASSESS');
+    otherwise CONTEXT_TOKEN_BUDGET. Always capped at 75% of MAX_TOKENS_PER_GEMINI_CALL_APPROX.
+    """
+    budgets = DEFAULT_TOKEN_BUDGETS if budgets is None else budgets
+    explicit = (retrieval_config or {}).get("context_token_budget")
+    if isinstance(explicit, (int, float)) and explicit > 0:
+        return min(int(explicit), MAX_CONTEXT_TOKENS), "retrieval_config"
+    task = (task_type or "").upper()
+    matches = [key for key in budgets if key and key in task]
+    if matches:
+        key = max(matches, key=len)
+        return min(budgets[key], MAX_CONTEXT_TOKENS), f"task_type:{key}"
+    return min(CONTEXT_TOKEN_BUDGET, MAX_CONTEXT_TOKENS), "default"
+
+
+def section_keys(ranked_chunks: List[Dict[str, Any]]) -> List[Tuple[uuid.UUID, str]]:
+    """(doc_id, section) of every ranked chunk that has a section, in rank order; these are fetched as whole-section units."""
+    return list(dict.fromkeys((c['doc_id'], c['section']) for c in ranked_chunks if c.get('section')))
+
+
+def neighbour_window_for(retrieval_config: Optional[Dict[str, Any]] = None) -> int:
+    """Chunks on either side of each hit offered as a window unit: retrieval_config['neighbour_window'] or CONTEXT_NEIGHBOUR_WINDOW."""
+    explicit = (retrieval_config or {}).get("neighbour_window")
+    if isinstance(explicit, int) and not isinstance(explicit, bool) and explicit >= 0:
+        return explicit
+    return max(0, CONTEXT_NEIGHBOUR_WINDOW)
+
+
+def rows_within_window(window_rows: List[Dict[str, Any]], hit_ids: List[uuid.UUID], window: int) -> List[Dict[str, Any]]:
+    """
+    The get_neighbour_chunks rows within `window` positions of one of `hit_ids`, so one query fetched with the largest
+    window of several intents serves each of them.
+    """
+    hit_set = set(hit_ids)
+    hit_positions: Dict[uuid.UUID, List[int]] = {}
+    for row in window_rows:
+        if row['chunk_id'] in hit_set:
+            hit_positions.setdefault(row['doc_id'], []).append(row['doc_position'])
+    return [row for row in window_rows
+            if any(abs(row['doc_position'] - p) <= window for p in hit_positions.get(row['doc_id'], ()))]
+
+
+class _PackUnit:
+    """A candidate context unit: its chunks in document order and the value of each one."""
+    def __init__(self, kind: str, chunk_ids: List[uuid.UUID], values: Dict[uuid.UUID, float]):
+        self.kind = kind # "chunk" | "neighbours" | "window" | "section"
+        self.chunk_ids = chunk_ids
+        self.chunk_set = set(chunk_ids)
+        self.values = values
+
+
+class ContextPlan:
+    """The units chosen by ContextPacker.select(); render() turns it into chunk_context once the chunk texts are present."""
+    def __init__(self, budget: int, rows: Dict[uuid.UUID, Dict[str, Any]], order: Dict[uuid.UUID, int], rank: Dict[uuid.UUID, int],
+                 scores: Dict[uuid.UUID, float], tokens: Dict[uuid.UUID, int], entries: List[Dict[str, Any]], used_tokens: int,
+                 candidates: Dict[str, int]):
+        self.budget = budget
+        self.rows = rows; self.order = order; self.rank = rank; self.scores = scores; self.tokens = tokens
+        self.entries = entries # Packed units, most relevant first: {unit, chunk_set, tokens, reason, ranked, context_chunks}
+        self.used_tokens = used_tokens
+        self.candidates = candidates
+
+    def packed_rows(self) -> List[Dict[str, Any]]:
+        """Rows of every packed chunk (the only texts render() needs)."""
+        return [self.rows[cid] for e in self.entries for cid in e['chunk_set']]
+
+
+class ContextPacker:
+    """
+    Greedy budgeted packing. Candidate units:
+      - chunk:      one ranked chunk
+      - neighbours: a run of ranked chunks of one document on the same or adjacent pages, packed as one passage
+      - window:     a ranked chunk with the `window` chunks before and after it (rows from get_neighbour_chunks), and
+                    each run where such windows overlap, so a mid-paragraph hit arrives with its surrounding text
+      - section:    every chunk of a (doc_id, section) that holds a ranked chunk (rows from get_section_chunks)
+    Multi-chunk units larger than max_section_share of the budget are not offered.
+    A ranked chunk is worth its fused score (ranked_score); an unretrieved chunk inside a section or window is worth
+    context_weight x the unit's mean ranked score. Each step packs the unit with the highest marginal value per
+    marginal token (chunks not yet packed, plus one header, minus the headers of packed units it absorbs) that still
+    fits the budget. A chunk is packed at most once.
+    """
+    def __init__(self, context_weight: float = CONTEXT_PACK_CONTEXT_WEIGHT, max_section_share: float = CONTEXT_PACK_MAX_SECTION_SHARE,
+                 unit_overhead_tokens: int = CONTEXT_PACK_UNIT_OVERHEAD_TOKENS):
+        self.context_weight = context_weight
+        self.max_section_share = max_section_share
+        self.unit_overhead_tokens = unit_overhead_tokens
+
+    def _context_unit(self, kind: str, chunk_ids: List[uuid.UUID], scores: Dict[uuid.UUID, float], tokens: Dict[uuid.UUID, int],
+                      max_unit_tokens: float) -> Optional[_PackUnit]:
+        """A section or window unit; None when it has under two chunks, no ranked chunk, or is too large."""
+        ranked_scores = [scores[cid] for cid in chunk_ids if cid in scores]
+        if len(chunk_ids) < 2 or not ranked_scores or sum(tokens[cid] for cid in chunk_ids) > max_unit_tokens:
+            return None
+        context_value = self.context_weight * sum(ranked_scores) / len(ranked_scores)
+        return _PackUnit(kind, chunk_ids, {cid: scores.get(cid, context_value) for cid in chunk_ids})
+
+    def _window_units(self, window_rows: List[Dict[str, Any]], window: int, scores: Dict[uuid.UUID, float],
+                      tokens: Dict[uuid.UUID, int], max_unit_tokens: float) -> List[_PackUnit]:
+        """One unit per hit window and one per run of overlapping windows (rows arrive in document order with doc_position)."""
+        by_doc: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+        for row in window_rows:
+            by_doc.setdefault(row['doc_id'], []).append(row)
+        spans: Dict[Tuple[uuid.UUID, ...], None] = {} # Insertion-ordered set; identical windows are offered once
+        for doc_rows in by_doc.values():
+            run: List[Dict[str, Any]] = []
+            for row in doc_rows + [None]:
+                if row is not None and (not run or row['doc_position'] == run[-1]['doc_position'] + 1):
+                    run.append(row)
+                    continue
+                for hit in (r for r in run if r['chunk_id'] in scores):
+                    spans[tuple(r['chunk_id'] for r in run if abs(r['doc_position'] - hit['doc_position']) <= window)] = None
+                spans[tuple(r['chunk_id'] for r in run)] = None
+                run = [row] if row is not None else []
+        units = [self._context_unit("window", list(ids), scores, tokens, max_unit_tokens) for ids in spans]
+        return [u for u in units if u is not None]
+
+    def _build_units(self, ranked: List[Dict[str, Any]], section_rows: List[Dict[str, Any]], scores: Dict[uuid.UUID, float],
+                     tokens: Dict[uuid.UUID, int], budget: int, window_rows: Optional[List[Dict[str, Any]]] = None,
+                     window: int = 0) -> List[_PackUnit]:
+        units = [_PackUnit("chunk", [c['chunk_id']], {c['chunk_id']: scores[c['chunk_id']]}) for c in ranked]
+        max_unit_tokens = budget * self.max_section_share
+
+        # Runs of ranked chunks on the same or adjacent pages of one document
+        by_doc: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+        for c in ranked:
+            by_doc.setdefault(c['doc_id'], []).append(c)
+        for doc_chunks in by_doc.values():
+            doc_chunks.sort(key=lambda c: c.get('page_number') or 0)
+            run = [doc_chunks[0]]
+            for c in doc_chunks[1:] + [None]:
+                if c is not None and (c.get('page_number') or 0) - (run[-1].get('page_number') or 0) <= 1:
+                    run.append(c)
+                    continue
+                if len(run) > 1 and sum(tokens[r['chunk_id']] for r in run) <= max_unit_tokens:
+                    units.append(_PackUnit("neighbours", [r['chunk_id'] for r in run], {r['chunk_id']: scores[r['chunk_id']] for r in run}))
+                if c is not None:
+                    run = [c]
+
+        if window_rows and window > 0:
+            units.extend(self._window_units(window_rows, window, scores, tokens, max_unit_tokens))
+
+        # Whole sections (rows arrive in document order)
+        sections: Dict[Tuple[uuid.UUID, str], List[uuid.UUID]] = {}
+        for row in section_rows:
+            sections.setdefault((row['doc_id'], row['section']), []).append(row['chunk_id'])
+        for chunk_ids in sections.values():
+            if (unit := self._context_unit("section", chunk_ids, scores, tokens, max_unit_tokens)) is not None:
+                units.append(unit)
+        return units
+
+    def select(self, ranked_chunks: List[Dict[str, Any]], budget: int, section_rows: Optional[List[Dict[str, Any]]] = None,
+               window_rows: Optional[List[Dict[str, Any]]] = None, window: int = 0) -> ContextPlan:
+        """
+        Chooses the units to pack. Needs only chunk sizes, so rows may come without text (chunk_chars instead).
+        `window_rows` (get_neighbour_chunks for the ranked chunks) and `window` enable window units.
+        """
+        section_rows = section_rows or []
+        window_rows = window_rows or []
+        rows: Dict[uuid.UUID, Dict[str, Any]] = {}
+        order: Dict[uuid.UUID, int] = {} # Position in document order, for joining unit text
+        for pos, row in enumerate(window_rows + section_rows):
+            rows.setdefault(row['chunk_id'], row); order.setdefault(row['chunk_id'], pos)
+        rank: Dict[uuid.UUID, int] = {}
+        for i, c in enumerate(ranked_chunks):
+            rank.setdefault(c['chunk_id'], i); rows[c['chunk_id']] = c
+        ranked = [ranked_chunks[i] for i in sorted(rank.values())] # De-duplicated, still in rank order
+        scores = {cid: ranked_score(ranked_chunks[i], i) for cid, i in rank.items()}
+        tokens = {cid: row_tokens(row) for cid, row in rows.items()}
+        units = self._build_units(ranked, section_rows, scores, tokens, budget, window_rows, window)
+
+        overhead = self.unit_overhead_tokens
+        packed: Dict[uuid.UUID, int] = {} # chunk_id -> index of the entry holding it
+        entries: List[Optional[Dict[str, Any]]] = []
+        remaining = budget
+        while True:
+            best = None
+            for unit in units:
+                new_ids = [cid for cid in unit.chunk_ids if cid not in packed]
+                if not new_ids:
+                    continue
+                absorbed = {packed[cid] for cid in unit.chunk_ids if cid in packed}
+                absorbed = {e for e in absorbed if entries[e]['chunk_set'] <= unit.chunk_set} # Only whole packed units are absorbed
+                cost = sum(tokens[cid] for cid in new_ids) + overhead * (1 - len(absorbed))
+                if cost > remaining:
+                    continue
+                gain = sum(unit.values[cid] for cid in new_ids)
+                density = gain / max(cost, 1)
+                if best is None or density > best[0]:
+                    best = (density, unit, new_ids, absorbed, cost)
+            if best is None:
+                break
+            density, unit, new_ids, absorbed, cost = best
+            held = set(new_ids) | {cid for e in absorbed for cid in entries[e]['chunk_set']}
+            for e in absorbed:
+                entries[e] = None
+            reason = f"best relevance per token ({density:.2e}) among fitting units"
+            if absorbed:
+                reason += f"; absorbs {len(absorbed)} packed unit(s)"
+            entry = {"unit": unit.kind, "chunk_set": held, "tokens": sum(tokens[cid] for cid in held), "reason": reason,
+                     "ranked": sum(1 for cid in held if cid in scores), "context_chunks": sum(1 for cid in held if cid not in scores)}
+            entries.append(entry)
+            for cid in held:
+                packed[cid] = len(entries) - 1
+            remaining -= cost
+
+        packed_entries = [e for e in entries if e is not None]
+        packed_entries.sort(key=lambda e: min(rank.get(cid, len(rank)) for cid in e['chunk_set'])) # Most relevant unit first
+        return ContextPlan(budget, rows, order, rank, scores, tokens, packed_entries, budget - remaining,
+                           {kind: sum(1 for u in units if u.kind == kind) for kind in ("chunk", "neighbours", "window", "section")})
+
+    def render(self, plan: ContextPlan, join_texts: Optional[Callable[[List[uuid.UUID]], str]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Returns (chunk_context entries, report). Entries have the chunk_context shape ({chunk_id, chunk_text, metadata});
+        a multi-chunk unit is one entry whose text joins its chunks in document order, with every id in metadata['chunk_ids'].
+        `join_texts` (RunChunkStore.joined) lets intents share unit texts; by default the rows' texts are joined.
+        The report lists each packed unit with the reason it was chosen, for provenance.
+        """
+        rows, order, rank, scores = plan.rows, plan.order, plan.rank, plan.scores
+        context: List[Dict[str, Any]] = []
+        report_units: List[Dict[str, Any]] = []
+        for e in plan.entries:
+            ids = sorted(e['chunk_set'], key=lambda cid: (rows[cid].get('page_number') or 0, order.get(cid, len(order) + rank.get(cid, 0))))
+            first = rows[ids[0]]
+            pages = sorted({rows[cid].get('page_number') for cid in ids if rows[cid].get('page_number') is not None})
+            best_ranked = min(ids, key=lambda cid: rank.get(cid, len(rank)))
+            metadata = {"chunk_id": str(ids[0]), "chunk_ids": [str(cid) for cid in ids], "doc_id": str(first['doc_id']),
+                        "doc_title": first.get('doc_title'), "document_type": first.get('document_type'),
+                        "page_number": first.get('page_number'), "pages": pages, "section": first.get('section'),
+                        "unit": e['unit'], "approx_tokens": e['tokens'], "rrf_score": round(scores.get(best_ranked, 0.0), 6),
+                        "distance": rows[best_ranked].get('distance'), "pack_reason": e['reason']}
+            text = join_texts(ids) if join_texts is not None else "\n\n".join(rows[cid]['chunk_text'] for cid in ids)
+            context.append({"chunk_id": str(ids[0]), "chunk_text": text, "metadata": metadata})
+            report_units.append({"unit": e['unit'], "doc_id": str(first['doc_id']), "section": first.get('section'),
+                                 "pages": [pages[0], pages[-1]] if pages else [], "chunks": len(ids), "ranked": e['ranked'],
+                                 "context_chunks": e['context_chunks'], "tokens": e['tokens'], "reason": e['reason']})
+
+        packed = {cid for e in plan.entries for cid in e['chunk_set']}
+        report = {"budget": plan.budget, "used_tokens": plan.used_tokens, "units": report_units, "candidates": plan.candidates,
+                  "ranked_tokens": sum(plan.tokens[cid] for cid in scores), # What packing every candidate chunk alone would cost
+                  "ranked_left_out": sum(1 for cid in scores if cid not in packed)}
+        return context, report
+
+    def pack(self, ranked_chunks: List[Dict[str, Any]], budget: int, section_rows: Optional[List[Dict[str, Any]]] = None,
+             window_rows: Optional[List[Dict[str, Any]]] = None, window: int = 0) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """select() + render() for rows that already carry their text."""
+        return self.render(self.select(ranked_chunks, budget, section_rows, window_rows, window))
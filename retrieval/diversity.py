@@ -0,0 +1,122 @@
+# retrieval/diversity.py
+# Maximal marginal relevance (MMR) re-ranking of the fused candidates over their embeddings, vectorized with NumPy, so
+# near-identical chunks (boilerplate repeated across ES volumes) do not fill the context in place of distinct evidence.
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import MMR_LAMBDA, MMR_LAMBDAS, MMR_DUPLICATE_SIMILARITY
+from retrieval.context_packer import row_tokens, ranked_score
+
+
+def parse_mmr_lambdas(spec: str) -> Dict[str, float]:
+    """'RETRIEVE=0.8,ASSESS=0.65' -> {'RETRIEVE': 0.8, 'ASSESS': 0.65}; malformed or out-of-range entries are skipped."""
+    lambdas: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            lam = float(value)
+        except ValueError:
+            lam = -1.0
+        if 0.0 <= lam <= 1.0:
+            lambdas[name.strip().upper()] = lam
+        elif part.strip():
+            print(f"WARNING: Ignoring malformed MMR_LAMBDAS entry '{part.strip()}'.")
+    return lambdas
+
+
+DEFAULT_MMR_LAMBDAS = parse_mmr_lambdas(MMR_LAMBDAS)
+
+
+def mmr_lambda_for(task_type: Optional[str], retrieval_config: Optional[Dict[str, Any]] = None,
+                   lambdas: Optional[Dict[str, float]] = None) -> Tuple[float, str]:
+    """
+    (lambda, where it came from). retrieval_config['mmr_lambda'] wins; otherwise the longest MMR_LAMBDAS key
+    contained in the task type; otherwise MMR_LAMBDA. Same lookup as context_packer.token_budget_for.
+    """
+    lambdas = DEFAULT_MMR_LAMBDAS if lambdas is None else lambdas
+    explicit = (retrieval_config or {}).get("mmr_lambda")
+    if isinstance(explicit, (int, float)) and not isinstance(explicit, bool) and 0.0 <= explicit <= 1.0:
+        return float(explicit), "retrieval_config"
+    task = (task_type or "").upper()
+    matches = [key for key in lambdas if key and key in task]
+    if matches:
+        key = max(matches, key=len)
+        return lambdas[key], f"task_type:{key}"
+    return MMR_LAMBDA, "default"
+
+
+def mmr_order(relevance: np.ndarray, vectors: np.ndarray, has_vector: np.ndarray, lam: float,
+              duplicate_similarity: float = MMR_DUPLICATE_SIMILARITY) -> Tuple[List[int], List[Tuple[int, int, float]]]:
+    """
+    Greedy MMR: each step picks argmax(lam * relevance - (1 - lam) * max cosine similarity to the picked candidates).
+    The similarity matrix is computed once and the running maxima are updated with one vector operation per pick.
+    A candidate whose similarity to a picked one reaches duplicate_similarity is dropped instead of ordered.
+    Candidates without a vector are never penalised. Returns (order, [(dropped, duplicate_of, similarity)]).
+    """
+    n = len(relevance)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    sim = unit @ unit.T
+    sim[~has_vector, :] = 0.0; sim[:, ~has_vector] = 0.0
+    max_sim = np.full(n, -np.inf, dtype=np.float32) # Nothing picked yet: the first pick is the most relevant
+    nearest = np.full(n, -1, dtype=np.int64)
+    open_ = np.ones(n, dtype=bool)
+    order: List[int] = []; dropped: List[Tuple[int, int, float]] = []
+    while open_.any():
+        penalty = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        score = np.where(open_, lam * relevance - (1.0 - lam) * penalty, -np.inf)
+        pick = int(np.argmax(score))
+        open_[pick] = False
+        order.append(pick)
+        closer = sim[:, pick] > max_sim
+        max_sim = np.where(closer, sim[:, pick], max_sim); nearest = np.where(closer, pick, nearest)
+        duplicates = np.flatnonzero(open_ & (max_sim >= duplicate_similarity))
+        for i in duplicates:
+            dropped.append((int(i), int(nearest[i]), float(max_sim[i])))
+        open_[duplicates] = False
+    return order, dropped
+
+
+def diversify(candidates: List[Dict[str, Any]], embeddings: Dict[uuid.UUID, np.ndarray], lam: float, keep_top: int,
+              duplicate_similarity: float = MMR_DUPLICATE_SIMILARITY) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Re-orders fused candidates (rank order, rrf_score) by MMR over `embeddings` (chunk_id -> vector) and drops
+    near-duplicates. Skipped (report['skipped']) when fewer than two candidates have vectors or all vectors are identical. Relevance is ranked_score (rrf_score, or the position after cross-encoder re-ranking) scaled to
+    [0, 1]. Returns (rows, report); the report counts the dropped duplicates and their tokens, and the chunks pushed
+    out of the top `keep_top` (intent.result).
+    """
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"lambda": lam, "candidates": len(candidates),
+                              "with_embeddings": sum(1 for c in candidates if c['chunk_id'] in embeddings)}
+    if len(candidates) < 2 or report["with_embeddings"] < 2:
+        report.update({"duplicates_dropped": 0, "redundant_tokens_removed": 0, "displaced_from_top": 0, "skipped": "too few embeddings"})
+        return candidates, report
+    relevance = np.array([ranked_score(c, i) for i, c in enumerate(candidates)], dtype=np.float32)
+    relevance = relevance / max(float(relevance.max()), 1e-12)
+    dimension = len(next(iter(embeddings.values())))
+    vectors = np.zeros((len(candidates), dimension), dtype=np.float32)
+    has_vector = np.zeros(len(candidates), dtype=bool)
+    for i, c in enumerate(candidates):
+        vector = embeddings.get(c['chunk_id'])
+        if vector is not None and len(vector) == dimension:
+            vectors[i] = vector; has_vector[i] = True
+    unit = vectors[has_vector] / np.maximum(np.linalg.norm(vectors[has_vector], axis=1, keepdims=True), 1e-12)
+    if float(np.ptp(unit, axis=0).max()) < 1e-6:
+        # Every candidate has the same direction (placeholder backend, or rows ingested with it): all similarities are
+        # 1.0 and every candidate after the first would be dropped as a copy, so leave the fused order alone
+        report.update({"duplicates_dropped": 0, "redundant_tokens_removed": 0, "displaced_from_top": 0, "skipped": "identical embeddings"})
+        return candidates, report
+    order, dropped = mmr_order(relevance, vectors, has_vector, lam, duplicate_similarity)
+    reranked = [candidates[i] for i in order]
+    before_top = {c['chunk_id'] for c in candidates[:keep_top]}
+    after_top = {c['chunk_id'] for c in reranked[:keep_top]}
+    report.update({"duplicates_dropped": len(dropped),
+                   "redundant_tokens_removed": sum(row_tokens(candidates[i]) for i, _, _ in dropped),
+                   "duplicates": [{"chunk_id": str(candidates[i]['chunk_id']), "duplicate_of": str(candidates[j]['chunk_id']),
+                                   "similarity": round(s, 4)} for i, j, s in dropped[:10]],
+                   "displaced_from_top": len(before_top - after_top),
+                   "ms": round((time.perf_counter() - start) * 1000, 2)})
+    return reranked, report
@@ -0,0 +1,247 @@
+# retrieval/evidence_index.py
+# Ingest-time evidence tagging: each chunk is tagged with the key evidence categories the report templates and the
+# material consideration ontology ask for ("HousingStatement", "DAS_ResidentialChapter", ...). The database keeps one
+# category -> chunk ids entry per application, so an intent fetches its evidence set by lookup instead of a text scan.
+import glob
+import json
+import os
+import re
+import threading
+import uuid
+from typing import List, Dict, Any, Optional, Iterable, NamedTuple, FrozenSet, Tuple
+
+from config import REPORT_TEMPLATE_DIR, MC_ONTOLOGY_DIR, EVIDENCE_TAG_LEAD_CHARS
+from retrieval.text_search import clean_terms, stem_word
+
+EVIDENCE_CATEGORY_KEYS = ("key_evidence_document_types", "key_evidence_docs") # Report template / ontology fields
+
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STOP_WORDS = {"and", "or", "of", "the", "for", "to", "from", "with", "by", "in", "on", "a", "an", "any", "all"}
+_GENERIC_QUALIFIER_WORDS = {"chapter", "chapters", "section", "sections", "volume", "volumes", "part", "parts", "appendix", "appendices"} # "DAS_AllVolumes" is the whole DAS
+
+# Planning acronyms used in category names; a term matches the acronym itself or all of its expansion's words
+EVIDENCE_ACRONYMS = {
+    "das": "design and access statement", "es": "environmental statement", "nts": "non technical summary",
+    "fra": "flood risk assessment", "dba": "desk based assessment", "tvia": "townscape visual impact assessment",
+    "lvia": "landscape visual impact assessment", "hra": "habitats regulations assessment", "lbc": "listed building consent",
+    "ptal": "public transport accessibility level", "cemp": "construction environmental management plan",
+    "swmp": "site waste management plan", "cgi": "computer generated image",
+}
+
+Term = Tuple[FrozenSet[str], ...] # Alternative stem sets; the term matches when one of them is contained in the words
+
+
+def _words(text: str) -> List[str]:
+    """'DAS_ResidentialChapter' -> ['das', 'residential', 'chapter']; plain titles split on words as well."""
+    return [w.lower() for w in _CAMEL_RE.findall(text or "")]
+
+
+def _stem_set(words: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(stem_word(w) for w in words if w not in _STOP_WORDS)
+
+
+def descriptor_stems(*texts: Optional[str]) -> FrozenSet[str]:
+    """Stemmed words of a document type, title, filename or section heading (CamelCase and underscores split)."""
+    return frozenset(stem_word(w) for text in texts if text for w in _words(text))
+
+
+def _term(word: str) -> Term:
+    options = [frozenset({stem_word(word)})]
+    if word in EVIDENCE_ACRONYMS:
+        options.append(_stem_set(EVIDENCE_ACRONYMS[word].split()))
+    return tuple(options)
+
+
+def _is_acronym(segment: str) -> bool:
+    """'DAS', 'TVIA', 'EcIA': two or more capitals and no lower-case run of three letters."""
+    return (len(segment) <= 7 and sum(c.isupper() for c in segment) >= 2 and not re.search(r"[a-z]{3}", segment))
+
+
+def _matches(terms: List[Term], words: FrozenSet[str]) -> bool:
+    return all(any(option <= words for option in term) for term in terms)
+
+
+class EvidenceCategory(NamedTuple):
+    """
+    A parsed category name. The first segment names the document ("HousingStatement", "DAS"); "Or" gives
+    alternatives ("TransportStatementOrAssessment"). Later segments are qualifiers the chunk's section heading or
+    leading text must mention ("ResidentialChapter"); conditional tails ("_IfRequired", "_e_g_...") are dropped,
+    and so are acronyms repeating a spelled-out head ("FloodRiskAssessment_FRA").
+    """
+    name: str
+    heads: List[List[Term]]
+    qualifier: List[Term]
+
+    def matches_document(self, words: FrozenSet[str]) -> bool:
+        return any(_matches(head, words) for head in self.heads)
+
+    def matches_section(self, words: FrozenSet[str]) -> bool:
+        """A heading naming the whole head ("Affordable Housing Statement" inside a planning statement) also qualifies."""
+        return any(len(head) >= 2 and _matches(head, words) for head in self.heads)
+
+    def matches_chunk(self, words: FrozenSet[str]) -> bool:
+        return _matches(self.qualifier, words)
+
+
+def parse_evidence_category(name: str) -> Optional[EvidenceCategory]:
+    segments = [s for s in re.split(r"_+", name or "") if s.strip()]
+    kept: List[str] = []
+    for segment in segments:
+        if segment == "e" or re.match(r"If[A-Z]", segment):
+            break
+        kept.append(segment)
+    pieces: List[List[str]] = [[]]
+    for segment in kept:
+        if segment == "Or":
+            pieces.append([])
+        else:
+            pieces[-1].append(segment)
+    pieces = [piece for piece in pieces if piece]
+    if not pieces:
+        return None
+
+    heads: List[List[str]] = []
+    for piece in pieces:
+        alternatives = [[]]
+        for word in _words(piece[0]):
+            if word == "or":
+                alternatives.append([])
+            elif word not in _STOP_WORDS:
+                alternatives[-1].append(word)
+        alternatives = [alt for alt in alternatives if alt]
+        for alt in alternatives[1:]: # "TransportStatementOrAssessment": the second alternative is "Transport Assessment"
+            if len(alt) == 1 and len(alternatives[0]) > 1:
+                alt.insert(0, alternatives[0][0])
+        heads.extend(alternatives)
+    if not heads:
+        return None
+    head_is_acronym = all(_is_acronym(piece[0]) for piece in pieces)
+    qualifier_words: List[str] = []
+    for piece in pieces:
+        for segment in piece[1:]:
+            if _is_acronym(segment) and not head_is_acronym:
+                continue
+            qualifier_words.extend(w for w in _words(segment) if w not in _STOP_WORDS and w not in _GENERIC_QUALIFIER_WORDS)
+    return EvidenceCategory(name, [[_term(w) for w in head] for head in heads], [_term(w) for w in dict.fromkeys(qualifier_words)])
+
+
+def load_evidence_categories(template_dir: str = REPORT_TEMPLATE_DIR, ontology_dir: str = MC_ONTOLOGY_DIR) -> List[str]:
+    """Every key evidence category named in the report templates and the ontology, in first-seen order."""
+    categories: Dict[str, None] = {}
+    def walk(node: Any):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in EVIDENCE_CATEGORY_KEYS and isinstance(value, list):
+                    categories.update((c, None) for c in clean_terms(value))
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+    for directory in (template_dir, ontology_dir):
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    walk(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"WARNING: Could not read evidence categories from {path}: {e}")
+    return list(categories)
+
+
+class EvidenceTagger:
+    """Tags the chunks of one document with the categories they are evidence for (pure Python, no database access)."""
+    def __init__(self, categories: Iterable[str]):
+        parsed = (parse_evidence_category(name) for name in dict.fromkeys(categories))
+        self.categories: List[EvidenceCategory] = [c for c in parsed if c is not None]
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def tag_document(self, document: Dict[str, Any], chunks: List[Dict[str, Any]]) -> List[List[str]]:
+        """Categories per chunk. `document` carries document_type, title and filename; chunks carry section and chunk_text."""
+        doc_words = descriptor_stems(document.get('document_type'), document.get('title'),
+                                     os.path.splitext(document.get('filename') or "")[0])
+        doc_categories = [c for c in self.categories if c.matches_document(doc_words)]
+        others = [c for c in self.categories if not c.matches_document(doc_words)]
+        section_categories: Dict[Optional[str], List[EvidenceCategory]] = {}
+        tags = []
+        for chunk in chunks:
+            section = chunk.get('section')
+            if section not in section_categories:
+                section_words = descriptor_stems(section)
+                section_categories[section] = doc_categories + [c for c in others if c.matches_section(section_words)]
+            candidates = section_categories[section]
+            if any(c.qualifier for c in candidates):
+                chunk_words = descriptor_stems(section) | descriptor_stems((chunk.get('chunk_text') or "")[:EVIDENCE_TAG_LEAD_CHARS])
+            else:
+                chunk_words = frozenset()
+            tags.append([c.name for c in candidates if c.matches_chunk(chunk_words)])
+        return tags
+
+    def index_entries(self, document: Dict[str, Any], chunks: List[Dict[str, Any]],
+                      chunk_ids: List[uuid.UUID]) -> Tuple[List[str], List[uuid.UUID]]:
+        """(category, chunk_id) pairs as two parallel lists, the shape the evidence index writes take."""
+        categories: List[str] = []; ids: List[uuid.UUID] = []
+        for chunk_id, chunk_tags in zip(chunk_ids, self.tag_document(document, chunks)):
+            categories.extend(chunk_tags); ids.extend([chunk_id] * len(chunk_tags))
+        return categories, ids
+
+
+_default_tagger: Optional[EvidenceTagger] = None
+_default_tagger_lock = threading.Lock()
+
+
+def get_evidence_tagger() -> EvidenceTagger:
+    """Process-wide tagger over load_evidence_categories(), built on first use."""
+    global _default_tagger
+    with _default_tagger_lock:
+        if _default_tagger is None:
+            _default_tagger = EvidenceTagger(load_evidence_categories())
+            print(f"INFO: Evidence tagger loaded {len(_default_tagger)} categories.")
+        return _default_tagger
+
+
+def evidence_categories_for(retrieval_config: Dict[str, Any]) -> List[str]:
+    """The intent's evidence categories (retrieval_config 'evidence_categories', set from the node's key evidence types)."""
+    categories = retrieval_config.get("evidence_categories")
+    return clean_terms(categories) if isinstance(categories, list) else []
+
+
+def rank_evidence_rows(rows: List[Dict[str, Any]], categories: List[str], limit: int,
+                       sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    The rows tagged with any of `categories` (and from `sources`, when given), most categories matched first, then by
+    the first matched category's position in `categories`. Each row's evidence_categories is narrowed to `categories`.
+    """
+    position = {category: i for i, category in enumerate(categories)}
+    wanted_sources = set(sources) if sources is not None else None
+    ranked = []
+    for order, row in enumerate(rows):
+        if wanted_sources is not None and row.get('source') not in wanted_sources:
+            continue
+        matched = sorted((c for c in set(row.get('evidence_categories') or []) if c in position), key=position.get)
+        if matched:
+            ranked.append((-len(matched), position[matched[0]], order, {**row, "evidence_categories": matched}))
+    ranked.sort(key=lambda entry: entry[:3])
+    return [entry[3] for entry in ranked[:limit]]
+
+
+def rebuild_evidence_index(db_manager, sources: List[str], tagger: Optional[EvidenceTagger] = None) -> Dict[str, int]:
+    """
+    Re-tags every chunk of the given applications and replaces their index entries (documents ingested before the
+    index existed, or after the templates / ontology gained categories). Returns source -> number of tags written.
+    """
+    tagger = tagger or get_evidence_tagger()
+    written: Dict[str, int] = {}
+    for source in sources:
+        documents: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+        for row in db_manager.get_evidence_tagging_rows([source]):
+            documents.setdefault(row['doc_id'], []).append(row)
+        categories: List[str] = []; chunk_ids: List[uuid.UUID] = []
+        for chunk_rows in documents.values():
+            doc_categories, doc_chunk_ids = tagger.index_entries(chunk_rows[0], chunk_rows, [r['chunk_id'] for r in chunk_rows])
+            categories.extend(doc_categories); chunk_ids.extend(doc_chunk_ids)
+        db_manager.replace_evidence_index(source, categories, chunk_ids)
+        written[source] = len(categories)
+        print(f"INFO: Evidence index for '{source}' rebuilt: {len(categories)} tags over {len(documents)} documents.")
+    return written
@@ -0,0 +1,68 @@
+# retrieval/hierarchy.py
+# Coarse-to-fine semantic search: every document and every section has a summary embedding (the normalised centroid of
+# its chunk vectors), so a query first picks the nearest documents, then the nearest sections
+# inside them, and ranks chunks inside those sections only, instead of ranking every chunk of the application.
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import HIERARCHICAL_RETRIEVAL_TASKS, HIERARCHICAL_DOC_CANDIDATES, HIERARCHICAL_SECTION_CANDIDATES
+
+SUMMARY_LEVELS = ("document", "section")
+DOCUMENT_SUMMARY_SECTION = "" # Section key of the document-level row, and of the section row grouping chunks without a section
+
+
+def parse_hierarchical_tasks(spec: str) -> List[str]:
+    """'RETRIEVE,ASSESS_HERITAGE' -> ['RETRIEVE', 'ASSESS_HERITAGE']."""
+    return [part.strip().upper() for part in (spec or "").split(",") if part.strip()]
+
+
+DEFAULT_HIERARCHICAL_TASKS = parse_hierarchical_tasks(HIERARCHICAL_RETRIEVAL_TASKS)
+
+
+def hierarchy_for(task_type: Optional[str], retrieval_config: Optional[Dict[str, Any]] = None,
+                  tasks: Optional[List[str]] = None) -> Optional[Tuple[Tuple[int, int], str]]:
+    """
+    ((document candidates, section candidates), where the decision came from), or None for the flat search.
+    retrieval_config['hierarchical_search'] (true / false) wins; otherwise the search is hierarchical when a
+    HIERARCHICAL_RETRIEVAL_TASKS entry is contained in the task type (same matching as mmr_lambda_for).
+    """
+    tasks = DEFAULT_HIERARCHICAL_TASKS if tasks is None else tasks
+    limits = (max(1, HIERARCHICAL_DOC_CANDIDATES), max(1, HIERARCHICAL_SECTION_CANDIDATES))
+    explicit = (retrieval_config or {}).get("hierarchical_search")
+    if isinstance(explicit, bool):
+        return (limits, "retrieval_config") if explicit else None
+    task = (task_type or "").upper()
+    matches = [key for key in tasks if key in task]
+    return (limits, f"task_type:{max(matches, key=len)}") if matches else None
+
+
+def summary_vector(vectors: np.ndarray) -> np.ndarray:
+    """Unit-length mean of a group's chunk vectors (what l2_normalize(avg(embedding)) computes in Postgres)."""
+    centroid = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(centroid))
+    return centroid / norm if norm > 0 else centroid
+
+
+def summary_rows(doc_ids: List[uuid.UUID], sections: List[Optional[str]], vectors: np.ndarray) -> List[Tuple[uuid.UUID, str, str, int, np.ndarray]]:
+    """
+    (doc_id, level, section, chunk_count, vector) summary rows for chunks given as parallel lists: one 'document' row
+    per document and one 'section' row per (document, section), chunks without a section grouped under ''.
+    """
+    groups: Dict[Tuple[uuid.UUID, str, str], List[int]] = {}
+    for i, (doc_id, section) in enumerate(zip(doc_ids, sections)):
+        groups.setdefault((doc_id, "document", DOCUMENT_SUMMARY_SECTION), []).append(i)
+        groups.setdefault((doc_id, "section", section or DOCUMENT_SUMMARY_SECTION), []).append(i)
+    return [(doc_id, level, section, len(rows), summary_vector(vectors[rows])) for (doc_id, level, section), rows in groups.items()]
+
+
+def nearest(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact L2 top-k of `query` over the rows of `matrix`: (row indices, distances), nearest first."""
+    if len(matrix) == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    distances = np.sqrt(np.maximum(np.einsum("ij,ij->i", matrix, matrix) - 2.0 * (matrix @ query) + float(query @ query), 0.0))
+    k = min(k, len(distances))
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top], kind="stable")]
+    return top, distances[top]
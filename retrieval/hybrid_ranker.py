@@ -0,0 +1,52 @@
+# retrieval/hybrid_ranker.py
+# Weighted reciprocal rank fusion (RRF) of the retriever's sub-query result lists (keyword, filter, vector).
+# RRF uses only ranks, so keyword-only hits compete with vector hits instead of sorting after every distance.
+import uuid
+from typing import List, Dict, Any, Optional
+
+from config import HYBRID_RRF_K, HYBRID_RRF_WEIGHTS
+
+
+def parse_rrf_weights(spec: str) -> Dict[str, float]:
+    """'vector=1.0,keyword=1.0,filter=0.3' -> {'vector': 1.0, 'keyword': 1.0, 'filter': 0.3}; malformed entries are skipped."""
+    weights: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            if part.strip():
+                print(f"WARNING: Ignoring malformed HYBRID_RRF_WEIGHTS entry '{part.strip()}'.")
+    return weights
+
+
+DEFAULT_RRF_WEIGHTS = parse_rrf_weights(HYBRID_RRF_WEIGHTS)
+
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict[str, Any]]], weights: Optional[Dict[str, float]] = None,
+                           k: int = HYBRID_RRF_K, id_key: str = "chunk_id") -> List[Dict[str, Any]]:
+    """
+    score(chunk) = sum over stages of weight[stage] / (k + rank), with rank starting at 1 within each stage's list.
+    Stages without a weight get 1.0; a weight of 0 disables a stage. Returns one row per chunk, ordered by score
+    (ties by best vector distance, then page and chunk id). Each row gains `rrf_score` and `stage_ranks`.
+    When a chunk appears in several lists, the row from the first list that has it is kept, so list vector
+    results first to keep their `distance`.
+    """
+    weights = DEFAULT_RRF_WEIGHTS if weights is None else weights
+    fused: Dict[uuid.UUID, Dict[str, Any]] = {}
+    for stage, rows in ranked_lists.items():
+        weight = weights.get(stage, 1.0)
+        if weight <= 0:
+            continue
+        for rank, row in enumerate(rows, start=1):
+            entry = fused.get(row[id_key])
+            if entry is None:
+                entry = fused[row[id_key]] = {**row, "rrf_score": 0.0, "stage_ranks": {}}
+            if stage in entry["stage_ranks"]: # Duplicate within one list: only its best rank counts
+                continue
+            entry["stage_ranks"][stage] = rank
+            entry["rrf_score"] += weight / (k + rank)
+            if entry.get("distance") is None and row.get("distance") is not None:
+                entry["distance"] = row["distance"]
+    return sorted(fused.values(), key=lambda r: (-r["rrf_score"], r.get("distance") if r.get("distance") is not None else float("inf"),
+                                                 r.get("page_number") or 0, str(r.get(id_key, ""))))
@@ -0,0 +1,108 @@
+# retrieval/log_buffer.py
+# Write-behind buffer for retrieval_logs: takes the synchronous log INSERT off each node's retrieval critical path.
+import atexit
+import queue
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from db_manager import DatabaseManager
+from config import RETRIEVAL_LOG_BATCH_SIZE, RETRIEVAL_LOG_FLUSH_INTERVAL_SECONDS, RETRIEVAL_LOG_MAX_QUEUE
+
+
+class RetrievalLogBuffer:
+    """
+    Drop-in replacement for DatabaseManager.log_retrieval that queues records in memory and writes them in
+    batches (DatabaseManager.log_retrievals_bulk) from a background thread.
+
+    Flushes when `max_batch_size` records are queued or every `flush_interval_seconds`, whichever comes first.
+    close() (also registered as a DatabaseManager close hook and an atexit handler) drains everything still queued.
+    When the queue is full, new records are dropped and counted rather than blocking retrieval.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_batch_size: int = RETRIEVAL_LOG_BATCH_SIZE,
+                 flush_interval_seconds: float = RETRIEVAL_LOG_FLUSH_INTERVAL_SECONDS, max_queue_size: int = RETRIEVAL_LOG_MAX_QUEUE):
+        self.db_manager = db_manager
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue_size)
+        self._flush_requested = threading.Event()
+        self._stop_requested = threading.Event()
+        self._write_lock = threading.Lock() # Serialises batch writes between the worker and explicit flush()/close()
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches_written": 0, "failed_batches": 0}
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="RetrievalLogBuffer", daemon=True)
+        self._worker.start()
+        db_manager.add_close_hook(self.close) # Flush before the DB connections go away
+        atexit.register(self.close)
+
+    def log_retrieval(self, query_text: str, filters: Optional[Dict], matched_chunk_ids: List[uuid.UUID], agent_context: str):
+        """Same signature as DatabaseManager.log_retrieval; returns immediately."""
+        if self._closed:
+            self.db_manager.log_retrieval(query_text, filters, matched_chunk_ids, agent_context)
+            return
+        record = (uuid.uuid4(), query_text, dict(filters or {}), list(matched_chunk_ids), agent_context,
+                  datetime.now(timezone.utc).replace(tzinfo=None)) # retrieval_logs.timestamp is naive UTC
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._bump("dropped")
+            return
+        self._bump("enqueued")
+        if self._queue.qsize() >= self.max_batch_size:
+            self._flush_requested.set()
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while not self._stop_requested.is_set():
+            self._flush_requested.wait(timeout=self.flush_interval_seconds)
+            self._flush_requested.clear()
+            self._drain()
+
+    def _drain(self):
+        with self._write_lock:
+            while True:
+                batch = []
+                try:
+                    while len(batch) < self.max_batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not batch:
+                    return
+                try:
+                    self.db_manager.log_retrievals_bulk(batch)
+                    self._bump("written", len(batch)); self._bump("batches_written")
+                except Exception as e:
+                    # Logging must never break retrieval; count the loss and carry on
+                    print(f"ERROR: Failed to write {len(batch)} buffered retrieval logs: {type(e).__name__} - {e}")
+                    self._bump("failed_batches"); self._bump("dropped", len(batch))
+
+    def flush(self):
+        """Synchronously write everything queued so far."""
+        self._drain()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_requested.set()
+        self._flush_requested.set()
+        self._worker.join(timeout=max(5.0, self.flush_interval_seconds * 2))
+        self._drain() # Guaranteed final flush, even if the worker is stuck
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
@@ -0,0 +1,97 @@
+# retrieval/memo.py
+# Memo of ranked retrieval candidates per normalized request: dynamic MC children, their summary parents, reruns and
+# clarification intents often repeat the same applications, filters, keywords and semantic text, so the repeat reuses
+# the fused / re-ranked / diversified chunks instead of embedding, searching and ranking again.
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from config import RETRIEVAL_MEMO_MAX_ENTRIES
+
+_SET_ARGS = ("sources", "document_types", "categories") # Order does not change a sub-query's rows
+
+
+def _normalized_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    normalized = {key: value for key, value in args.items() if key != "query_embedding"}
+    if isinstance(normalized.get("query_text"), str):
+        normalized["query_text"] = " ".join(normalized["query_text"].split())
+    if isinstance(normalized.get("keywords"), list): # plainto_tsquery folds case; terms are OR-ed
+        normalized["keywords"] = sorted({" ".join(str(k).lower().split()) for k in normalized["keywords"] if str(k).strip()})
+    for key in _SET_ARGS:
+        if isinstance(normalized.get(key), list):
+            normalized[key] = sorted(set(map(str, normalized[key])))
+    return normalized
+
+
+def memo_key(subqueries: Dict[str, Dict[str, Any]], **settings: Any) -> str:
+    """
+    Content address of a retrieval request: the sub-query arguments (application refs, filters, keywords, semantic
+    query, limits; whitespace, keyword case and list order normalized) plus every setting that changes the ranking
+    (RRF weights, re-ranking, MMR lambda).
+    """
+    canonical = json.dumps({"subqueries": {stage: _normalized_args(args) for stage, args in subqueries.items()}, **settings},
+                           sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _copy_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows are annotated later (chunk texts, scores); memo entries and their users each get their own dicts."""
+    return [dict(row) for row in rows]
+
+
+class RetrievalMemo:
+    """
+    Bounded LRU of key -> (sources, ranked chunk rows). Entries are dropped by invalidate_sources() when documents or
+    chunks of one of their applications are written; entries without a source filter are dropped on any write.
+    """
+    def __init__(self, max_entries: int = RETRIEVAL_MEMO_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[Optional[frozenset], List[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "invalidated_entries": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """(copies of the memoized rows, age in seconds), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return _copy_rows(entry[1]), time.time() - entry[2]
+
+    def put(self, key: str, sources: Optional[List[str]], rows: List[Dict[str, Any]]):
+        entry = (frozenset(sources) if sources else None, _copy_rows(rows), time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_sources(self, sources: Optional[Iterable[Optional[str]]]) -> int:
+        """Drops the entries that may include chunks of `sources` (None: every entry). Returns how many were dropped."""
+        touched = None if sources is None else set(sources)
+        with self._lock:
+            stale = [key for key, (entry_sources, _, _) in self._entries.items()
+                     if touched is None or entry_sources is None or entry_sources & touched]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+            self._stats["invalidated_entries"] += len(stale)
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        return stats
@@ -0,0 +1,159 @@
+# retrieval/reranker.py
+# Cross-encoder re-ranking of the fused candidates: a small CPU model reads each (query, chunk) pair together and
+# scores its relevance, so weak chunks that only shared vector distance or keywords with the query are cut before
+# they reach MMR, the packer and the LLM prompt. Scores are cached by (query hash, chunk text hash).
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import (RERANK_ENABLED, RERANK_MODEL_NAME, RERANK_DEVICE, RERANK_BATCH_SIZE, RERANK_MAX_LENGTH, RERANK_KEEP,
+                    RERANK_CACHE_MAX_ENTRIES)
+from retrieval.context_packer import row_tokens
+
+DIGEST_BYTES = 16 # blake2b digest size of each half of a cache key
+
+
+def rerank_enabled_for(retrieval_config: Optional[Dict[str, Any]] = None, default: bool = RERANK_ENABLED) -> bool:
+    """retrieval_config['rerank'] (true / false) wins; otherwise RERANK_ENABLED."""
+    explicit = (retrieval_config or {}).get("rerank")
+    return explicit if isinstance(explicit, bool) else default
+
+
+def rerank_query_for(retrieval_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The text candidates are scored against: the semantic query, else the keywords; None when there is neither."""
+    config = retrieval_config or {}
+    query = (config.get("semantic_search_query_text") or "").strip()
+    if not query:
+        query = " ".join(str(term) for term in config.get("hybrid_search_terms") or [] if term).strip()
+    return query or None
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_BYTES).digest()
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk text) pairs with a sentence-transformers CrossEncoder in batches of `batch_size`, only for
+    pairs not in the LRU score cache. `model` may be any object with the CrossEncoder `predict(pairs, batch_size=...)`
+    signature; by default `model_name` is loaded (ImportError when sentence-transformers is missing, see get_reranker).
+    """
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, device: str = RERANK_DEVICE, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH, cache_max_entries: int = RERANK_CACHE_MAX_ENTRIES, model: Any = None):
+        if model is None:
+            from sentence_transformers import CrossEncoder # ImportError is handled by get_reranker
+            model = CrossEncoder(model_name, device=device, max_length=max_length)
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.cache_max_entries = max(0, cache_max_entries)
+        self._cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock() # One forward pass at a time; the model already uses every CPU core
+        self._stats = {"calls": 0, "pairs": 0, "cache_hits": 0, "pairs_scored": 0, "batches": 0, "score_seconds": 0.0,
+                       "lists": 0, "candidates_dropped": 0, "dropped_tokens": 0}
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Relevance score per (query, text) pair (higher is better); uncached pairs are scored in batched forward passes."""
+        return self._score_pairs(pairs)[0]
+
+    def _score_pairs(self, pairs: List[Tuple[str, str]]) -> Tuple[List[float], int]:
+        query_digests = {query: _digest(f"{self.model_name}\x00{query}") for query in {q for q, _ in pairs}}
+        keys = [query_digests[q] + _digest(text) for q, text in pairs]
+        scores: Dict[bytes, float] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[key] = self._cache[key]
+        missing = list(dict.fromkeys(k for k in keys if k not in scores))
+        first_pair = {}
+        for key, pair in zip(keys, pairs):
+            first_pair.setdefault(key, pair)
+        score_start = time.perf_counter()
+        if missing:
+            with self._model_lock:
+                predicted = np.asarray(self.model.predict([first_pair[k] for k in missing], batch_size=self.batch_size,
+                                                          show_progress_bar=False), dtype=np.float32).reshape(len(missing), -1)[:, -1]
+            scores.update(zip(missing, predicted.tolist()))
+        elapsed = time.perf_counter() - score_start
+        with self._lock:
+            for key in missing:
+                self._cache[key] = scores[key]
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+            self._stats["calls"] += 1
+            self._stats["pairs"] += len(pairs)
+            self._stats["cache_hits"] += len(pairs) - len(missing)
+            self._stats["pairs_scored"] += len(missing)
+            self._stats["batches"] += -(-len(missing) // self.batch_size)
+            self._stats["score_seconds"] += elapsed
+        return [scores[k] for k in keys], len(pairs) - len(missing)
+
+    def rerank_lists(self, requests: List[Tuple[str, List[Dict[str, Any]]]], keep: int = RERANK_KEEP) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Re-orders each (query, candidates) list by cross-encoder score and keeps the best `keep`; the pairs of every
+        list are scored in one score_pairs call. Rows need chunk_text; each kept row gets rerank_score. Returns
+        (rows, report) per list; the report counts the pairs scored and cached, the time taken, and the dropped
+        candidates and their tokens (what the re-ranker saves the prompt, set against its ms).
+        """
+        start = time.perf_counter()
+        pairs = [(query, c.get('chunk_text') or "") for query, candidates in requests for c in candidates]
+        scores, cache_hits = self._score_pairs(pairs) if pairs else ([], 0)
+        ms = round((time.perf_counter() - start) * 1000, 2)
+        out: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]] = []
+        offset = 0
+        for _, candidates in requests:
+            own = scores[offset:offset + len(candidates)]; offset += len(candidates)
+            order = sorted(range(len(candidates)), key=lambda i: -own[i]) # Stable: ties keep the fused order
+            kept = [candidates[i] for i in order[:keep]]
+            for i in order[:keep]:
+                candidates[i]['rerank_score'] = round(float(own[i]), 6)
+            dropped = [candidates[i] for i in order[keep:]]
+            kept_ids = {c['chunk_id'] for c in kept}
+            report = {"model": self.model_name, "candidates": len(candidates), "kept": len(kept), "dropped": len(dropped),
+                      "dropped_tokens": sum(row_tokens(c) for c in dropped),
+                      "displaced_from_top": sum(1 for c in candidates[:keep] if c['chunk_id'] not in kept_ids),
+                      "batch_lists": len(requests), "batch_pairs": len(pairs), "batch_cache_hits": cache_hits, "ms": ms}
+            out.append((kept, report))
+        with self._lock:
+            self._stats["lists"] += len(requests)
+            self._stats["candidates_dropped"] += sum(r["dropped"] for _, r in out)
+            self._stats["dropped_tokens"] += sum(r["dropped_tokens"] for _, r in out)
+        return out
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_entries"] = len(self._cache)
+        stats["score_seconds"] = round(stats["score_seconds"], 4)
+        stats.update({"model": self.model_name, "batch_size": self.batch_size,
+                      "score_ms_per_list": round(stats["score_seconds"] * 1000 / stats["lists"], 2) if stats["lists"] else 0.0,
+                      "dropped_tokens_per_list": round(stats["dropped_tokens"] / stats["lists"], 1) if stats["lists"] else 0.0})
+        return stats
+
+
+_default_reranker: Optional[CrossEncoderReranker] = None
+_default_reranker_failed = False
+_default_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Process-wide CrossEncoderReranker built from config on first use, or None (with one WARNING) if the model cannot be loaded."""
+    global _default_reranker, _default_reranker_failed
+    if _default_reranker is None and not _default_reranker_failed:
+        with _default_reranker_lock:
+            if _default_reranker is None and not _default_reranker_failed:
+                try:
+                    _default_reranker = CrossEncoderReranker()
+                except ImportError:
+                    print("WARNING: sentence-transformers not installed. Cross-encoder re-ranking is disabled.")
+                    _default_reranker_failed = True
+                except Exception as e:
+                    print(f"WARNING: Could not load re-ranking model '{RERANK_MODEL_NAME}': {type(e).__name__} - {e}. Cross-encoder re-ranking is disabled.")
+                    _default_reranker_failed = True
+    return _default_reranker
@@ -1,122 +1,750 @@
 # retrieval/retriever.py
 # (Same as retriever.py from "Reproduce the full updated code" with PolicyManager integration)
 # Assumed complete.
+import asyncio
 import json
-from typing import List, Dict, Set, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 import uuid
+from datetime import datetime, timezone
 from db_manager import DatabaseManager # Relative import for modular structure
 from core_types import Intent, RetrievedItem, RetrievalSourceType
-from config import MAX_CONTEXT_DOCUMENTS_FOR_FULL_INJECTION, MAX_CHUNKS_FOR_CONTEXT, MAX_TOKENS_PER_GEMINI_CALL_APPROX, EMBEDDING_DIMENSION
+from retrieval.log_buffer import RetrievalLogBuffer
+from retrieval.vector_cache import ApplicationVectorCache, rows_to_matrix
+from retrieval.hybrid_ranker import reciprocal_rank_fusion, DEFAULT_RRF_WEIGHTS
+from retrieval.context_packer import ContextPacker, ContextPlan, token_budget_for, section_keys, neighbour_window_for, rows_within_window
+from retrieval.chunk_store import RunChunkStore
+from retrieval.diversity import diversify, mmr_lambda_for
+from retrieval.evidence_index import evidence_categories_for, rank_evidence_rows
+from retrieval.hierarchy import hierarchy_for
+from retrieval.reranker import CrossEncoderReranker, get_reranker, rerank_enabled_for, rerank_query_for
+from retrieval.memo import RetrievalMemo, memo_key
+from embeddings import EmbeddingService, get_embedding_service
+from config import (MAX_CHUNKS_FOR_CONTEXT, HYBRID_RRF_K, HYBRID_SUBQUERY_THREADS, CONTEXT_PACK_CANDIDATES, CONTEXT_PACK_MAX_SECTION_CHUNKS,
+                    MMR_ENABLED, EVIDENCE_INDEX_ENABLED, RERANK_KEEP)
 
-def get_embedding(text: str) -> List[float]: # Placeholder
-    # In a real system, this would be a proper embedding model call
-    # print(f"INFO: (Retriever) Generating dummy embedding for: '{text[:30]}...'")
-    return [0.1] * EMBEDDING_DIMENSION
+if TYPE_CHECKING:
+    from async_db_manager import AsyncDatabaseManager
 
 class AgenticRetriever:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, async_db_manager: Optional["AsyncDatabaseManager"] = None,
+                 retrieval_log_buffer: Optional[RetrievalLogBuffer] = None, embedding_service: Optional[EmbeddingService] = None,
+                 rrf_weights: Optional[Dict[str, float]] = None, context_packer: Optional[ContextPacker] = None,
+                 reranker: Optional[CrossEncoderReranker] = None):
         self.db_manager = db_manager
+        self.async_db_manager = async_db_manager # Optional; enables native event-loop retrieval in retrieve_and_prepare_context_async
+        self.retrieval_log_buffer = retrieval_log_buffer # Optional write-behind logger; None logs synchronously via db_manager
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.rrf_weights = dict(DEFAULT_RRF_WEIGHTS if rrf_weights is None else rrf_weights) # Per sub-query RRF weight; 0 skips it
+        self.context_packer = context_packer or ContextPacker()
+        self.mmr_enabled = MMR_ENABLED # Diversity re-ranking of the fused candidates (retrieval/diversity.py)
+        self.reranker = reranker # Cross-encoder for intents that re-rank (retrieval/reranker.py); None loads the configured model on first use
+        self.rerank_keep = RERANK_KEEP # Candidates kept per re-ranked intent
+        self._subquery_executor: Optional[ThreadPoolExecutor] = None
+        self._subquery_executor_lock = threading.Lock()
+        self.run_vector_cache: Optional[ApplicationVectorCache] = None # Set by MRMOrchestrator for the duration of a report run
+        self.chunk_store: Optional[RunChunkStore] = None # Likewise; while set, searches skip chunk text and only unknown texts are fetched
+        self.retrieval_memo: Optional[RetrievalMemo] = None # Likewise; while set, a repeated retrieval request reuses its ranked chunks
+        self._doc_sources: Dict[uuid.UUID, Optional[str]] = {} # doc_id -> source of ingested documents, for memo invalidation
+        if hasattr(db_manager, "add_ingest_hook"):
+            db_manager.add_ingest_hook(self._on_document_ingested)
+        if async_db_manager is not None:
+            async_db_manager.add_ingest_hook(self._on_document_ingested)
 
-    def _get_semantic_results(self, query_text: str, limit: int = 10) -> List[Dict[str, Any]]:
-        if not query_text: return []
-        query_embedding = get_embedding(query_text)
-        # Note: Ensure your embeddings are normalized if using vector_cosine_ops for true cosine similarity.
-        # For L2 distance (often used), vector_l2_ops is correct.
-        # For dot product (inner product), vector_ip_ops (often for non-normalized or specific embeddings like OpenAI's).
-        semantic_query = """
-        SELECT dc.chunk_id, dc.chunk_text, dc.page_number, dc.section, 
-               d.doc_id, d.title as doc_title, d.document_type,
-               ce.embedding <-> %s::vector AS distance 
-        FROM document_chunks dc
-        JOIN documents d ON dc.doc_id = d.doc_id
-        JOIN chunk_embeddings ce ON dc.chunk_id = ce.chunk_id
-        ORDER BY distance ASC
-        LIMIT %s; 
+    def set_async_db_manager(self, async_db_manager: Optional["AsyncDatabaseManager"]):
+        """Run the async retrieval paths on `async_db_manager` (its writes invalidate like db_manager's); None uses worker threads."""
+        if async_db_manager is not None and async_db_manager is not self.async_db_manager:
+            async_db_manager.add_ingest_hook(self._on_document_ingested)
+        self.async_db_manager = async_db_manager
+
+    def set_run_vector_cache(self, cache: Optional[ApplicationVectorCache]):
+        """Serve semantic retrieval from `cache` (the current run's application chunks); None returns to the database."""
+        self.run_vector_cache = cache
+
+    def set_chunk_store(self, store: Optional[RunChunkStore]):
+        """Share chunk texts through `store` (the current run's RunChunkStore); None returns to per-intent copies."""
+        self.chunk_store = store
+
+    def set_retrieval_memo(self, memo: Optional[RetrievalMemo]):
+        """Reuse ranked chunks of repeated requests through `memo` (a RetrievalMemo); None retrieves every request afresh."""
+        self.retrieval_memo = memo
+
+    def _on_document_ingested(self, doc_id: uuid.UUID, document_type: Optional[str]):
+        """Ingest hook: new chunks would be missing from the run vector cache and from memoized results of their application."""
+        self.set_run_vector_cache(None)
+        memo = self.retrieval_memo
+        if memo is None or not len(memo):
+            return
+        if doc_id not in self._doc_sources:
+            try:
+                self._doc_sources.update(self.db_manager.get_document_sources([doc_id]))
+            except Exception as e:
+                print(f"WARNING: Could not look up the source of document {doc_id} ({type(e).__name__} - {e}). Clearing the retrieval memo.")
+        memo.invalidate_sources([self._doc_sources[doc_id]] if doc_id in self._doc_sources else None)
+
+    def _memo_key(self, intent: Intent, subqueries: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """The intent's request key (None without a memo): its sub-queries plus the settings that change the ranking."""
+        if self.retrieval_memo is None:
+            return None
+        rerank_query = self._rerank_queries([intent])[0]
+        mmr = self._mmr_lambda(intent)
+        return memo_key(subqueries, rrf_weights={stage: self.rrf_weights.get(stage, 1.0) for stage in subqueries},
+                        candidates=max(MAX_CHUNKS_FOR_CONTEXT, CONTEXT_PACK_CANDIDATES), mmr_lambda=mmr[0] if mmr else None,
+                        rerank=[" ".join(rerank_query.split()), self.rerank_keep, self.reranker.model_name] if rerank_query else None)
+
+    def _memo_get(self, intent: Intent, key: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """The memoized ranked chunks for `key` (RetrievalMemoHit provenance), or None."""
+        if key is None or self.retrieval_memo is None:
+            return None
+        hit = self.retrieval_memo.get(key)
+        if hit is None:
+            return None
+        rows, age = hit
+        intent.provenance.add_action("RetrievalMemoHit", {"key": key, "chunks": len(rows), "age_s": round(age, 3)})
+        return rows
+
+    def _memo_put(self, intent: Intent, key: Optional[str], fused_chunks: List[Dict[str, Any]]):
+        if key is not None and self.retrieval_memo is not None:
+            self.retrieval_memo.put(key, self._filter_args(intent).get("sources"), fused_chunks)
+
+    def _memo_merge(self, intents: List[Intent], memo_keys: List[Optional[str]], memo_hits: List[Optional[List[Dict[str, Any]]]],
+                    fused_batch: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Every intent's ranked chunks in order: memo hits as they are, the batch's newly ranked lists (memoized now)."""
+        ranked = iter(fused_batch)
+        fused_per_intent = []
+        for intent, key, hit in zip(intents, memo_keys, memo_hits):
+            if hit is None:
+                hit = next(ranked)
+                self._memo_put(intent, key, hit)
+            fused_per_intent.append(hit)
+        return fused_per_intent
+
+    def _cache_for(self, filters: Dict[str, Any]) -> Optional[ApplicationVectorCache]:
+        cache = self.run_vector_cache
+        return cache if cache is not None and cache.covers(filters.get("sources")) else None
+
+    def _get_semantic_results(self, query_text: str, limit: int = 10, include_text: bool = True, doc_limit: Optional[int] = None,
+                              section_limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """
+        `filters` (document_types, sources) are applied inside the vector search, so `limit` rows all qualify. With
+        doc_limit / section_limit the search is hierarchical (documents, then sections, then their chunks); the run
+        vector cache, when it covers the sources, always answers with the exact flat search.
         """
+        if not query_text: return []
+        query_embedding = self.embedding_service.embed_query(query_text)
+        if (cache := self._cache_for(filters)) is not None:
+            return cache.search(query_embedding, limit, **filters) # Cached rows carry text already
         try:
-            # pgvector expects list for embedding, not tuple
-            results = self.db_manager.execute_query(semantic_query, (query_embedding, limit), fetch_all=True)
-            return results if results else []
+            if doc_limit and section_limit:
+                return self.db_manager.hierarchical_search_chunks(query_embedding, limit, doc_limit, section_limit,
+                                                                  include_text=include_text, **filters)
+            return self.db_manager.semantic_search_chunks(query_embedding, limit, include_text=include_text, **filters)
         except Exception as e:
             print(f"ERROR: Semantic search failed: {type(e).__name__} - {e}")
             return []
 
-    def retrieve_and_prepare_context(self, intent: Intent):
-        intent.provenance.add_action("RetrievalContextPrepStart", {"cfg": intent.retrieval_config})
-        sql_clauses: List[str] = []
-        sql_params: List[Any] = []
+    async def _get_semantic_results_async(self, query_text: str, limit: int = 10, include_text: bool = True, doc_limit: Optional[int] = None,
+                                          section_limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        cache = self._cache_for(filters)
+        if not query_text or (self.async_db_manager is None and cache is None): return []
+        query_embedding = await asyncio.to_thread(self.embedding_service.embed_query, query_text) # Model inference off the event loop
+        if cache is not None:
+            return cache.search(query_embedding, limit, **filters)
+        try:
+            if doc_limit and section_limit:
+                return await self.async_db_manager.hierarchical_search_chunks(query_embedding, limit, doc_limit, section_limit,
+                                                                              include_text=include_text, **filters)
+            return await self.async_db_manager.semantic_search_chunks(query_embedding, limit, include_text=include_text, **filters)
+        except Exception as e:
+            print(f"ERROR: Async semantic search failed: {type(e).__name__} - {e}")
+            return []
+
+    def _get_evidence_results(self, categories: List[str], sources: List[str], limit: Optional[int], include_text: bool = True) -> List[Dict[str, Any]]:
+        """Chunks the application's evidence index lists under the intent's categories (a lookup, no text scan)."""
+        try:
+            return rank_evidence_rows(self.db_manager.get_evidence_chunks(sources, categories, include_text=include_text), categories, limit)
+        except Exception as e:
+            print(f"ERROR: Evidence index lookup failed: {type(e).__name__} - {e}")
+            return []
+
+    async def _get_evidence_results_async(self, categories: List[str], sources: List[str], limit: Optional[int], include_text: bool = True) -> List[Dict[str, Any]]:
+        try:
+            return rank_evidence_rows(await self.async_db_manager.get_evidence_chunks(sources, categories, include_text=include_text), categories, limit)
+        except Exception as e:
+            print(f"ERROR: Async evidence index lookup failed: {type(e).__name__} - {e}")
+            return []
 
+    def _filter_args(self, intent: Intent) -> Dict[str, Any]:
+        """Document type / source filters shared by the structured and semantic searches."""
+        filters: Dict[str, Any] = {}
         if doc_type_filters := intent.retrieval_config.get("document_type_filters"):
             if isinstance(doc_type_filters, list) and doc_type_filters:
-                sql_clauses.append("d.document_type = ANY(%s)")
-                sql_params.append(doc_type_filters)
-        
+                filters["document_types"] = doc_type_filters
         if intent.application_refs:
             # Assuming application_refs are stored in d.source. If it's a tag or filename, adjust query.
-            sql_clauses.append("d.source = ANY(%s)") 
-            sql_params.append(intent.application_refs)
-        
-        if keyword_terms := intent.retrieval_config.get("hybrid_search_terms"):
-            if isinstance(keyword_terms, list) and keyword_terms:
-                conditions = []
-                for term in keyword_terms:
-                    if term and isinstance(term, str): # Ensure term is valid
-                        conditions.append("dc.chunk_text ILIKE %s")
-                        sql_params.append(f"%{term}%")
-                if conditions:
-                    sql_clauses.append(f"({' OR '.join(conditions)})")
-
-        base_q = "SELECT dc.chunk_id, dc.chunk_text, dc.page_number, dc.section, d.doc_id, d.title as doc_title, d.document_type FROM document_chunks dc JOIN documents d ON dc.doc_id = d.doc_id"
-        structured_q = base_q + (f" WHERE {' AND '.join(sql_clauses)}" if sql_clauses else "") + f" LIMIT {MAX_CHUNKS_FOR_CONTEXT * 3};"
-        
-        structured_results = self.db_manager.execute_query(structured_q, tuple(sql_params), fetch_all=True) or []
-        intent.provenance.add_action("StructuredRetrieve", {"count": len(structured_results)})
-
-        semantic_q_text = intent.retrieval_config.get("semantic_search_query_text")
-        semantic_results: List[Dict[str,Any]] = self._get_semantic_results(semantic_q_text, MAX_CHUNKS_FOR_CONTEXT*2) if semantic_q_text else []
-        if semantic_q_text: intent.provenance.add_action("SemanticRetrieve",{"query": semantic_q_text,"count":len(semantic_results)})
-        
-        all_r_dict: Dict[uuid.UUID, Dict] = {r['chunk_id']: r for r in semantic_results} # Semantic first to prioritize its distance score
-        for r_struct in structured_results: all_r_dict.setdefault(r_struct['chunk_id'], r_struct) # Add structured if not already present
-        
-        ranked_combined = sorted(all_r_dict.values(), key=lambda x: (x.get('distance', float('inf')), x.get('page_number', 0), str(x.get('chunk_id','')))) # Add chunk_id for stable sort
-        
-        ranked_chunks_for_ctx = ranked_combined[:MAX_CHUNKS_FOR_CONTEXT]
+            filters["sources"] = intent.application_refs
+        return filters
+
+    def _hybrid_subquery_args(self, intent: Intent) -> Dict[str, Dict[str, Any]]:
+        """
+        Arguments per sub-query, in fusion order (vector first so fused rows keep its distance):
+          vector  - semantic search for semantic_search_query_text (filtered top-k); hierarchical (documents, then
+                    sections, then chunks within them) when hierarchy_for enables it for the task type
+          keyword - full-text match on hybrid_search_terms within the filters, ranked by keyword_rank
+          evidence - evidence index lookup of the node's key evidence categories (retrieval_config 'evidence_categories')
+                     for the application; document type filters do not apply, the categories name the documents
+          filter  - chunks matching the source / document type filters alone
+        Sub-queries with an RRF weight of 0 are not run. With a chunk store set, rows come back without chunk text.
+        """
+        filters = self._filter_args(intent)
+        if self.chunk_store is not None:
+            filters["include_text"] = False
+        subqueries: Dict[str, Dict[str, Any]] = {}
+        if semantic_q_text := intent.retrieval_config.get("semantic_search_query_text"):
+            subqueries["vector"] = {"query_text": semantic_q_text, "limit": MAX_CHUNKS_FOR_CONTEXT, **filters}
+            if (hierarchy := hierarchy_for(intent.task_type, intent.retrieval_config)) is not None:
+                subqueries["vector"]["doc_limit"], subqueries["vector"]["section_limit"] = hierarchy[0]
+        keyword_terms = intent.retrieval_config.get("hybrid_search_terms")
+        if isinstance(keyword_terms, list) and keyword_terms:
+            subqueries["keyword"] = {"keywords": keyword_terms, "limit": MAX_CHUNKS_FOR_CONTEXT * 3, **filters}
+        if EVIDENCE_INDEX_ENABLED and filters.get("sources") and (categories := evidence_categories_for(intent.retrieval_config)):
+            subqueries["evidence"] = {"categories": categories, "limit": MAX_CHUNKS_FOR_CONTEXT * 3,
+                                      **{key: value for key, value in filters.items() if key != "document_types"}}
+        if filters or not subqueries:
+            subqueries["filter"] = {"limit": MAX_CHUNKS_FOR_CONTEXT * 3, **filters}
+        return {stage: args for stage, args in subqueries.items() if self.rrf_weights.get(stage, 1.0) > 0}
+
+    def _get_subquery_executor(self) -> ThreadPoolExecutor:
+        with self._subquery_executor_lock:
+            if self._subquery_executor is None:
+                self._subquery_executor = ThreadPoolExecutor(max_workers=max(1, HYBRID_SUBQUERY_THREADS), thread_name_prefix="HybridRetrieval")
+            return self._subquery_executor
+
+    def _run_subqueries(self, subqueries: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, float]]:
+        """Runs the sub-queries concurrently on the executor; returns (results per stage, milliseconds per stage)."""
+        timings: Dict[str, float] = {}
+        def run(stage: str, args: Dict[str, Any]) -> List[Dict[str, Any]]:
+            start = time.perf_counter()
+            try:
+                if stage == "vector":
+                    return self._get_semantic_results(**args) or []
+                if stage == "evidence":
+                    return self._get_evidence_results(**args)
+                return self.db_manager.search_chunks(**args) or []
+            finally:
+                timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+        if len(subqueries) <= 1:
+            return {stage: run(stage, args) for stage, args in subqueries.items()}, timings
+        futures = {stage: self._get_subquery_executor().submit(run, stage, args) for stage, args in subqueries.items()}
+        return {stage: future.result() for stage, future in futures.items()}, timings
+
+    async def _run_subqueries_async(self, subqueries: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, float]]:
+        assert self.async_db_manager is not None
+        timings: Dict[str, float] = {}
+        async def run(stage: str, args: Dict[str, Any]) -> List[Dict[str, Any]]:
+            start = time.perf_counter()
+            try:
+                if stage == "vector":
+                    return await self._get_semantic_results_async(**args) or []
+                if stage == "evidence":
+                    return await self._get_evidence_results_async(**args)
+                return await self.async_db_manager.search_chunks(**args) or []
+            finally:
+                timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+        results = await asyncio.gather(*(run(stage, args) for stage, args in subqueries.items()))
+        return dict(zip(subqueries.keys(), results)), timings
+
+    def _record_subqueries(self, intent: Intent, subqueries: Dict[str, Dict[str, Any]], results: Dict[str, List[Dict[str, Any]]],
+                           timings: Dict[str, float], wall_start: float):
+        stages = {stage: {"count": len(results.get(stage, [])), "ms": timings.get(stage)} for stage in subqueries}
+        if "vector" in subqueries:
+            stages["vector"]["query"] = subqueries["vector"]["query_text"]
+            if "doc_limit" in subqueries["vector"]:
+                stages["vector"]["hierarchy"] = {"documents": subqueries["vector"]["doc_limit"], "sections": subqueries["vector"]["section_limit"],
+                                                 "cached": self._cache_for(subqueries["vector"]) is not None}
+        intent.provenance.add_action("HybridSubQueries", {"stages": stages, "wall_ms": round((time.perf_counter() - wall_start) * 1000, 2)})
+
+    def _fuse(self, intent: Intent, ranked_lists: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Fuses the sub-query lists with weighted RRF; returns the top fused chunks (intent.result plus the packer's candidates)."""
+        fusion_start = time.perf_counter()
+        ranked_combined = reciprocal_rank_fusion(ranked_lists, self.rrf_weights, HYBRID_RRF_K)
+        intent.provenance.add_action("HybridFusion", {"ms": round((time.perf_counter() - fusion_start) * 1000, 2), "k": HYBRID_RRF_K,
+                                                      "weights": {stage: self.rrf_weights.get(stage, 1.0) for stage in ranked_lists},
+                                                      "fused_count": len(ranked_combined)})
+
+        return ranked_combined[:max(MAX_CHUNKS_FOR_CONTEXT, CONTEXT_PACK_CANDIDATES)]
+
+    def _rerank_queries(self, intents: List[Intent]) -> List[Optional[str]]:
+        """Each intent's cross-encoder query, or None when it does not re-rank (disabled, no query text, or no model)."""
+        queries = [rerank_query_for(intent.retrieval_config) if rerank_enabled_for(intent.retrieval_config) else None for intent in intents]
+        if self.reranker is None and any(q is not None for q in queries):
+            self.reranker = get_reranker()
+        return queries if self.reranker is not None else [None] * len(intents)
+
+    @staticmethod
+    def _rerank_rows(fused_per_intent: List[List[Dict[str, Any]]], queries: List[Optional[str]]) -> List[Dict[str, Any]]:
+        return [row for fused, query in zip(fused_per_intent, queries) if query is not None for row in fused]
+
+    def _attach_rerank_texts(self, fused_per_intent: List[List[Dict[str, Any]]], queries: List[Optional[str]]) -> Optional[Dict[str, int]]:
+        """The cross-encoder reads chunk texts: with a chunk store, the candidates' unknown texts are fetched in one call."""
+        if self.chunk_store is None:
+            return None
+        return self.chunk_store.attach_texts(self._rerank_rows(fused_per_intent, queries), self.db_manager.get_chunk_texts)
+
+    async def _attach_rerank_texts_async(self, fused_per_intent: List[List[Dict[str, Any]]], queries: List[Optional[str]]) -> Optional[Dict[str, int]]:
+        if self.chunk_store is None:
+            return None
+        return await self.chunk_store.attach_texts_async(self._rerank_rows(fused_per_intent, queries), self.async_db_manager.get_chunk_texts)
+
+    def _rerank(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]], queries: List[Optional[str]],
+                attach_stats: Optional[Dict[str, int]]) -> List[List[Dict[str, Any]]]:
+        """
+        Cross-encoder re-ranking of the fused candidates of the intents with a query, keeping the best rerank_keep of
+        each; the pairs of all of them are scored in one batched call (CrossEncoderRerank provenance).
+        """
+        slots = [pos for pos, query in enumerate(queries) if query is not None]
+        try:
+            reranked = self.reranker.rerank_lists([(queries[pos], fused_per_intent[pos]) for pos in slots], self.rerank_keep)
+        except Exception as e: # Re-ranking is an optimisation; fall back to the fused order
+            print(f"WARNING: Cross-encoder re-ranking failed ({type(e).__name__} - {e}). Using the fused order.")
+            return fused_per_intent
+        fused_per_intent = list(fused_per_intent)
+        for pos, (rows, report) in zip(slots, reranked):
+            if attach_stats is not None:
+                report["texts_fetched"] = attach_stats["fetched"]
+            intents[pos].provenance.add_action("CrossEncoderRerank", report)
+            fused_per_intent[pos] = rows
+        return fused_per_intent
+
+    def _mmr_lambda(self, intent: Intent) -> Optional[Tuple[float, str]]:
+        """The intent's MMR lambda and its source, or None when re-ranking is off for it (disabled, or lambda 1.0)."""
+        if not self.mmr_enabled:
+            return None
+        lam, source = mmr_lambda_for(intent.task_type, intent.retrieval_config)
+        return (lam, source) if lam < 1.0 else None
+
+    def _vectors_needed(self, candidate_lists: List[List[Dict[str, Any]]]) -> Tuple[Dict[uuid.UUID, Any], List[uuid.UUID]]:
+        """Candidate embeddings the run vector cache holds, and the chunk ids still to fetch (one get_chunk_embeddings call)."""
+        chunk_ids = list(dict.fromkeys(c['chunk_id'] for candidates in candidate_lists for c in candidates))
+        found = self.run_vector_cache.vectors_for(chunk_ids) if self.run_vector_cache is not None else {}
+        return found, [cid for cid in chunk_ids if cid not in found]
+
+    def _vectors_from_rows(self, found: Dict[uuid.UUID, Any], rows: List[Dict[str, Any]]) -> Dict[uuid.UUID, Any]:
+        kept, matrix = rows_to_matrix(list(rows), self.embedding_service.dimension)
+        found.update({row['chunk_id']: matrix[i] for i, row in enumerate(kept)})
+        return found
+
+    def _candidate_vectors(self, candidate_lists: List[List[Dict[str, Any]]]) -> Dict[uuid.UUID, Any]:
+        found, missing = self._vectors_needed(candidate_lists)
+        try:
+            return self._vectors_from_rows(found, self.db_manager.get_chunk_embeddings(missing) if missing else [])
+        except Exception as e: # Re-ranking is an optimisation; fall back to the fused order
+            print(f"WARNING: Could not load candidate embeddings for MMR ({type(e).__name__} - {e}).")
+            return found
+
+    async def _candidate_vectors_async(self, candidate_lists: List[List[Dict[str, Any]]]) -> Dict[uuid.UUID, Any]:
+        found, missing = self._vectors_needed(candidate_lists)
+        try:
+            return self._vectors_from_rows(found, await self.async_db_manager.get_chunk_embeddings(missing) if missing else [])
+        except Exception as e:
+            print(f"WARNING: Could not load candidate embeddings for MMR ({type(e).__name__} - {e}).")
+            return found
+
+    def _diversify(self, intent: Intent, fused_chunks: List[Dict[str, Any]], vectors: Dict[uuid.UUID, Any]) -> List[Dict[str, Any]]:
+        """MMR re-ranking of the fused candidates with the intent's lambda; near-duplicates are dropped (MMRRerank provenance)."""
+        mmr = self._mmr_lambda(intent)
+        if mmr is None:
+            return fused_chunks
+        reranked, report = diversify(fused_chunks, vectors, mmr[0], MAX_CHUNKS_FOR_CONTEXT)
+        report["lambda_source"] = mmr[1]
+        intent.provenance.add_action("MMRRerank", report)
+        return reranked
+
+    def _set_results(self, intent: Intent, fused_chunks: List[Dict[str, Any]]):
+        """intent.result: the top MAX_CHUNKS_FOR_CONTEXT fused chunks as RetrievedItems (their text must be attached)."""
+        ranked_chunks_for_ctx = fused_chunks[:MAX_CHUNKS_FOR_CONTEXT]
         intent.provenance.add_action("CombinedRankedChunks",{"count":len(ranked_chunks_for_ctx)})
 
-        intent_items:List[RetrievedItem] = []; doc_ids_in_ctx:Set[uuid.UUID] = set()
+        intent_items:List[RetrievedItem] = []
         for cd_item in ranked_chunks_for_ctx:
-            doc_ids_in_ctx.add(cd_item['doc_id'])
-            intent_items.append(RetrievedItem(RetrievalSourceType.DOCUMENT_CHUNK,cd_item['chunk_text'],
-                {"chunk_id":str(cd_item['chunk_id']),"doc_id":str(cd_item['doc_id']),"doc_title":cd_item['doc_title'], 
-                 "document_type":cd_item['document_type'],"page_number":cd_item['page_number'], 
-                 "section":cd_item['section'],"distance":cd_item.get('distance')}))
+            intent_items.append(RetrievedItem(RetrievalSourceType.DOCUMENT_CHUNK,cd_item.get('chunk_text'),
+                {"chunk_id":str(cd_item['chunk_id']),"doc_id":str(cd_item['doc_id']),"doc_title":cd_item['doc_title'],
+                 "document_type":cd_item['document_type'],"page_number":cd_item['page_number'],
+                 "section":cd_item['section'],"distance":cd_item.get('distance'),
+                 "rrf_score":round(cd_item['rrf_score'], 6),"stage_ranks":cd_item['stage_ranks'],
+                 **({"rerank_score":cd_item['rerank_score']} if cd_item.get('rerank_score') is not None else {})}))
         intent.result = intent_items
 
-        full_docs_inj:List[Dict[str,str]] = []; chunk_ctx_inj:List[Dict[str,Any]] = []
-        tot_len=0 # Initialize tot_len
-        if 0 < len(doc_ids_in_ctx) <= MAX_CONTEXT_DOCUMENTS_FOR_FULL_INJECTION:
-            intent.provenance.add_action("TryFullDocInject",{"doc_count":len(doc_ids_in_ctx)}); tmp_fd:List[Dict[str,str]] = []
-            sorted_doc_ids = sorted(list(doc_ids_in_ctx), key=lambda did_val:next((c.get('distance',float('inf')) for c in ranked_chunks_for_ctx if c['doc_id']==did_val),float('inf')))
-            for doc_id_to_load in sorted_doc_ids[:MAX_CONTEXT_DOCUMENTS_FOR_FULL_INJECTION]:
-                if full_txt_val := self.db_manager.get_full_document_text_by_id(doc_id_to_load): 
-                    doc_title_val = next((c['doc_title'] for c in ranked_chunks_for_ctx if c['doc_id'] == doc_id_to_load),"N/A Document Title")
-                    tmp_fd.append({"doc_id":str(doc_id_to_load),"doc_title": doc_title_val,"full_text":full_txt_val}); tot_len+=len(full_txt_val)
-            
-            # A very rough approximation of tokens for Gemini. Real token counting is more complex.
-            # Assume 1 token ~ 4 chars.
-            approx_tokens = tot_len / 4 
-            if approx_tokens < (MAX_TOKENS_PER_GEMINI_CALL_APPROX * 0.75): # Leave 25% for prompt, output
-                full_docs_inj=tmp_fd; intent.provenance.add_action("FullDocInjectOK",{"docs":[d['doc_id'] for d in full_docs_inj], "approx_tokens": approx_tokens})
-            else: intent.provenance.add_action("FullDocsTooLarge",{"approx_tokens": approx_tokens, "limit": MAX_TOKENS_PER_GEMINI_CALL_APPROX * 0.75})
-        
-        if not full_docs_inj:
-            chunk_ctx_inj=[{"chunk_id":str(item.metadata['chunk_id']),"chunk_text":str(item.content),"metadata":item.metadata} for item in intent_items[:MAX_CHUNKS_FOR_CONTEXT]]
-            intent.provenance.add_action("ChunkCtxSelected",{"count":len(chunk_ctx_inj)})
-        
-        intent.full_documents_context=full_docs_inj; intent.chunk_context=chunk_ctx_inj
-        
-        log_query_text = json.dumps({"keywords": intent.retrieval_config.get("hybrid_search_terms", []), "semantic_query": semantic_q_text})
+    def _plan_context(self, intent: Intent, fused_chunks: List[Dict[str, Any]], section_rows: List[Dict[str, Any]],
+                      window_rows: Optional[List[Dict[str, Any]]] = None) -> Tuple[ContextPlan, Dict[str, Any]]:
+        """Chooses what fills the intent's token budget (sizes only, so it runs before any text is fetched)."""
+        budget, budget_source = token_budget_for(intent.task_type, intent.retrieval_config)
+        window = neighbour_window_for(intent.retrieval_config)
+        pack_start = time.perf_counter()
+        plan = self.context_packer.select(fused_chunks, budget, section_rows, window_rows, window)
+        return plan, {"budget_source": budget_source, "sections_fetched": len({(r['doc_id'], r['section']) for r in section_rows}),
+                      "neighbour_window": window, "window_rows": len(window_rows or []),
+                      "ms": round((time.perf_counter() - pack_start) * 1000, 2)}
+
+    @staticmethod
+    def _hit_ids(fused_chunks: List[Dict[str, Any]]) -> List[uuid.UUID]:
+        return [c['chunk_id'] for c in fused_chunks]
+
+    def _rows_needing_text(self, fused_chunks: List[Dict[str, Any]], plan: ContextPlan) -> List[Dict[str, Any]]:
+        return fused_chunks[:MAX_CHUNKS_FOR_CONTEXT] + plan.packed_rows()
+
+    def _record_chunk_store(self, intent: Intent, attach_stats: Dict[str, int]):
+        intent.provenance.add_action("ChunkStoreTexts", {**attach_stats, "store_chunks": len(self.chunk_store)})
+
+    def _finalize_context(self, intent: Intent, plan: ContextPlan, plan_info: Dict[str, Any]) -> Tuple[str, Dict, List[uuid.UUID], str]:
+        """Renders the packed plan into intent.chunk_context and returns the arguments for log_retrieval."""
+        intent_items: List[RetrievedItem] = intent.result or []
+        chunk_ctx_inj, report = self.context_packer.render(plan, self.chunk_store.joined if self.chunk_store is not None else None)
+        report.update(plan_info)
+        intent.provenance.add_action("ContextPacked", report)
+
+        intent.full_documents_context=[]; intent.chunk_context=chunk_ctx_inj
+
+        log_query_text = json.dumps({"keywords": intent.retrieval_config.get("hybrid_search_terms", []), "semantic_query": intent.retrieval_config.get("semantic_search_query_text")})
         log_matched_ids = [uuid.UUID(item.metadata['chunk_id']) for item in intent_items] # Convert back to UUID for DB log
-        self.db_manager.log_retrieval(log_query_text, intent.retrieval_config, log_matched_ids, f"Intent:{intent.intent_id} for {intent.parent_node_id}")
+        return log_query_text, intent.retrieval_config, log_matched_ids, f"Intent:{intent.intent_id} for {intent.parent_node_id}"
+
+    # --- Batched multi-intent retrieval: one embedding call, one search round-trip, one section query, one text fetch, one log insert ---
+
+    def _batch_requests(self, intents: List[Intent], query_vectors: Dict[int, List[float]]
+                        ) -> Tuple[List[Dict[str, Dict[str, Any]]], List[Dict[str, List[Dict[str, Any]]]], List[Dict[str, Any]], List[Tuple[int, str]],
+                                   List[Tuple[int, Dict[str, Any]]]]:
+        """
+        Turns every intent's hybrid sub-queries into batch_search_chunks requests. Vector sub-queries the run vector
+        cache covers are answered here. Returns (sub-queries per intent, cached results per intent, requests, the
+        (intent position, stage) each request answers, and the evidence sub-queries, answered by one shared lookup).
+        """
+        all_subqueries = [self._hybrid_subquery_args(intent) for intent in intents]
+        cached: List[Dict[str, List[Dict[str, Any]]]] = [{} for _ in intents]
+        requests: List[Dict[str, Any]] = []; slots: List[Tuple[int, str]] = []; evidence_slots: List[Tuple[int, Dict[str, Any]]] = []
+        for pos, subqueries in enumerate(all_subqueries):
+            for stage, args in subqueries.items():
+                if stage == "evidence":
+                    evidence_slots.append((pos, args))
+                    continue
+                request = {key: value for key, value in args.items() if key not in ("query_text", "include_text")}
+                if stage == "vector":
+                    filters = {key: request[key] for key in ("document_types", "sources") if key in request}
+                    if (cache := self._cache_for(filters)) is not None: # Flat search in memory, hierarchical or not
+                        cached[pos][stage] = cache.search(query_vectors[pos], request["limit"], **filters)
+                        continue
+                    request["query_embedding"] = query_vectors[pos]
+                requests.append(request); slots.append((pos, stage))
+        return all_subqueries, cached, requests, slots, evidence_slots
+
+    @staticmethod
+    def _evidence_union(evidence_slots: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[str], List[str]]:
+        """(categories, sources) covering every intent's evidence sub-query, for one get_evidence_chunks call."""
+        categories = list(dict.fromkeys(c for _, args in evidence_slots for c in args["categories"]))
+        sources = list(dict.fromkeys(src for _, args in evidence_slots for src in args["sources"]))
+        return categories, sources
+
+    @staticmethod
+    def _scatter_evidence(cached: List[Dict[str, List[Dict[str, Any]]]], evidence_slots: List[Tuple[int, Dict[str, Any]]],
+                          evidence_rows: List[Dict[str, Any]]):
+        """Narrows the shared lookup to each intent's own categories and applications (the rows its single-path lookup returns)."""
+        for pos, args in evidence_slots:
+            cached[pos]["evidence"] = rank_evidence_rows(evidence_rows, args["categories"], args["limit"], sources=args["sources"])
+
+    def _scatter_batch(self, intents: List[Intent], all_subqueries: List[Dict[str, Dict[str, Any]]], cached: List[Dict[str, List[Dict[str, Any]]]],
+                       slots: List[Tuple[int, str]], batch_results: List[List[Dict[str, Any]]], batch_ms: float,
+                       wall_start: float) -> List[List[Dict[str, Any]]]:
+        """Hands each intent its own result lists (provenance per intent as in the single path) and returns its fused chunks."""
+        per_intent: List[Dict[str, List[Dict[str, Any]]]] = [dict(c) for c in cached]
+        for (pos, stage), rows in zip(slots, batch_results):
+            per_intent[pos][stage] = rows
+        fused_per_intent = []
+        for pos, intent in enumerate(intents):
+            subqueries = all_subqueries[pos]
+            results = {stage: per_intent[pos].get(stage, []) for stage in subqueries} # Fusion order as in _hybrid_subquery_args
+            timings = {stage: (0.0 if stage in cached[pos] else batch_ms) for stage in subqueries}
+            intent.provenance.add_action("BatchedRetrieval", {"batch_intents": len(intents), "batch_position": pos,
+                                                              "batch_requests": len(slots), "batch_ms": batch_ms})
+            self._record_subqueries(intent, subqueries, results, timings, wall_start)
+            fused_per_intent.append(self._fuse(intent, results))
+        return fused_per_intent
+
+    def _diversify_lists(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Candidate lists of the intents that MMR re-ranks (their embeddings are loaded together)."""
+        return [fused for intent, fused in zip(intents, fused_per_intent) if self._mmr_lambda(intent) is not None]
+
+    def _diversify_batch(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]],
+                         vectors: Dict[uuid.UUID, Any]) -> List[List[Dict[str, Any]]]:
+        return [self._diversify(intent, fused, vectors) for intent, fused in zip(intents, fused_per_intent)]
+
+    @staticmethod
+    def _rows_for_sections(section_rows: List[Dict[str, Any]], sections: List[Tuple[uuid.UUID, str]]) -> List[Dict[str, Any]]:
+        wanted = set(sections)
+        return [row for row in section_rows if (row['doc_id'], row['section']) in wanted]
+
+    def _plan_batch(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]], section_rows: List[Dict[str, Any]],
+                    sections_per_intent: List[List[Tuple[uuid.UUID, str]]], window_rows: List[Dict[str, Any]]) -> List[Tuple[ContextPlan, Dict[str, Any]]]:
+        """Plans each intent from the shared section / neighbour rows, narrowed to its own sections and window."""
+        plans = []
+        for intent, fused, sections in zip(intents, fused_per_intent, sections_per_intent):
+            window = neighbour_window_for(intent.retrieval_config)
+            own_window_rows = rows_within_window(window_rows, self._hit_ids(fused), window) if window > 0 else []
+            plans.append(self._plan_context(intent, fused, self._rows_for_sections(section_rows, sections), own_window_rows))
+        return plans
+
+    def _batch_window_args(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]]) -> Tuple[List[uuid.UUID], int]:
+        """Hit ids of every intent that expands neighbours, and the largest window among them (one get_neighbour_chunks call)."""
+        windows = [neighbour_window_for(intent.retrieval_config) for intent in intents]
+        hit_ids = [cid for fused, window in zip(fused_per_intent, windows) if window > 0 for cid in self._hit_ids(fused)]
+        return list(dict.fromkeys(hit_ids)), max(windows, default=0)
+
+    def _batch_rows_needing_text(self, fused_per_intent: List[List[Dict[str, Any]]], plans: List[Tuple[ContextPlan, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [row for fused, (plan, _) in zip(fused_per_intent, plans) for row in self._rows_needing_text(fused, plan)]
+
+    def _finish_batch(self, intents: List[Intent], fused_per_intent: List[List[Dict[str, Any]]], plans: List[Tuple[ContextPlan, Dict[str, Any]]],
+                      attach_stats: Optional[Dict[str, int]], errors: Dict[uuid.UUID, Exception]) -> List[tuple]:
+        """Sets each intent's results and context; returns the retrieval_logs records of the intents that succeeded."""
+        records = []
+        for intent, fused, (plan, plan_info) in zip(intents, fused_per_intent, plans):
+            try:
+                if attach_stats is not None:
+                    self._record_chunk_store(intent, {**attach_stats, "batch_intents": len(intents)})
+                self._set_results(intent, fused)
+                query_text, filters, matched_ids, agent_context = self._finalize_context(intent, plan, plan_info)
+                records.append((uuid.uuid4(), query_text, dict(filters or {}), matched_ids, agent_context,
+                                datetime.now(timezone.utc).replace(tzinfo=None))) # retrieval_logs.timestamp is naive UTC
+                intent.provenance.add_action("RetrievalContextPrepEnd")
+            except Exception as e:
+                errors[intent.intent_id] = e
+        return records
+
+    def _log_batch(self, records: List[tuple]):
+        if self.retrieval_log_buffer is not None:
+            for _, query_text, filters, matched_ids, agent_context, _ in records:
+                self.retrieval_log_buffer.log_retrieval(query_text, filters, matched_ids, agent_context)
+        else:
+            self.db_manager.log_retrievals_bulk(records)
+
+    def _start_batch(self, intents: List[Intent], mode: str) -> Tuple[List[Optional[str]], List[Optional[List[Dict[str, Any]]]]]:
+        """Records the start of each intent; returns their memo keys and memoized ranked chunks (None for the ones to retrieve)."""
+        for intent in intents:
+            intent.provenance.add_action("RetrievalContextPrepStart", {"cfg": intent.retrieval_config, "mode": mode})
+        memo_keys = [self._memo_key(intent, self._hybrid_subquery_args(intent)) for intent in intents]
+        return memo_keys, [self._memo_get(intent, key) for intent, key in zip(intents, memo_keys)]
+
+    def _vector_texts(self, intents: List[Intent]) -> List[Tuple[int, str]]:
+        return [(pos, intent.retrieval_config.get("semantic_search_query_text")) for pos, intent in enumerate(intents)
+                if "vector" in self._hybrid_subquery_args(intent)]
+
+    def retrieve_and_prepare_contexts(self, intents: List[Intent]) -> Dict[uuid.UUID, Exception]:
+        """
+        retrieve_and_prepare_context for many intents at once (e.g. the ready nodes of one wave): their query texts are
+        embedded in one call, every sub-query of every intent is answered by one batch_search_chunks round-trip, whole
+        sections by one get_section_chunks call, missing texts by one fetch and the logs by one insert. Each intent
+        gets the same results, context and provenance actions as the single path (plus BatchedRetrieval).
+        Returns intent_id -> exception for intents that failed; if the batched search itself fails, each intent is
+        retrieved on its own (RetrievalBatchFallback), reusing the start entry and memo lookup already recorded.
+        """
+        errors: Dict[uuid.UUID, Exception] = {}
+        if not intents:
+            return errors
+        wall_start = time.perf_counter()
+        memo_keys, memo_hits = self._start_batch(intents, "batched")
+        batch = [intent for intent, hit in zip(intents, memo_hits) if hit is None] # Intents whose request is not memoized
+        vector_texts = self._vector_texts(batch)
+        vectors = self.embedding_service.embed([text for _, text in vector_texts]) if vector_texts else []
+        query_vectors = {pos: vector.tolist() for (pos, _), vector in zip(vector_texts, vectors)}
+        all_subqueries, cached, requests, slots, evidence_slots = self._batch_requests(batch, query_vectors)
+        if evidence_slots:
+            self._scatter_evidence(cached, evidence_slots, self._get_evidence_results(*self._evidence_union(evidence_slots), limit=None,
+                                                                                      include_text=self.chunk_store is None))
+        batch_start = time.perf_counter()
+        try:
+            batch_results = self.db_manager.batch_search_chunks(requests, include_text=self.chunk_store is None) if requests else []
+        except Exception as e:
+            print(f"WARNING: Batched retrieval of {len(batch)} intents failed ({type(e).__name__} - {e}). Retrieving them one at a time.")
+            return self._retrieve_each(intents, memo_keys, memo_hits, e, wall_start)
+        batch_ms = round((time.perf_counter() - batch_start) * 1000, 2)
+
+        fused_batch = self._scatter_batch(batch, all_subqueries, cached, slots, batch_results, batch_ms, wall_start)
+        rerank_queries = self._rerank_queries(batch)
+        if any(query is not None for query in rerank_queries):
+            fused_batch = self._rerank(batch, fused_batch, rerank_queries, self._attach_rerank_texts(fused_batch, rerank_queries))
+        if diversify_lists := self._diversify_lists(batch, fused_batch):
+            fused_batch = self._diversify_batch(batch, fused_batch, self._candidate_vectors(diversify_lists))
+        fused_per_intent = self._memo_merge(intents, memo_keys, memo_hits, fused_batch)
+        sections_per_intent = [section_keys(fused) for fused in fused_per_intent]
+        all_sections = list(dict.fromkeys(key for sections in sections_per_intent for key in sections))
+        section_rows = self.db_manager.get_section_chunks(all_sections, CONTEXT_PACK_MAX_SECTION_CHUNKS,
+                                                          include_text=self.chunk_store is None) if all_sections else []
+        window_hits, window = self._batch_window_args(intents, fused_per_intent)
+        window_rows = self.db_manager.get_neighbour_chunks(window_hits, window, include_text=self.chunk_store is None) if window_hits else []
+        plans = self._plan_batch(intents, fused_per_intent, section_rows, sections_per_intent, window_rows)
+        attach_stats = None
+        if self.chunk_store is not None:
+            attach_stats = self.chunk_store.attach_texts(self._batch_rows_needing_text(fused_per_intent, plans), self.db_manager.get_chunk_texts)
+        self._log_batch(self._finish_batch(intents, fused_per_intent, plans, attach_stats, errors))
+        return errors
+
+    @staticmethod
+    def _record_batch_fallback(intent: Intent, error: Exception):
+        intent.provenance.add_action("RetrievalBatchFallback", {"error": f"{type(error).__name__} - {error}"})
+
+    def _retrieve_each(self, intents: List[Intent], memo_keys: List[Optional[str]], memo_hits: List[Optional[List[Dict[str, Any]]]],
+                       batch_error: Exception, wall_start: float) -> Dict[uuid.UUID, Exception]:
+        """Fallback after a failed batched search: each intent through the single path, without a second start entry."""
+        errors: Dict[uuid.UUID, Exception] = {}
+        for intent, key, hit in zip(intents, memo_keys, memo_hits):
+            self._record_batch_fallback(intent, batch_error)
+            try:
+                self._retrieve_one(intent, wall_start, (key, hit))
+            except Exception as e:
+                errors[intent.intent_id] = e
+        return errors
+
+    async def retrieve_and_prepare_contexts_async(self, intents: List[Intent]) -> Dict[uuid.UUID, Exception]:
+        """Event-loop variant of retrieve_and_prepare_contexts on the AsyncDatabaseManager (sync path in a thread without one)."""
+        if self.async_db_manager is None:
+            return await asyncio.to_thread(self.retrieve_and_prepare_contexts, intents)
+        adb = self.async_db_manager
+        errors: Dict[uuid.UUID, Exception] = {}
+        if not intents:
+            return errors
+        wall_start = time.perf_counter()
+        memo_keys, memo_hits = self._start_batch(intents, "batched_async")
+        batch = [intent for intent, hit in zip(intents, memo_hits) if hit is None]
+        vector_texts = self._vector_texts(batch)
+        vectors = await asyncio.to_thread(self.embedding_service.embed, [text for _, text in vector_texts]) if vector_texts else []
+        query_vectors = {pos: vector.tolist() for (pos, _), vector in zip(vector_texts, vectors)}
+        all_subqueries, cached, requests, slots, evidence_slots = self._batch_requests(batch, query_vectors)
+        if evidence_slots:
+            self._scatter_evidence(cached, evidence_slots, await self._get_evidence_results_async(*self._evidence_union(evidence_slots), limit=None,
+                                                                                                 include_text=self.chunk_store is None))
+        batch_start = time.perf_counter()
+        try:
+            batch_results = await adb.batch_search_chunks(requests, include_text=self.chunk_store is None) if requests else []
+        except Exception as e:
+            print(f"WARNING: Async batched retrieval of {len(batch)} intents failed ({type(e).__name__} - {e}). Retrieving them one at a time.")
+            for intent, key, hit in zip(intents, memo_keys, memo_hits):
+                self._record_batch_fallback(intent, e)
+                try:
+                    await self._retrieve_one_async(intent, wall_start, (key, hit))
+                except Exception as intent_error:
+                    errors[intent.intent_id] = intent_error
+            return errors
+        batch_ms = round((time.perf_counter() - batch_start) * 1000, 2)
+
+        fused_batch = self._scatter_batch(batch, all_subqueries, cached, slots, batch_results, batch_ms, wall_start)
+        rerank_queries = self._rerank_queries(batch)
+        if any(query is not None for query in rerank_queries):
+            attach_stats = await self._attach_rerank_texts_async(fused_batch, rerank_queries)
+            fused_batch = await asyncio.to_thread(self._rerank, batch, fused_batch, rerank_queries, attach_stats)
+        if diversify_lists := self._diversify_lists(batch, fused_batch):
+            fused_batch = self._diversify_batch(batch, fused_batch, await self._candidate_vectors_async(diversify_lists))
+        fused_per_intent = self._memo_merge(intents, memo_keys, memo_hits, fused_batch)
+        sections_per_intent = [section_keys(fused) for fused in fused_per_intent]
+        all_sections = list(dict.fromkeys(key for sections in sections_per_intent for key in sections))
+        section_rows = await adb.get_section_chunks(all_sections, CONTEXT_PACK_MAX_SECTION_CHUNKS,
+                                                    include_text=self.chunk_store is None) if all_sections else []
+        window_hits, window = self._batch_window_args(intents, fused_per_intent)
+        window_rows = await adb.get_neighbour_chunks(window_hits, window, include_text=self.chunk_store is None) if window_hits else []
+        plans = self._plan_batch(intents, fused_per_intent, section_rows, sections_per_intent, window_rows)
+        attach_stats = None
+        if self.chunk_store is not None:
+            attach_stats = await self.chunk_store.attach_texts_async(self._batch_rows_needing_text(fused_per_intent, plans), adb.get_chunk_texts)
+        records = self._finish_batch(intents, fused_per_intent, plans, attach_stats, errors)
+        if self.retrieval_log_buffer is not None:
+            self._log_batch(records) # Non-blocking enqueue
+        elif records:
+            await adb.log_retrievals_bulk(records)
+        return errors
+
+    def retrieve_and_prepare_context(self, intent: Intent):
+        intent.provenance.add_action("RetrievalContextPrepStart", {"cfg": intent.retrieval_config})
+        self._retrieve_one(intent, time.perf_counter())
+
+    def _memo_lookup(self, intent: Intent, subqueries: Dict[str, Dict[str, Any]],
+                     memo: Optional[Tuple[Optional[str], Optional[List[Dict[str, Any]]]]]) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+        """(memo key, memoized ranked chunks or None); `memo` is the lookup a batch already made for this intent."""
+        if memo is not None:
+            return memo
+        key = self._memo_key(intent, subqueries)
+        return key, self._memo_get(intent, key)
+
+    def _retrieve_one(self, intent: Intent, wall_start: float,
+                      memo: Optional[Tuple[Optional[str], Optional[List[Dict[str, Any]]]]] = None):
+        """retrieve_and_prepare_context after its start entry (also the batch fallback, which passes its memo lookup)."""
+        subqueries = self._hybrid_subquery_args(intent)
+        key, fused_chunks = self._memo_lookup(intent, subqueries, memo)
+        if fused_chunks is None:
+            results, timings = self._run_subqueries(subqueries)
+            self._record_subqueries(intent, subqueries, results, timings, wall_start)
+
+            fused_chunks = self._fuse(intent, results)
+            rerank_queries = self._rerank_queries([intent])
+            if rerank_queries[0] is not None:
+                fused_chunks = self._rerank([intent], [fused_chunks], rerank_queries, self._attach_rerank_texts([fused_chunks], rerank_queries))[0]
+            if self._mmr_lambda(intent) is not None:
+                fused_chunks = self._diversify(intent, fused_chunks, self._candidate_vectors([fused_chunks]))
+            self._memo_put(intent, key, fused_chunks)
+        sections = section_keys(fused_chunks)
+        section_rows = self.db_manager.get_section_chunks(sections, CONTEXT_PACK_MAX_SECTION_CHUNKS, # One round-trip for all sections
+                                                          include_text=self.chunk_store is None) if sections else []
+        window = neighbour_window_for(intent.retrieval_config)
+        window_rows = self.db_manager.get_neighbour_chunks(self._hit_ids(fused_chunks), window, # One windowed query for every hit
+                                                         include_text=self.chunk_store is None) if window > 0 and fused_chunks else []
+        plan, plan_info = self._plan_context(intent, fused_chunks, section_rows, window_rows)
+        if self.chunk_store is not None: # Texts only for what is used, and only those the run has not seen yet
+            self._record_chunk_store(intent, self.chunk_store.attach_texts(self._rows_needing_text(fused_chunks, plan), self.db_manager.get_chunk_texts))
+        self._set_results(intent, fused_chunks)
+
+        (self.retrieval_log_buffer or self.db_manager).log_retrieval(*self._finalize_context(intent, plan, plan_info))
+        intent.provenance.add_action("RetrievalContextPrepEnd")
+
+    async def retrieve_and_prepare_context_async(self, intent: Intent):
+        """
+        Event-loop variant of retrieve_and_prepare_context. The hybrid sub-queries run concurrently on the
+        AsyncDatabaseManager pool. Without an async manager it falls back to the sync path in a worker thread.
+        """
+        if self.async_db_manager is None:
+            await asyncio.to_thread(self.retrieve_and_prepare_context, intent)
+            return
+        intent.provenance.add_action("RetrievalContextPrepStart", {"cfg": intent.retrieval_config, "mode": "async"})
+        await self._retrieve_one_async(intent, time.perf_counter())
+
+    async def _retrieve_one_async(self, intent: Intent, wall_start: float,
+                                  memo: Optional[Tuple[Optional[str], Optional[List[Dict[str, Any]]]]] = None):
+        """Event-loop variant of _retrieve_one on the AsyncDatabaseManager."""
+        adb = self.async_db_manager
+        subqueries = self._hybrid_subquery_args(intent)
+        key, fused_chunks = self._memo_lookup(intent, subqueries, memo)
+        if fused_chunks is None:
+            results, timings = await self._run_subqueries_async(subqueries)
+            self._record_subqueries(intent, subqueries, results, timings, wall_start)
+
+            fused_chunks = self._fuse(intent, results)
+            rerank_queries = self._rerank_queries([intent])
+            if rerank_queries[0] is not None:
+                attach_stats = await self._attach_rerank_texts_async([fused_chunks], rerank_queries)
+                fused_chunks = (await asyncio.to_thread(self._rerank, [intent], [fused_chunks], rerank_queries, attach_stats))[0]
+            if self._mmr_lambda(intent) is not None:
+                fused_chunks = self._diversify(intent, fused_chunks, await self._candidate_vectors_async([fused_chunks]))
+            self._memo_put(intent, key, fused_chunks)
+        sections = section_keys(fused_chunks)
+        section_rows = await adb.get_section_chunks(sections, CONTEXT_PACK_MAX_SECTION_CHUNKS, include_text=self.chunk_store is None) if sections else []
+        window = neighbour_window_for(intent.retrieval_config)
+        window_rows = await adb.get_neighbour_chunks(self._hit_ids(fused_chunks), window,
+                                                     include_text=self.chunk_store is None) if window > 0 and fused_chunks else []
+        plan, plan_info = self._plan_context(intent, fused_chunks, section_rows, window_rows)
+        if self.chunk_store is not None:
+            self._record_chunk_store(intent, await self.chunk_store.attach_texts_async(self._rows_needing_text(fused_chunks, plan), adb.get_chunk_texts))
+        self._set_results(intent, fused_chunks)
+
+        log_args = self._finalize_context(intent, plan, plan_info)
+        if self.retrieval_log_buffer is not None:
+            self.retrieval_log_buffer.log_retrieval(*log_args) # Non-blocking enqueue
+        else:
+            await adb.log_retrieval(*log_args)
         intent.provenance.add_action("RetrievalContextPrepEnd")
@@ -0,0 +1,120 @@
+# retrieval/test_context_packer.py
+# Unit tests for token-budget context packing (no database needed): python -m pytest retrieval/test_context_packer.py
+import uuid
+
+import pytest
+
+from config import HYBRID_RRF_K
+from retrieval.context_packer import (ContextPacker, MAX_CONTEXT_TOKENS, parse_token_budgets, token_budget_for, row_tokens,
+                                      ranked_score, rows_within_window)
+
+OVERHEAD = 5
+
+
+def _chunk(doc_id, tokens, letter="x", page=1, section=None, rrf_score=None):
+    """A chunk row whose text is exactly `tokens` approximate tokens (4 chars each)."""
+    return {"chunk_id": uuid.uuid4(), "doc_id": doc_id, "page_number": page, "section": section,
+            "chunk_text": letter * (4 * tokens), "rrf_score": rrf_score}
+
+
+def _packer(**kwargs):
+    return ContextPacker(context_weight=0.35, max_section_share=0.5, unit_overhead_tokens=OVERHEAD, **kwargs)
+
+
+def test_parse_token_budgets_uppercases_and_skips_malformed():
+    assert parse_token_budgets("assess=16000, RETRIEVE=6000,oops,BALANCE=lots") == {"ASSESS": 16000, "RETRIEVE": 6000}
+
+
+def test_token_budget_for_precedence():
+    budgets = {"ASSESS": 16000, "ASSESS_POLICY": 9000, "RETRIEVE": 6000}
+    assert token_budget_for("ASSESS_POLICY_COMPLIANCE", {"context_token_budget": 500}, budgets) == (500, "retrieval_config")
+    assert token_budget_for("assess_policy_compliance", None, budgets) == (9000, "task_type:ASSESS_POLICY") # Longest key wins
+    assert token_budget_for("RETRIEVE_FACTS", {"context_token_budget": -1}, budgets) == (6000, "task_type:RETRIEVE")
+    assert token_budget_for("SUMMARISE", {}, budgets)[1] == "default"
+    assert token_budget_for(None, {"context_token_budget": 10 ** 12}, budgets) == (MAX_CONTEXT_TOKENS, "retrieval_config")
+
+
+def test_row_tokens_and_ranked_score():
+    assert row_tokens({"chunk_text": "abcde"}) == 2
+    assert row_tokens({"chunk_text": None, "chunk_chars": 9}) == 3
+    assert row_tokens({}) == 0
+    assert ranked_score({"rrf_score": 0.5}, 3) == 0.5
+    assert ranked_score({"rrf_score": 0.5, "rerank_score": 7.0}, 3) == pytest.approx(1.0 / (HYBRID_RRF_K + 4))
+    assert ranked_score({}, 0) == pytest.approx(1.0 / (HYBRID_RRF_K + 1))
+
+
+def test_packs_most_relevant_chunks_within_budget():
+    ranked = [_chunk(uuid.uuid4(), 10, rrf_score=s) for s in (0.03, 0.02, 0.01)] # Separate documents: no multi-chunk units
+    plan = _packer().select(ranked, budget=32)
+    packed = [cid for e in plan.entries for cid in e["chunk_set"]]
+    assert packed == [ranked[0]["chunk_id"], ranked[1]["chunk_id"]]
+    assert plan.used_tokens == 2 * (10 + OVERHEAD) <= plan.budget
+
+
+def test_nothing_fits_a_tiny_budget():
+    context, report = _packer().pack([_chunk(uuid.uuid4(), 10, rrf_score=0.1)], budget=OVERHEAD + 9)
+    assert context == []
+    assert report["used_tokens"] == 0 and report["ranked_left_out"] == 1
+
+
+def test_duplicate_ranked_rows_are_packed_once():
+    row = _chunk(uuid.uuid4(), 10, rrf_score=0.05)
+    context, report = _packer().pack([row, dict(row), row], budget=1000)
+    assert len(context) == 1
+    assert report["used_tokens"] == 10 + OVERHEAD
+    assert report["candidates"]["chunk"] == 1
+
+
+def test_section_absorbs_its_packed_chunk():
+    doc_id = uuid.uuid4()
+    before, after = _chunk(doc_id, 10, "a", section="S"), _chunk(doc_id, 10, "c", section="S")
+    hit = _chunk(doc_id, 10, "b", section="S", rrf_score=0.02)
+    context, report = _packer().pack([hit], budget=1000, section_rows=[before, dict(hit, rrf_score=None), after])
+    assert len(context) == 1
+    entry = context[0]
+    assert entry["metadata"]["unit"] == "section"
+    assert entry["metadata"]["chunk_ids"] == [str(before["chunk_id"]), str(hit["chunk_id"]), str(after["chunk_id"])]
+    assert entry["chunk_text"] == "\n\n".join(r["chunk_text"] for r in (before, hit, after)) # Document order
+    assert "absorbs 1 packed unit" in entry["metadata"]["pack_reason"]
+    assert report["used_tokens"] == 30 + OVERHEAD # One header for the merged unit
+    assert report["units"][0]["ranked"] == 1 and report["units"][0]["context_chunks"] == 2
+
+
+def test_oversized_section_is_not_offered():
+    doc_id = uuid.uuid4()
+    hit = _chunk(doc_id, 10, section="S", rrf_score=0.02)
+    section_rows = [hit] + [_chunk(doc_id, 10, section="S") for _ in range(5)] # 60 tokens > half of the budget
+    context, report = _packer().pack([hit], budget=100, section_rows=section_rows)
+    assert report["candidates"]["section"] == 0
+    assert [e["metadata"]["unit"] for e in context] == ["chunk"]
+
+
+def test_ranked_run_on_adjacent_pages_becomes_one_passage():
+    doc_id = uuid.uuid4()
+    first, second = _chunk(doc_id, 10, "a", page=4, rrf_score=0.02), _chunk(doc_id, 10, "b", page=5, rrf_score=0.02)
+    far = _chunk(doc_id, 10, "c", page=9, rrf_score=0.01)
+    context, report = _packer().pack([second, first, far], budget=1000)
+    assert report["candidates"]["neighbours"] == 1
+    units = {e["metadata"]["unit"]: e for e in context}
+    assert units["neighbours"]["metadata"]["pages"] == [4, 5]
+    assert len({cid for e in context for cid in e["metadata"]["chunk_ids"]}) == 3 # Every chunk exactly once
+
+
+def test_window_unit_brings_surrounding_chunks():
+    doc_id = uuid.uuid4()
+    rows = [dict(_chunk(doc_id, 10, letter), doc_position=i) for i, letter in enumerate("abcde")]
+    hit = dict(rows[2], rrf_score=0.02)
+    # Budget 80 caps multi-chunk units at 40 tokens: the +-1 window (30) is offered, the whole five-chunk run (50) is not
+    context, report = _packer().pack([hit], budget=80, window_rows=rows, window=1)
+    assert report["candidates"]["window"] == 1
+    assert len(context) == 1 and context[0]["metadata"]["unit"] == "window"
+    assert context[0]["metadata"]["chunk_ids"] == [str(r["chunk_id"]) for r in rows[1:4]]
+
+
+def test_rows_within_window():
+    doc_id, other_doc = uuid.uuid4(), uuid.uuid4()
+    rows = [{"chunk_id": uuid.uuid4(), "doc_id": doc_id, "doc_position": i} for i in range(6)]
+    other = [{"chunk_id": uuid.uuid4(), "doc_id": other_doc, "doc_position": i} for i in range(3)]
+    kept = rows_within_window(rows + other, [rows[0]["chunk_id"], rows[5]["chunk_id"]], window=1)
+    assert kept == [rows[0], rows[1], rows[4], rows[5]]
+    assert rows_within_window(rows, [], window=3) == []
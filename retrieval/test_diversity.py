@@ -0,0 +1,81 @@
+# retrieval/test_diversity.py
+# Unit tests for MMR diversity re-ranking (no database needed): python -m pytest retrieval/test_diversity.py
+import uuid
+
+import numpy as np
+import pytest
+
+from config import MMR_LAMBDA
+from retrieval.diversity import parse_mmr_lambdas, mmr_lambda_for, mmr_order, diversify
+
+
+def _vectors(*rows):
+    return np.array(rows, dtype=np.float32)
+
+
+def test_parse_mmr_lambdas_skips_malformed_and_out_of_range():
+    assert parse_mmr_lambdas("retrieve=0.8, ASSESS=0.65,BAD=1.5,NEG=-0.1,junk,X=y") == {"RETRIEVE": 0.8, "ASSESS": 0.65}
+
+
+def test_mmr_lambda_for_precedence():
+    lambdas = {"ASSESS": 0.65, "ASSESS_POLICY": 0.4}
+    assert mmr_lambda_for("ASSESS", {"mmr_lambda": 0.9}, lambdas) == (0.9, "retrieval_config")
+    assert mmr_lambda_for("assess_policy_fit", {"mmr_lambda": True}, lambdas) == (0.4, "task_type:ASSESS_POLICY") # bool is not a lambda
+    assert mmr_lambda_for("ASSESS", {"mmr_lambda": 2.0}, lambdas) == (0.65, "task_type:ASSESS")
+    assert mmr_lambda_for(None, None, lambdas) == (MMR_LAMBDA, "default")
+
+
+def test_lambda_one_keeps_relevance_order():
+    relevance = np.array([0.2, 1.0, 0.6], dtype=np.float32)
+    vectors = _vectors([1, 0], [1, 0.01], [1, 0.02]) # Near-parallel, but below the duplicate threshold used here
+    order, dropped = mmr_order(relevance, vectors, np.ones(3, dtype=bool), lam=1.0, duplicate_similarity=1.1)
+    assert order == [1, 2, 0] and dropped == []
+
+
+def test_similar_candidate_is_pushed_below_a_distinct_one():
+    relevance = np.array([1.0, 0.9, 0.8], dtype=np.float32)
+    vectors = _vectors([1, 0], [0.9, np.sqrt(1 - 0.81)], [0, 1]) # cos(0, 1) = 0.9, cos(0, 2) = 0
+    order, dropped = mmr_order(relevance, vectors, np.ones(3, dtype=bool), lam=0.5, duplicate_similarity=0.99)
+    assert order == [0, 2, 1] and dropped == []
+
+
+def test_near_duplicate_is_dropped_and_reported():
+    relevance = np.array([1.0, 0.9, 0.5], dtype=np.float32)
+    vectors = _vectors([1, 0], [1, 0.001], [0, 1])
+    order, dropped = mmr_order(relevance, vectors, np.ones(3, dtype=bool), lam=0.7, duplicate_similarity=0.97)
+    assert order == [0, 2]
+    assert [(i, j) for i, j, _ in dropped] == [(1, 0)]
+    assert dropped[0][2] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_candidates_without_vectors_are_never_penalised_or_dropped():
+    relevance = np.array([1.0, 0.9], dtype=np.float32)
+    vectors = _vectors([1, 0], [0, 0])
+    order, dropped = mmr_order(relevance, vectors, np.array([True, False]), lam=0.5, duplicate_similarity=0.5)
+    assert order == [0, 1] and dropped == []
+
+
+def test_diversify_reports_dropped_duplicates_and_displacement():
+    rows = [{"chunk_id": uuid.uuid4(), "rrf_score": s, "chunk_text": "x" * 40} for s in (0.05, 0.04, 0.03)]
+    embeddings = {rows[0]["chunk_id"]: np.array([1, 0], np.float32), rows[1]["chunk_id"]: np.array([1, 0], np.float32),
+                  rows[2]["chunk_id"]: np.array([0, 1], np.float32)}
+    reranked, report = diversify(rows, embeddings, lam=0.7, keep_top=2, duplicate_similarity=0.97)
+    assert [r["chunk_id"] for r in reranked] == [rows[0]["chunk_id"], rows[2]["chunk_id"]]
+    assert report["duplicates_dropped"] == 1 and report["redundant_tokens_removed"] == 10
+    assert report["duplicates"][0]["duplicate_of"] == str(rows[0]["chunk_id"])
+    assert report["displaced_from_top"] == 1
+
+
+def test_diversify_skips_with_too_few_embeddings():
+    rows = [{"chunk_id": uuid.uuid4(), "rrf_score": 0.05}, {"chunk_id": uuid.uuid4(), "rrf_score": 0.04}]
+    reranked, report = diversify(rows, {rows[0]["chunk_id"]: np.ones(2, np.float32)}, lam=0.5, keep_top=1)
+    assert reranked is rows
+    assert report["skipped"] == "too few embeddings" and report["duplicates_dropped"] == 0
+
+
+def test_diversify_skips_identical_placeholder_vectors():
+    rows = [{"chunk_id": uuid.uuid4(), "rrf_score": 0.05 - i * 0.001} for i in range(10)]
+    placeholder = {r["chunk_id"]: np.full(768, 0.1, np.float32) for r in rows} # PlaceholderBackend: one vector for every text
+    reranked, report = diversify(rows, placeholder, lam=0.7, keep_top=5)
+    assert reranked is rows
+    assert report["skipped"] == "identical embeddings" and report["duplicates_dropped"] == 0
@@ -0,0 +1,81 @@
+# retrieval/test_hybrid_ranker.py
+# Unit tests for weighted reciprocal rank fusion (no database needed): python -m pytest retrieval/test_hybrid_ranker.py
+import uuid
+
+import pytest
+
+from retrieval.hybrid_ranker import parse_rrf_weights, reciprocal_rank_fusion
+
+K = 60
+
+
+def _row(chunk_id, **extra):
+    return {"chunk_id": chunk_id, **extra}
+
+
+def test_parse_rrf_weights_skips_malformed_entries():
+    assert parse_rrf_weights("vector=1.0, keyword = 0.5,bogus,filter=x") == {"vector": 1.0, "keyword": 0.5}
+    assert parse_rrf_weights("") == {}
+
+
+def test_scores_sum_weight_over_k_plus_rank():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    fused = reciprocal_rank_fusion({"vector": [_row(a), _row(b)], "keyword": [_row(b)]},
+                                   weights={"vector": 1.0, "keyword": 0.5}, k=K)
+    by_id = {r["chunk_id"]: r for r in fused}
+    assert by_id[a]["rrf_score"] == pytest.approx(1.0 / (K + 1))
+    assert by_id[b]["rrf_score"] == pytest.approx(1.0 / (K + 2) + 0.5 / (K + 1))
+    assert by_id[b]["stage_ranks"] == {"vector": 2, "keyword": 1}
+    assert [r["chunk_id"] for r in fused] == [b, a]
+
+
+def test_unweighted_stage_defaults_to_one_and_zero_disables():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    fused = reciprocal_rank_fusion({"evidence": [_row(a)], "filter": [_row(b)]}, weights={"filter": 0}, k=K)
+    assert [r["chunk_id"] for r in fused] == [a]
+    assert fused[0]["rrf_score"] == pytest.approx(1.0 / (K + 1))
+
+
+def test_duplicate_within_one_list_counts_its_best_rank_once():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    fused = reciprocal_rank_fusion({"keyword": [_row(a), _row(b), _row(a)]}, weights={}, k=K)
+    by_id = {r["chunk_id"]: r for r in fused}
+    assert len(fused) == 2
+    assert by_id[a]["stage_ranks"] == {"keyword": 1}
+    assert by_id[a]["rrf_score"] == pytest.approx(1.0 / (K + 1))
+    assert by_id[b]["stage_ranks"] == {"keyword": 2} # Later rows keep their list position
+
+
+def test_first_list_row_is_kept_and_missing_distance_is_filled():
+    a = uuid.uuid4()
+    fused = reciprocal_rank_fusion({"keyword": [_row(a, chunk_text="from keyword", distance=None)],
+                                    "vector": [_row(a, chunk_text="from vector", distance=0.25)]}, weights={}, k=K)
+    assert fused[0]["chunk_text"] == "from keyword"
+    assert fused[0]["distance"] == 0.25
+
+
+def test_input_rows_are_not_mutated():
+    a = uuid.uuid4()
+    row = _row(a, distance=0.1)
+    reciprocal_rank_fusion({"vector": [row]}, weights={}, k=K)
+    assert row == {"chunk_id": a, "distance": 0.1}
+
+
+def test_ties_break_on_distance_then_page_then_chunk_id():
+    near, far, no_distance = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    # Each chunk is rank 1 in its own equally weighted list, so all three scores tie
+    fused = reciprocal_rank_fusion({"a": [_row(no_distance, page_number=1)], "b": [_row(far, distance=0.9)],
+                                    "c": [_row(near, distance=0.1)]}, weights={}, k=K)
+    assert [r["chunk_id"] for r in fused] == [near, far, no_distance]
+
+    low_id, high_id = sorted([uuid.uuid4(), uuid.uuid4()], key=str)
+    late_page = uuid.uuid4()
+    fused = reciprocal_rank_fusion({"a": [_row(late_page, page_number=3)], "b": [_row(high_id, page_number=2)],
+                                    "c": [_row(low_id, page_number=2)]}, weights={}, k=K)
+    assert [r["chunk_id"] for r in fused] == [low_id, high_id, late_page]
+
+
+def test_custom_id_key_and_empty_input():
+    fused = reciprocal_rank_fusion({"vector": [{"policy_id": "P1"}, {"policy_id": "P2"}]}, weights={}, k=K, id_key="policy_id")
+    assert [r["policy_id"] for r in fused] == ["P1", "P2"]
+    assert reciprocal_rank_fusion({}, weights={}) == []
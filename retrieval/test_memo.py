@@ -0,0 +1,60 @@
+# retrieval/test_memo.py
+# Unit tests for retrieval memo keys and the LRU memo (no database needed): python -m pytest retrieval/test_memo.py
+from retrieval.memo import memo_key, RetrievalMemo
+
+
+def _subqueries(**vector_args):
+    return {"keyword": {"keywords": ["Flood Risk", "heritage"], "sources": ["APP_1", "APP_2"], "limit": 20},
+            "vector": {"query_text": "flood  risk\nassessment", "document_types": ["ES_Chapter", "Plan"],
+                       "query_embedding": [0.1, 0.2], **vector_args}}
+
+
+def test_memo_key_normalises_whitespace_case_and_list_order():
+    reordered = {"vector": {"document_types": ["Plan", "ES_Chapter", "Plan"], "query_text": " flood risk assessment ",
+                            "query_embedding": [0.9, 0.9]},
+                 "keyword": {"limit": 20, "sources": ["APP_2", "APP_1"], "keywords": ["heritage", " flood   RISK", ""]}}
+    assert memo_key(_subqueries(), mmr_lambda=0.7) == memo_key(reordered, mmr_lambda=0.7)
+
+
+def test_memo_key_ignores_the_embedding_but_not_the_query_text():
+    base = memo_key(_subqueries())
+    assert memo_key(_subqueries(query_embedding=None)) == base
+    assert memo_key(_subqueries(query_text="noise assessment")) != base
+
+
+def test_memo_key_separates_limits_stages_and_settings():
+    base = memo_key(_subqueries(), rrf_weights={"vector": 1.0}, rerank=False)
+    assert memo_key(_subqueries(limit=5), rrf_weights={"vector": 1.0}, rerank=False) != base
+    assert memo_key(_subqueries(), rrf_weights={"vector": 0.5}, rerank=False) != base
+    assert memo_key(_subqueries(), rrf_weights={"vector": 1.0}, rerank=True) != base
+    assert memo_key({"filter": _subqueries()["keyword"]}, rrf_weights={"vector": 1.0}, rerank=False) != base
+
+
+def test_memo_returns_copies():
+    memo = RetrievalMemo(max_entries=4)
+    rows = [{"chunk_id": "c1", "rrf_score": 0.1}]
+    memo.put("k", ["APP_1"], rows)
+    rows[0]["rrf_score"] = 99.0
+    hit, age = memo.get("k")
+    assert hit == [{"chunk_id": "c1", "rrf_score": 0.1}] and age >= 0
+    hit[0]["chunk_text"] = "annotated by one intent"
+    assert "chunk_text" not in memo.get("k")[0][0]
+
+
+def test_memo_evicts_least_recently_used():
+    memo = RetrievalMemo(max_entries=2)
+    memo.put("a", None, []); memo.put("b", None, [])
+    assert memo.get("a") is not None # "b" is now the least recently used
+    memo.put("c", None, [])
+    assert memo.get("b") is None and memo.get("a") is not None and memo.get("c") is not None
+    stats = memo.get_stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2 and stats["misses"] == 1 and stats["hits"] == 3
+
+
+def test_invalidate_sources_drops_overlapping_and_unfiltered_entries():
+    memo = RetrievalMemo()
+    memo.put("app1", ["APP_1"], []); memo.put("app2", ["APP_2"], []); memo.put("both", ["APP_1", "APP_2"], [])
+    memo.put("unfiltered", None, [])
+    assert memo.invalidate_sources(["APP_1"]) == 3
+    assert memo.get("app2") is not None and len(memo) == 1
+    assert memo.invalidate_sources(None) == 1 and len(memo) == 0
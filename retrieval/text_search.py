@@ -0,0 +1,64 @@
+# retrieval/text_search.py
+# Builds the Postgres full-text keyword clause shared by AgenticRetriever and PolicyManager.
+# Matches against the stored, GIN-indexed document_chunks.chunk_tsv column (migrations/003) instead of ILIKE '%term%' chains.
+import re
+from typing import List, Any, Optional, NamedTuple
+
+from config import FTS_LANGUAGE, KEYWORD_SEARCH_FUZZY_FALLBACK
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class KeywordClause(NamedTuple):
+    match_sql: str          # Boolean condition for the WHERE clause
+    match_params: List[Any]
+    rank_sql: str           # Relevance expression (higher is better) for SELECT / ORDER BY
+    rank_params: List[Any]
+
+
+def clean_terms(terms: Optional[List[Any]]) -> List[str]:
+    """Drops empty/non-string terms and duplicates while keeping order."""
+    seen = set(); cleaned = []
+    for term in terms or []:
+        if term and isinstance(term, str) and term.strip() and term not in seen:
+            seen.add(term); cleaned.append(term.strip())
+    return cleaned
+
+
+def stem_word(word: str) -> str:
+    """Light suffix stripping so 'housing'/'houses'/'house' meet (an approximation of the english FTS stemmer)."""
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:len(word) - len(suffix)] + replacement
+    return word
+
+
+def word_stems(text: str) -> List[str]:
+    return [stem_word(w) for w in _WORD_RE.findall(text.lower())]
+
+
+def build_keyword_clause(terms: Optional[List[Any]], tsv_column: str = "dc.chunk_tsv", text_column: str = "dc.chunk_text",
+                         fuzzy_fallback: bool = KEYWORD_SEARCH_FUZZY_FALLBACK) -> Optional[KeywordClause]:
+    """
+    Each term becomes plainto_tsquery(term) (words within a term are ANDed); terms are ORed together with ||.
+    With fuzzy_fallback, terms also match through pg_trgm word similarity (`term <% chunk_text`), which the
+    trigram GIN index serves, so misspelt or partial terms still hit without a sequential scan.
+    Returns None when there are no usable terms.
+    """
+    cleaned = clean_terms(terms)
+    if not cleaned:
+        return None
+    tsquery_sql = " || ".join([f"plainto_tsquery('{FTS_LANGUAGE}', %s)"] * len(cleaned))
+    match_sql = f"{tsv_column} @@ ({tsquery_sql})"
+    match_params: List[Any] = list(cleaned)
+    rank_sql = f"ts_rank_cd({tsv_column}, ({tsquery_sql}))"
+    rank_params: List[Any] = list(cleaned)
+    if fuzzy_fallback:
+        fuzzy_conditions = " OR ".join([f"%s <%% {text_column}"] * len(cleaned))
+        match_sql = f"({match_sql} OR {fuzzy_conditions})"
+        match_params.extend(cleaned)
+        # Fuzzy-only hits rank by their best word similarity, scaled below typical full-text ranks
+        fuzzy_rank = ", ".join([f"word_similarity(%s, {text_column})"] * len(cleaned))
+        rank_sql = f"GREATEST({rank_sql}, 0.1 * GREATEST({fuzzy_rank}))"
+        rank_params.extend(cleaned)
+    return KeywordClause(match_sql, match_params, rank_sql, rank_params)
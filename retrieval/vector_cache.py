@@ -0,0 +1,115 @@
+# retrieval/vector_cache.py
+# Run-scoped in-memory vector cache: every chunk embedding of the applications under report, loaded once when a
+# report run starts, so the run's semantic retrieval is served by NumPy instead of one database query per intent.
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import EMBEDDING_DIMENSION
+
+
+def rows_to_matrix(rows: List[Dict[str, Any]], dimension: int, column: str = "embedding") -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Pops `column` from each row and stacks the vectors into a float32 matrix. Rows whose vector is missing or has
+    the wrong dimension are dropped. Accepts numpy arrays, lists and pgvector text ('[0.1,...]' when the adapter
+    is not registered).
+    """
+    kept: List[Dict[str, Any]] = []
+    vectors: List[np.ndarray] = []
+    for row in rows:
+        value = row.pop(column, None)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = np.array(value.strip("[]").split(","), dtype=np.float32)
+        vector = np.asarray(value, dtype=np.float32)
+        if vector.shape != (dimension,):
+            continue
+        kept.append(row); vectors.append(vector)
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, dimension), dtype=np.float32)
+    return kept, matrix
+
+
+class ApplicationVectorCache:
+    """
+    Chunk metadata (same columns as DatabaseManager.semantic_search_chunks) plus one float32 embedding matrix for
+    the chunks whose documents.source is in application_refs. Read-only after load, so ParallelProcessor
+    workers can search it concurrently. Distances are L2, matching pgvector `<->`.
+    """
+    def __init__(self, application_refs: List[str], rows: List[Dict[str, Any]], dimension: int = EMBEDDING_DIMENSION,
+                 load_seconds: float = 0.0):
+        self.application_refs = list(application_refs)
+        self.rows, self.matrix = rows_to_matrix(rows, dimension)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix).astype(np.float32)
+        # Filter columns as arrays (source is not part of the semantic result rows)
+        self.sources = np.array([row.pop('source', None) or "" for row in self.rows], dtype=object)
+        self.document_types = np.array([row.get('document_type') or "" for row in self.rows], dtype=object)
+        self.load_seconds = load_seconds
+        self._positions = {row['chunk_id']: i for i, row in enumerate(self.rows)}
+        self._stats = {"searches": 0, "queries": 0}
+
+    @classmethod
+    def load(cls, db_manager, application_refs: List[str], dimension: int = EMBEDDING_DIMENSION,
+             max_chunks: Optional[int] = None) -> Optional["ApplicationVectorCache"]:
+        """
+        One query for every chunk and embedding of the applications. Returns None when there are more than
+        max_chunks chunks (the database index is the better tool at that size).
+        """
+        start = time.perf_counter()
+        rows = db_manager.get_chunks_with_embeddings_by_sources(application_refs, limit=(max_chunks + 1) if max_chunks else None)
+        if max_chunks and len(rows) > max_chunks:
+            print(f"INFO: Application vector cache skipped: more than {max_chunks} chunks for {application_refs}.")
+            return None
+        return cls(application_refs, rows, dimension, load_seconds=time.perf_counter() - start)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def covers(self, sources: Optional[List[str]]) -> bool:
+        """True when a search filtered to `sources` (None = all sources) can be answered from this cache alone."""
+        return sources is not None and set(sources) <= set(self.application_refs)
+
+    def _candidate_rows(self, document_types: Optional[List[str]], sources: Optional[List[str]]) -> np.ndarray:
+        mask = np.ones(len(self.rows), dtype=bool)
+        if document_types:
+            mask &= np.isin(self.document_types, list(document_types))
+        if sources:
+            mask &= np.isin(self.sources, list(sources))
+        return np.flatnonzero(mask)
+
+    def search_many(self, query_embeddings: List[List[float]], limit: int = 10, document_types: Optional[List[str]] = None,
+                    sources: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """Top-`limit` chunks for each query embedding among the filtered rows; all queries are scored in one matrix product."""
+        self._stats["searches"] += 1
+        self._stats["queries"] += len(query_embeddings)
+        if not query_embeddings:
+            return []
+        candidates = self._candidate_rows(document_types, sources)
+        if len(candidates) == 0 or limit <= 0:
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        sq_dist = self.sq_norms[candidates][None, :] - 2.0 * (queries @ self.matrix[candidates].T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+        distances = np.sqrt(np.maximum(sq_dist, 0.0))
+        k = min(limit, len(candidates))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for q_idx in range(len(queries)):
+            q_top = top[q_idx][np.argsort(distances[q_idx, top[q_idx]], kind="stable")]
+            results.append([{**self.rows[candidates[i]], "distance": float(distances[q_idx, i])} for i in q_top])
+        return results
+
+    def search(self, query_embedding: List[float], limit: int = 10, document_types: Optional[List[str]] = None,
+               sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Same arguments and result rows as DatabaseManager.semantic_search_chunks, over the cached applications."""
+        return self.search_many([query_embedding], limit, document_types, sources)[0]
+
+    def vectors_for(self, chunk_ids: List[Any]) -> Dict[Any, np.ndarray]:
+        """chunk_id -> cached embedding for the ids this cache holds (MMR re-ranking without a database query)."""
+        return {cid: self.matrix[self._positions[cid]] for cid in chunk_ids if cid in self._positions}
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({"chunks": len(self.rows), "matrix_bytes": int(self.matrix.nbytes),
+                      "load_seconds": round(self.load_seconds, 4), "application_refs": self.application_refs})
+        return stats
@@ -0,0 +1,34 @@
+# test_local_db_manager.py
+# Unit tests for the embedded backend's FTS5 query building (no database server needed): python -m pytest test_local_db_manager.py
+import sqlite3
+
+import pytest
+
+from local_db_manager import fts_match_expression
+
+
+def test_words_are_anded_within_a_term_and_terms_ored():
+    assert fts_match_expression(["Flood risk", "heritage"]) == '("flood" AND "risk") OR ("heritage")'
+
+
+def test_empty_and_non_string_terms_are_ignored():
+    assert fts_match_expression(None) is None
+    assert fts_match_expression([]) is None
+    assert fts_match_expression(["", "   ", None, 42, "!!"]) is None
+    assert fts_match_expression(["noise", "noise", None]) == '("noise")'
+
+
+@pytest.mark.parametrize("term", ['"unbalanced', 'flood NEAR(risk)', 'a* OR b', 'col:value', '-excluded ^start', 'NOT AND OR'])
+def test_fts5_syntax_in_user_text_is_quoted(term):
+    expression = fts_match_expression([term])
+    with sqlite3.connect(":memory:") as conn:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(body);")
+        except sqlite3.OperationalError:
+            pytest.skip("SQLite built without FTS5")
+        conn.execute("INSERT INTO t (body) VALUES ('flood risk near the col value and not or a b excluded start unbalanced');")
+        assert conn.execute("SELECT count(*) FROM t WHERE t MATCH ?;", (expression,)).fetchone()[0] == 1
+
+
+def test_operator_words_become_plain_tokens():
+    assert fts_match_expression(["NOT AND OR"]) == '("not" AND "and" AND "or")'
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Latency / recall benchmark of hierarchical (document -> section -> chunk) semantic search against the flat search.
+
+Loads a synthetic application (documents of sections of chunks, vectors drawn around per-document and per-section
+centroids) under a scratch source, builds its summary embeddings with refresh_summary_embeddings(), computes exact
+top-k on the client as ground truth, then runs every query through DatabaseManager.semantic_search_chunks (the flat
+search behind AgenticRetriever._get_semantic_results) and hierarchical_search_chunks for each candidate setting.
+Reports recall@k and p50/p95 latency. The scratch documents (and their chunks, embeddings and summaries) are deleted
+afterwards.
+
+Usage:
+    python tools/benchmark_hierarchical_retrieval.py --documents 300 --sections 12 --chunks 25 --queries 100 --k 25 \\
+        --doc-candidates 4,8,16 --section-candidates 20,40
+"""
+
+import os
+import sys
+import time
+import json
+import uuid
+import argparse
+
+import numpy as np
+
+# Add repository root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import execute_values
+
+from config import EMBEDDING_DIMENSION, HIERARCHICAL_DOC_CANDIDATES, HIERARCHICAL_SECTION_CANDIDATES
+from db_manager import DatabaseManager
+from retrieval.hierarchy import nearest
+
+BENCH_SOURCE = "HIERARCHY_BENCHMARK"
+
+
+def make_corpus(documents: int, sections: int, chunks: int, queries: int, dim: int, seed: int):
+    """
+    Unit vectors: document centroid + section offset + chunk noise, so documents and sections are real (overlapping)
+    clusters. Queries are drawn like chunks of random sections. Returns (vectors, (doc, section) per chunk, queries).
+    """
+    rng = np.random.default_rng(seed)
+    doc_centroids = rng.standard_normal((documents, dim)).astype(np.float32)
+    section_offsets = 0.8 * rng.standard_normal((documents, sections, dim)).astype(np.float32)
+    def sample(doc_idx, section_idx):
+        points = doc_centroids[doc_idx] + section_offsets[doc_idx, section_idx] + 0.9 * rng.standard_normal((len(doc_idx), dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+    doc_idx = np.repeat(np.arange(documents), sections * chunks)
+    section_idx = np.tile(np.repeat(np.arange(sections), chunks), documents)
+    query_docs = rng.integers(0, documents, queries)
+    query_sections = rng.integers(0, sections, queries)
+    return sample(doc_idx, section_idx), list(zip(doc_idx.tolist(), section_idx.tolist())), sample(query_docs, query_sections)
+
+
+def load_corpus(db: DatabaseManager, vectors: np.ndarray, placement, documents: int) -> list:
+    """Inserts the scratch application; returns the chunk ids in vector order."""
+    doc_ids = [uuid.uuid4() for _ in range(documents)]
+    chunk_ids = [uuid.uuid4() for _ in range(len(vectors))]
+    with db.transaction() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, "INSERT INTO documents (doc_id, filename, title, document_type, source, page_count, upload_date) VALUES %s",
+                           [(str(d), f"bench_{i}.pdf", f"Benchmark document {i}", "BenchmarkDocument", BENCH_SOURCE, 1) for i, d in enumerate(doc_ids)],
+                           template="(%s, %s, %s, %s, %s, %s, NOW())")
+            execute_values(cur, "INSERT INTO document_chunks (chunk_id, doc_id, page_number, section, chunk_text) VALUES %s",
+                           [(str(cid), str(doc_ids[d]), s, f"Section {s}", f"benchmark chunk {i}") for i, (cid, (d, s)) in enumerate(zip(chunk_ids, placement))],
+                           page_size=1000)
+            execute_values(cur, "INSERT INTO chunk_embeddings (chunk_id, embedding) VALUES %s",
+                           [(str(cid), vec.tolist()) for cid, vec in zip(chunk_ids, vectors)], template="(%s, %s::vector)", page_size=1000)
+    db.refresh_summary_embeddings(doc_ids)
+    db.execute_query("ANALYZE document_chunks;")
+    db.execute_query("ANALYZE document_summary_embeddings;")
+    return chunk_ids
+
+
+def bench(search, queries: np.ndarray, truth, k: int, label: str):
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        rows = search(q.tolist())
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        hits += len({row['chunk_id'] for row in rows} & expected)
+    return {
+        "search": label,
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hierarchical against flat semantic chunk search.")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=12, help="Sections per document")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per section")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--doc-candidates", default=str(HIERARCHICAL_DOC_CANDIDATES), help="Comma-separated values to compare")
+    parser.add_argument("--section-candidates", default=str(HIERARCHICAL_SECTION_CANDIDATES), help="Comma-separated values to compare")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete the scratch application afterwards")
+    args = parser.parse_args()
+
+    doc_candidates = [int(v) for v in args.doc_candidates.split(",") if v.strip()]
+    section_candidates = [int(v) for v in args.section_candidates.split(",") if v.strip()]
+    vectors, placement, queries = make_corpus(args.documents, args.sections, args.chunks, args.queries, args.dim, args.seed)
+
+    db = DatabaseManager()
+    results = []
+    try:
+        db.execute_query("DELETE FROM documents WHERE source = %s;", (BENCH_SOURCE,))
+        print(f"Loading {len(vectors)} chunks ({args.documents} documents x {args.sections} sections) as '{BENCH_SOURCE}'...")
+        chunk_ids = load_corpus(db, vectors, placement, args.documents)
+        truth = [{chunk_ids[i] for i in nearest(vectors, q, args.k)[0]} for q in queries]
+        sources = [BENCH_SOURCE]
+        print("Benchmarking flat search...")
+        results.append(bench(lambda q: db.semantic_search_chunks(q, args.k, sources=sources, include_text=False), queries, truth, args.k, "flat"))
+        for doc_limit in doc_candidates:
+            for section_limit in section_candidates:
+                print(f"Benchmarking hierarchical search (documents={doc_limit}, sections={section_limit})...")
+                result = bench(lambda q: db.hierarchical_search_chunks(q, args.k, doc_limit, section_limit, sources=sources, include_text=False),
+                               queries, truth, args.k, f"hierarchical {doc_limit}/{section_limit}")
+                result["chunks_ranked"] = min(section_limit, doc_limit * args.sections) * args.chunks
+                results.append(result)
+    finally:
+        if not args.keep_data:
+            db.execute_query("DELETE FROM documents WHERE source = %s;", (BENCH_SOURCE,))
+        db.close()
+
+    if args.json:
+        print(json.dumps({"chunks": len(vectors), "documents": args.documents, "sections": args.sections, "k": args.k, "results": results}, indent=2))
+        return
+    print(f"\nchunks={len(vectors)} documents={args.documents} sections/doc={args.sections} k={args.k}")
+    print(f"{'search':<22} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'ranked':>8}")
+    for r in results:
+        print(f"{r['search']:<22} {r['recall_at_k']:>9.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r.get('chunks_ranked', len(vectors)):>8}")
+
+
+if __name__ == "__main__":
+    main()
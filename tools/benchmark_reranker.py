@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Latency / token benchmark of cross-encoder re-ranking (retrieval/reranker.py) on an application already in the database.
+
+Runs every query through AgenticRetriever.retrieve_and_prepare_context as one intent per query (one node's
+retrieval), first without re-ranking and then with re-ranking for each --keep value. Each re-ranked setting gets a
+fresh score cache and runs twice: the first pass scores every pair (cold), the second is served from the cache (warm).
+Reports per intent: retrieval wall time, cross-encoder time, packed context tokens, the tokens saved against the
+baseline and the added milliseconds per 1000 tokens saved.
+
+Usage:
+    python tools/benchmark_reranker.py --application-ref 24/00123/FUL --task-type RETRIEVE_FACTS --keep 10,15,25
+    python tools/benchmark_reranker.py --application-ref 24/00123/FUL --local-db-dir ./local_db --queries-file queries.txt
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+# Add repository root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RERANK_KEEP, RERANK_MODEL_NAME
+from core_types import Intent
+from retrieval.retriever import AgenticRetriever
+from retrieval.reranker import CrossEncoderReranker
+
+DEFAULT_QUERIES = [
+    "site description and surroundings",
+    "number of residential units and housing mix",
+    "affordable housing provision",
+    "flood risk and drainage strategy",
+    "impact on heritage assets and conservation area",
+    "daylight and sunlight impact on neighbouring properties",
+    "parking, access and highway safety",
+    "biodiversity net gain and ecology",
+]
+
+
+def details(intent: Intent, action: str) -> dict:
+    found = [a["details"] for a in intent.provenance.actions if a["action"] == action]
+    return found[-1] if found else {}
+
+
+def run_pass(retriever: AgenticRetriever, queries, application_refs, task_type: str, rerank: bool):
+    rows = []
+    for query in queries:
+        intent = Intent(parent_node_id="benchmark", task_type=task_type, application_refs=application_refs,
+                        retrieval_config={"semantic_search_query_text": query, "hybrid_search_terms": query.split()[:4], "rerank": rerank})
+        t0 = time.perf_counter()
+        retriever.retrieve_and_prepare_context(intent)
+        rows.append({"wall_ms": (time.perf_counter() - t0) * 1000.0, "rerank_ms": details(intent, "CrossEncoderRerank").get("ms", 0.0),
+                     "tokens": details(intent, "ContextPacked").get("used_tokens", 0), "results": len(intent.result or [])})
+    return rows
+
+
+def summarise(label: str, rows, baseline=None):
+    result = {"setting": label,
+              "wall_ms": round(float(np.mean([r["wall_ms"] for r in rows])), 2),
+              "rerank_ms": round(float(np.mean([r["rerank_ms"] for r in rows])), 2),
+              "tokens": round(float(np.mean([r["tokens"] for r in rows])), 1),
+              "results": round(float(np.mean([r["results"] for r in rows])), 1)}
+    if baseline is not None:
+        result["tokens_saved"] = round(baseline["tokens"] - result["tokens"], 1)
+        result["added_ms"] = round(result["wall_ms"] - baseline["wall_ms"], 2)
+        result["ms_per_1k_tokens_saved"] = round(result["added_ms"] * 1000 / result["tokens_saved"], 2) if result["tokens_saved"] > 0 else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross-encoder re-ranking latency against the context tokens it saves.")
+    parser.add_argument("--application-ref", required=True, help="Comma-separated application reference(s) to retrieve from")
+    parser.add_argument("--queries-file", help="One query per line (default: a fixed set of planning queries)")
+    parser.add_argument("--task-type", default="RETRIEVE_FACTS", help="Decides the token budget, MMR lambda and hierarchy")
+    parser.add_argument("--keep", default=str(RERANK_KEEP), help="Comma-separated RERANK_KEEP values to compare")
+    parser.add_argument("--model", default=RERANK_MODEL_NAME)
+    parser.add_argument("--local-db-dir", help="Use the LocalDatabaseManager in this directory instead of PostgreSQL")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    application_refs = [ref.strip() for ref in args.application_ref.split(",") if ref.strip()]
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file, "r") as f_q:
+            queries = [line.strip() for line in f_q if line.strip()]
+    keeps = [int(v) for v in args.keep.split(",") if v.strip()]
+
+    if args.local_db_dir:
+        from local_db_manager import LocalDatabaseManager
+        db = LocalDatabaseManager(db_dir=args.local_db_dir)
+    else:
+        from db_manager import DatabaseManager
+        db = DatabaseManager()
+    model = CrossEncoderReranker(model_name=args.model).model # Loaded once; every setting below gets its own score cache
+    results = []
+    try:
+        retriever = AgenticRetriever(db)
+        run_pass(retriever, queries[:1], application_refs, args.task_type, rerank=False) # Warm-up (connections, embedding model)
+        baseline = summarise("no re-ranking", run_pass(retriever, queries, application_refs, args.task_type, rerank=False))
+        results.append(baseline)
+        for keep in keeps:
+            retriever.reranker = CrossEncoderReranker(model_name=args.model, model=model)
+            retriever.rerank_keep = keep
+            print(f"Benchmarking re-ranking (keep={keep})...")
+            results.append(summarise(f"keep={keep} cold", run_pass(retriever, queries, application_refs, args.task_type, rerank=True), baseline))
+            results.append(summarise(f"keep={keep} warm", run_pass(retriever, queries, application_refs, args.task_type, rerank=True), baseline))
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps({"queries": len(queries), "task_type": args.task_type, "model": args.model, "results": results}, indent=2))
+        return
+    print(f"\nqueries={len(queries)} task_type={args.task_type} model={args.model} (means per intent)")
+    print(f"{'setting':<16} {'wall ms':>9} {'rerank ms':>10} {'tokens':>8} {'saved':>8} {'ms/1k saved':>12}")
+    for r in results:
+        per_k = r.get("ms_per_1k_tokens_saved")
+        print(f"{r['setting']:<16} {r['wall_ms']:>9.2f} {r['rerank_ms']:>10.2f} {r['tokens']:>8.1f} {r.get('tokens_saved', 0.0):>8.1f} "
+              f"{(f'{per_k:.2f}' if per_k is not None else '-'):>12}")
+
+
+if __name__ == "__main__":
+    main()
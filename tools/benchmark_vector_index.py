@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Recall / latency / memory benchmark for the VECTOR_INDEX_MODE options (full, halfvec, binary).
+
+Loads synthetic clustered vectors into a scratch table, computes exact top-k on the client as ground truth,
+then for each mode builds the mode's HNSW index and runs the same candidate + full-precision re-rank query
+shape that DatabaseManager.semantic_search_chunks uses. Reports recall@k, p50/p95 latency, index size and
+build time. The scratch table is dropped afterwards; the real chunk_embeddings table is not touched.
+
+Usage:
+    python tools/benchmark_vector_index.py --rows 50000 --queries 200 --k 10 --rerank-factor 4
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+# Add repository root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import execute_values
+
+from config import EMBEDDING_DIMENSION, VECTOR_RERANK_FACTOR, VECTOR_HNSW_EF_SEARCH
+from db_manager import DatabaseManager, VECTOR_INDEX_MODES, vector_index_definition, vector_candidate_order
+
+BENCH_TABLE = "vector_index_benchmark"
+
+
+def make_dataset(rows: int, queries: int, dim: int, clusters: int, seed: int):
+    """Unit-normalised vectors drawn around random centroids (closer to real embeddings than uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    def sample(n):
+        points = centroids[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+    return sample(rows), sample(queries)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    sq_norms = np.einsum("ij,ij->i", data, data)
+    top = []
+    for q in queries:
+        dist = sq_norms - 2.0 * (data @ q)
+        idx = np.argpartition(dist, k)[:k]
+        top.append(idx[np.argsort(dist[idx])])
+    return np.asarray(top) + 1 # serial ids start at 1
+
+
+def load_table(db: DatabaseManager, data: np.ndarray, dim: int):
+    db.execute_query(f"DROP TABLE IF EXISTS {BENCH_TABLE};")
+    db.execute_query(f"CREATE TABLE {BENCH_TABLE} (id SERIAL PRIMARY KEY, embedding vector({dim}) NOT NULL);")
+    with db.transaction() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, f"INSERT INTO {BENCH_TABLE} (embedding) VALUES %s",
+                           [(row.tolist(),) for row in data], template="(%s::vector)", page_size=1000)
+    db.execute_query(f"ANALYZE {BENCH_TABLE};")
+
+
+def bench_mode(db: DatabaseManager, mode: str, queries: np.ndarray, truth: np.ndarray, k: int, rerank_factor: int, dim: int):
+    index_name = f"idx_{BENCH_TABLE}_{mode}"
+    start = time.perf_counter()
+    db.execute_query(f"CREATE INDEX {index_name} ON {BENCH_TABLE} {vector_index_definition(mode, 'embedding', dim)};")
+    build_seconds = time.perf_counter() - start
+    index_bytes = db.execute_query("SELECT pg_relation_size(%s::regclass) AS b;", (index_name,), fetch_one=True)['b']
+
+    candidates = k if mode == "full" else min(k * rerank_factor, max(k, VECTOR_HNSW_EF_SEARCH))
+    query = f"""
+    SELECT id FROM (
+      SELECT id, embedding <-> %s::vector AS distance
+      FROM {BENCH_TABLE} ce
+      ORDER BY {vector_candidate_order(mode, 'ce.embedding', dim)}
+      LIMIT %s
+    ) candidates
+    ORDER BY distance ASC
+    LIMIT %s;
+    """
+    latencies, hits = [], 0
+    with db.transaction() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('hnsw.ef_search', %s, true);", (str(max(VECTOR_HNSW_EF_SEARCH, candidates)),))
+            for q, expected in zip(queries, truth):
+                q_list = q.tolist()
+                t0 = time.perf_counter()
+                cur.execute(query, (q_list, q_list, candidates, k))
+                found = [row[0] for row in cur.fetchall()]
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                hits += len(set(found) & set(expected.tolist()))
+    db.execute_query(f"DROP INDEX IF EXISTS {index_name};")
+    return {
+        "mode": mode,
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "index_mb": round(index_bytes / (1024 * 1024), 2),
+        "build_seconds": round(build_seconds, 2),
+        "candidates": candidates,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full / halfvec / binary vector index modes.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--rerank-factor", type=int, default=VECTOR_RERANK_FACTOR)
+    parser.add_argument("--modes", default=",".join(VECTOR_INDEX_MODES))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--keep-table", action="store_true", help="Do not drop the scratch table afterwards")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    data, queries = make_dataset(args.rows, args.queries, args.dim, args.clusters, args.seed)
+    truth = exact_top_k(data, queries, args.k)
+
+    db = DatabaseManager()
+    results = []
+    try:
+        print(f"Loading {args.rows} x {args.dim} vectors into {BENCH_TABLE}...")
+        load_table(db, data, args.dim)
+        table_mb = db.execute_query("SELECT pg_relation_size(%s::regclass) AS b;", (BENCH_TABLE,), fetch_one=True)['b'] / (1024 * 1024)
+        for mode in modes:
+            print(f"Benchmarking '{mode}'...")
+            results.append(bench_mode(db, mode, queries, truth, args.k, args.rerank_factor, args.dim))
+    finally:
+        if not args.keep_table:
+            db.execute_query(f"DROP TABLE IF EXISTS {BENCH_TABLE};")
+        db.close()
+
+    if args.json:
+        print(json.dumps({"rows": args.rows, "dim": args.dim, "k": args.k, "table_mb": round(table_mb, 2), "results": results}, indent=2))
+        return
+    print(f"\nrows={args.rows} dim={args.dim} k={args.k} heap={table_mb:.1f}MB")
+    print(f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'index MB':>9} {'build s':>8} {'cands':>6}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['recall_at_k']:>9.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['index_mb']:>9.1f} {r['build_seconds']:>8.1f} {r['candidates']:>6}")
+
+
+if __name__ == "__main__":
+    main()